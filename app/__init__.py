@@ -3,7 +3,17 @@ from flask_sqlalchemy import SQLAlchemy  #SQLAlchemy para gerir a base de dados
 from flask_bcrypt import Bcrypt  #Bcrypt para encriptar senhas
 from flask_login import LoginManager  #Importa LoginManager para gerir sessões de utilizadores (login/logout)
 import os  #Para aceder a variáveis de ambiente
+import importlib  #Para importar as bibliotecas pesadas pelo nome
 from dotenv import load_dotenv  #Para carregar o ficheiro .env
+from app.armazem import ArmazemDados  #Armazém onde ficam guardados os dados carregados pelos utilizadores
+from app.cache import CacheLeitura, CacheGraficos, CacheUtilizadores  #Caches das folhas de Excel já lidas, dos gráficos já construídos e dos utilizadores autenticados
+from app.basedados import opcoes_motor, preparar_motor  #Configuração do motor da base de dados (WAL no SQLite, pool nas restantes)
+from app.exportacao import PoolRenderizacao  #Processos que exportam os gráficos para PNG/PDF
+from app.tarefas import GestorTarefas  #Tarefas em segundo plano (leitura dos ficheiros enviados)
+from app.espacos import EspacosTrabalho  #Pastas isoladas de cada utilizador, com limpeza automática
+from app.metricas import Metricas, registar  #Métricas de desempenho (/metrics) e registos estruturados
+from app.compressao import Compressao  #Compressão das respostas (brotli/gzip) e cache dos ficheiros estáticos
+from app.uploads import Pedido, descartar_recebidos  #Receção dos uploads diretamente no espaço de trabalho
 
 #Carrega as variáveis de ambiente do ficheiro .env
 load_dotenv()
@@ -13,20 +23,87 @@ bcrypt = Bcrypt()  #Objeto para encriptação de senhas
 login_manager = LoginManager()  #Gestor de sessões de utilizadores
 login_manager.login_view = "rotas.pagina_inicial"  #Define a página para onde o utilizador será redirecionado se não estiver autenticado
 login_manager.login_message_category = "info"  #Define o estilo da mensagem flash (aviso) que aparece quando o login é exigido
+armazem_dados = ArmazemDados()  #Armazém de dados (Parquet em disco + cache em memória)
+cache_leitura = CacheLeitura()  #Cache das folhas lidas, indexada pelo conteúdo dos ficheiros
+cache_graficos = CacheGraficos()  #Cache dos gráficos, indexada pelo conteúdo dos dados e pelos parâmetros do gráfico
+pool_renderizacao = PoolRenderizacao()  #Pool de processos de exportação de imagens (mantém o kaleido ativo entre pedidos)
+gestor_tarefas = GestorTarefas()  #Pool de processos que lê os ficheiros enviados em segundo plano
+espacos_trabalho = EspacosTrabalho()  #Espaços de trabalho por utilizador (uploads, gráficos, dados e tarefas)
+cache_utilizadores = CacheUtilizadores()  #Cache dos utilizadores autenticados (evita uma consulta à base de dados em cada pedido)
+metricas = Metricas()  #Latência das rotas e duração das etapas (leitura, inferência, gráficos, HTML, exportação)
+compressao = Compressao()  #Comprime o HTML, o JSON e os estáticos de texto antes de serem enviados
 
-def criar_app():  #Função que cria e configura a aplicação Flask
-    print("A criar app...")  #Mensagem de depuração no terminal
+MODULOS_PESADOS = ("pandas", "numpy", "pyarrow.parquet", "openpyxl", "plotly.express", "app.utils", "app.graficos")  #Importados só quando são precisos (ou uma vez no processo principal do gunicorn)
+
+PASTA_ESTATICOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")  #Pasta static/ na raiz do projeto (CSS e JS)
 
-    app = Flask(__name__)  #Cria a instância principal da aplicação
+def criar_app():  #Função que cria e configura a aplicação Flask
+    app = Flask(__name__, static_folder=PASTA_ESTATICOS)  #Cria a instância principal da aplicação
+    app.request_class = Pedido  #Os ficheiros enviados são escritos diretamente na pasta de uploads (sem cópia temporária)
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "97G8MSGSIUDFHA68S")  #Define a chave secreta (usada para sessões e segurança)
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///basedados.db")  #Define o caminho da base de dados SQLite
+    app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")  #Nível de sincronização do SQLite (NORMAL é seguro com WAL)
+    app.config["SQLITE_ESPERA_MS"] = int(os.environ.get("SQLITE_ESPERA_MS", 5000))  #Tempo de espera quando a base de dados SQLite está bloqueada por outro worker
+    app.config["BD_POOL_TAMANHO"] = int(os.environ.get("BD_POOL_TAMANHO", 5))  #Ligações abertas por worker (bases de dados que não são SQLite)
+    app.config["BD_POOL_EXTRA"] = int(os.environ.get("BD_POOL_EXTRA", 10))  #Ligações extra permitidas nos picos
+    app.config["BD_POOL_RECICLAR"] = int(os.environ.get("BD_POOL_RECICLAR", 1800))  #Segundos até uma ligação ser renovada
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opcoes_motor(app.config)  #Opções do motor de acordo com o tipo de base de dados
+    app.config["UTILIZADORES_CACHE_SEGUNDOS"] = int(os.environ.get("UTILIZADORES_CACHE_SEGUNDOS", 60))  #Tempo de vida dos utilizadores na cache (0 = desligada)
+    app.config["UTILIZADORES_CACHE_MAXIMO"] = int(os.environ.get("UTILIZADORES_CACHE_MAXIMO", 1024))  #Número máximo de utilizadores na cache
+    app.config["UPLOAD_LIMITE_FICHEIRO_MB"] = int(os.environ.get("UPLOAD_LIMITE_FICHEIRO_MB", 200))  #Tamanho máximo de cada ficheiro enviado
+    app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("UPLOAD_LIMITE_PEDIDO_MB", 500)) * 1024 * 1024  #Tamanho máximo de cada pedido (todos os ficheiros juntos)
+    app.config["PASTA_ESPACOS"] = os.environ.get("PASTA_ESPACOS", "espacos_trabalho")  #Pasta com um espaço de trabalho por utilizador (uploads, gráficos, dados e tarefas)
+    app.config["ESPACOS_IDADE_MAXIMA_HORAS"] = int(os.environ.get("ESPACOS_IDADE_MAXIMA_HORAS", 24))  #Ficheiros mais antigos do que isto são apagados
+    app.config["ESPACOS_QUOTA_UTILIZADOR_MB"] = int(os.environ.get("ESPACOS_QUOTA_UTILIZADOR_MB", 1024))  #Espaço máximo de cada utilizador
+    app.config["ESPACOS_QUOTA_GLOBAL_MB"] = int(os.environ.get("ESPACOS_QUOTA_GLOBAL_MB", 10240))  #Espaço máximo de todos os utilizadores juntos
+    app.config["ESPACOS_INTERVALO_LIMPEZA"] = int(os.environ.get("ESPACOS_INTERVALO_LIMPEZA", 600))  #Segundos entre limpezas automáticas (0 = desligado)
+    app.config["DADOS_CACHE_MEMORIA"] = int(os.environ.get("DADOS_CACHE_MEMORIA", 4))  #Número de conjuntos de dados mantidos em memória
+    app.config["PASTA_CACHE_LEITURA"] = os.environ.get("PASTA_CACHE_LEITURA", "cache_leitura")  #Pasta da cache de folhas já lidas
+    app.config["CACHE_LEITURA_LIMITE_MB"] = int(os.environ.get("CACHE_LEITURA_LIMITE_MB", 512))  #Espaço máximo em disco da cache de leitura
+    app.config["GRAFICOS_CACHE_MB"] = int(os.environ.get("GRAFICOS_CACHE_MB", 64))  #Memória máxima da cache de gráficos
+    app.config["GRAFICOS_LIMITE_PONTOS"] = int(os.environ.get("GRAFICOS_LIMITE_PONTOS", 2000))  #Número máximo de pontos/barras por gráfico
+    app.config["EXPORTACAO_PROCESSOS"] = int(os.environ.get("EXPORTACAO_PROCESSOS", 2))  #Número de processos que exportam imagens
+    app.config["EXPORTACAO_CACHE_MB"] = int(os.environ.get("EXPORTACAO_CACHE_MB", 64))  #Memória máxima da cache de imagens exportadas
+    app.config["NIVEL_REGISTO"] = os.environ.get("NIVEL_REGISTO", "INFO")  #Nível mínimo dos registos (DEBUG, INFO, WARNING, ...)
+    app.config["METRICAS_APENAS_LOCAL"] = os.environ.get("METRICAS_APENAS_LOCAL", "1") != "0"  #/metrics só responde a pedidos da própria máquina (que não passem por um proxy)
+    app.config["METRICAS_TOKEN"] = os.environ.get("METRICAS_TOKEN")  #Se definido, /metrics exige "Authorization: Bearer <token>" (necessário atrás de um proxy)
+    app.config["COMPRESSAO_MINIMO_BYTES"] = int(os.environ.get("COMPRESSAO_MINIMO_BYTES", 1024))  #Respostas mais pequenas do que isto não são comprimidas
+    app.config["COMPRESSAO_NIVEL_GZIP"] = int(os.environ.get("COMPRESSAO_NIVEL_GZIP", 6))  #Nível de compressão gzip (1 = rápido, 9 = mais pequeno)
+    app.config["COMPRESSAO_NIVEL_BROTLI"] = int(os.environ.get("COMPRESSAO_NIVEL_BROTLI", 5))  #Qualidade brotli (0 a 11), se o pacote brotli estiver instalado
+    app.config["COMPRESSAO_CACHE_MB"] = int(os.environ.get("COMPRESSAO_CACHE_MB", 32))  #Memória máxima dos ficheiros estáticos já comprimidos
+    app.config["TAREFAS_PROCESSOS"] = int(os.environ.get("TAREFAS_PROCESSOS", 2))  #Processos de leitura por worker (0 = ler na thread da tarefa); ver DEPLOY.md
 
+    metricas.init_app(app)  #Liga as métricas e os registos à aplicação Flask (primeiro, para medir tudo o resto)
+    compressao.init_app(app)  #Liga a compressão às respostas (as métricas registam o tamanho já comprimido)
     db.init_app(app)  #Liga o SQLAlchemy à aplicação Flask
+    with app.app_context():
+        preparar_motor(db.engine, app.config)  #Configura cada nova ligação (modo WAL e sincronização no SQLite)
+    cache_utilizadores.init_app(app)  #Liga a cache de utilizadores à aplicação Flask
     bcrypt.init_app(app)  #Liga o Bcrypt à aplicação Flask
     login_manager.init_app(app)  #Liga o LoginManager à aplicação Flask
+    espacos_trabalho.init_app(app)  #Liga os espaços de trabalho à aplicação Flask (e arranca a limpeza automática)
+    armazem_dados.init_app(app)  #Liga o armazém de dados à aplicação Flask
+    cache_leitura.init_app(app)  #Liga a cache de leitura à aplicação Flask
+    cache_graficos.init_app(app)  #Liga a cache de gráficos à aplicação Flask
+    pool_renderizacao.init_app(app)  #Liga a pool de exportação à aplicação Flask
+    gestor_tarefas.init_app(app)  #Liga as tarefas em segundo plano à aplicação Flask
+    app.teardown_request(descartar_recebidos)  #Apaga os uploads que não foram guardados (formato errado ou pedido interrompido)
 
     from app.routes import rotas  #Importa as rotas definidas no ficheiro routes.py
     app.register_blueprint(rotas)  #Blueprint regista rotas 
 
-    print("App criada com sucesso!")  #Mensagem de depuração
+    from app.recursos import recursos, url_plotly, url_estatico  #Importa as rotas dos recursos estáticos (plotly.js)
+    app.register_blueprint(recursos)
+    app.add_template_global(url_plotly)  #Permite usar url_plotly() nos templates
+    app.add_template_global(url_estatico)  #Permite usar url_estatico() nos templates
+
+    from app.comandos import criar_bd, listar_utilizadores  #Comandos: flask --app main criar-bd / listar-utilizadores
+    app.cli.add_command(criar_bd)
+    app.cli.add_command(listar_utilizadores)
+
+    registar("app_criada")  #Regista o arranque da aplicação
     return app  #Devolve a aplicação pronta a ser usada
+
+def pre_carregar_modulos():  #Importa as bibliotecas pesadas de uma vez (usado pelo gunicorn com preload_app, antes de criar os workers)
+    for modulo in MODULOS_PESADOS:
+        importlib.import_module(modulo)
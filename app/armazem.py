@@ -0,0 +1,154 @@
+import os #Para criar pastas e construir caminhos
+import re #Para validar os identificadores recebidos da sessão
+import json #Para guardar as estatísticas das colunas nos metadados do Parquet
+import uuid #Para gerar identificadores opacos para cada conjunto de dados
+import hashlib #Para calcular a impressão digital (hash) do conteúdo dos dados
+import threading #Para proteger a cache em memória entre pedidos simultâneos
+from cachetools import LRUCache #Cache que descarta os elementos usados há mais tempo
+from app.espacos import caminho_espaco #Os dados ficam no espaço de trabalho de cada utilizador
+
+PADRAO_ID = re.compile(r"^[0-9a-f]{32}$") #Formato dos identificadores gerados (uuid4 em hexadecimal)
+#O pandas e o pyarrow só são importados quando são precisos (os pedidos de login não os carregam)
+
+
+def preparar_para_arrow(df): #Garante que todas as colunas podem ser escritas em Parquet
+    import pandas as pd
+    import pyarrow as pa
+    df = df.copy(deep=False)
+    df.columns = [str(coluna) for coluna in df.columns] #O Parquet só aceita nomes de colunas em texto
+    for coluna in df.columns:
+        if df[coluna].dtype == 'object':
+            try:
+                pa.array(df[coluna], from_pandas=True) #Verifica se o Arrow consegue tipar a coluna
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[coluna] = df[coluna].map(lambda valor: valor if pd.isna(valor) else str(valor)) #Colunas com tipos misturados passam a texto
+    return df
+
+
+def hash_dataframe(df): #SHA-256 do conteúdo de um DataFrame (nomes, tipos e valores das colunas)
+    import pandas as pd
+    sha = hashlib.sha256()
+    sha.update(repr([(str(coluna), str(tipo)) for coluna, tipo in df.dtypes.items()]).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()) #Hash vetorizado de todas as linhas
+    return sha.hexdigest()
+
+
+class ArmazemDados:
+    """Guarda os dados carregados de cada utilizador em Parquet e mantém os mais usados em memória"""
+
+    def __init__(self, app=None):
+        self.pasta = "espacos_trabalho"
+        self.cache = LRUCache(maxsize=4)
+        self.ordens = LRUCache(maxsize=16) #Ordenações já calculadas para a pré-visualização
+        self.hashes = LRUCache(maxsize=256) #Hash do conteúdo de cada conjunto de dados
+        self.estatisticas_colunas = LRUCache(maxsize=64) #Estatísticas das colunas de cada conjunto de dados
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação (pasta e tamanho da cache)
+        self.pasta = app.config.get("PASTA_ESPACOS", self.pasta)
+        self.cache = LRUCache(maxsize=int(app.config.get("DADOS_CACHE_MEMORIA", 4)))
+        os.makedirs(self.pasta, exist_ok=True) #Garante que a pasta existe; se não existir, é criada
+
+    def _caminho(self, id_utilizador, id_dados): #Caminho do ficheiro Parquet de um conjunto de dados
+        if not id_dados or not PADRAO_ID.match(id_dados):
+            return None #Recusa identificadores inválidos (evita aceder a caminhos fora da pasta)
+        return os.path.join(caminho_espaco(self.pasta, id_utilizador, "dados"), f"{id_dados}.parquet")
+
+    def caminho(self, id_utilizador, id_dados): #Caminho do ficheiro de um conjunto de dados (ex: para as quotas não o apagarem enquanto está em uso)
+        return self._caminho(id_utilizador, id_dados)
+
+    def guardar(self, id_utilizador, df, estatisticas=None): #Escreve o DataFrame (e as estatísticas das colunas) em disco uma única vez e devolve o seu identificador
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        id_dados = uuid.uuid4().hex
+        caminho = self._caminho(id_utilizador, id_dados)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+        df = preparar_para_arrow(df)
+        hash_conteudo = hash_dataframe(df)
+        tabela = pa.Table.from_pandas(df, preserve_index=False) #Mantém os tipos das colunas (datas, números, categorias)
+        metadados = {**tabela.schema.metadata, b"hash_dados": hash_conteudo.encode("ascii")} #O hash fica guardado no próprio ficheiro
+        if estatisticas is not None:
+            metadados[b"estatisticas"] = json.dumps(estatisticas, ensure_ascii=False).encode("utf-8")
+        tabela = tabela.replace_schema_metadata(metadados)
+        temporario = f"{caminho}.tmp"
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, caminho) #Só fica visível depois de escrito por completo
+
+        with self.trinco:
+            self.cache[(str(id_utilizador), id_dados)] = df
+            self.hashes[(str(id_utilizador), id_dados)] = hash_conteudo
+            if estatisticas is not None:
+                self.estatisticas_colunas[(str(id_utilizador), id_dados)] = estatisticas
+        return id_dados
+
+    def carregar(self, id_utilizador, id_dados): #Devolve o DataFrame guardado (ou None se não existir)
+        chave = (str(id_utilizador), id_dados)
+        with self.trinco:
+            df = self.cache.get(chave)
+        if df is None:
+            import pyarrow.parquet as pq
+            caminho = self._caminho(id_utilizador, id_dados)
+            if caminho is None or not os.path.exists(caminho):
+                return None
+            df = pq.read_table(caminho).to_pandas()
+            os.utime(caminho) #Marca os dados como usados (o limpador apaga primeiro os mais antigos)
+            with self.trinco:
+                self.cache[chave] = df
+        else:
+            try:
+                os.utime(self._caminho(id_utilizador, id_dados)) #Também quando vem da memória: o limpador não apaga dados que continuam a ser usados
+            except (FileNotFoundError, TypeError):
+                pass
+        return df.copy(deep=False) #Cópia superficial para que as alterações nas rotas não mexam na cache
+
+    def hash_dados(self, id_utilizador, id_dados): #Hash do conteúdo do conjunto de dados (lido dos metadados do Parquet, sem ler os dados)
+        chave = (str(id_utilizador), id_dados)
+        with self.trinco:
+            hash_conteudo = self.hashes.get(chave)
+        if hash_conteudo is None:
+            import pyarrow.parquet as pq
+            caminho = self._caminho(id_utilizador, id_dados)
+            if caminho is None or not os.path.exists(caminho):
+                return None
+            hash_conteudo = pq.read_schema(caminho).metadata[b"hash_dados"].decode("ascii")
+            with self.trinco:
+                self.hashes[chave] = hash_conteudo
+        return hash_conteudo
+
+    def estatisticas(self, id_utilizador, id_dados): #Estatísticas das colunas calculadas ao carregar os dados (lidas dos metadados do Parquet, sem ler os dados)
+        chave = (str(id_utilizador), id_dados)
+        with self.trinco:
+            estatisticas = self.estatisticas_colunas.get(chave)
+        if estatisticas is None:
+            import pyarrow.parquet as pq
+            caminho = self._caminho(id_utilizador, id_dados)
+            if caminho is None or not os.path.exists(caminho):
+                return None
+            estatisticas = json.loads(pq.read_schema(caminho).metadata.get(b"estatisticas", b"{}"))
+            with self.trinco:
+                self.estatisticas_colunas[chave] = estatisticas
+        return estatisticas
+
+    def ordem(self, id_utilizador, id_dados, df, coluna, ascendente): #Posições das linhas ordenadas por uma coluna (calculadas uma vez por conjunto de dados)
+        chave = (str(id_utilizador), id_dados, coluna, ascendente)
+        with self.trinco:
+            posicoes = self.ordens.get(chave)
+        if posicoes is None:
+            posicoes = df[coluna].reset_index(drop=True).sort_values(ascending=ascendente, kind="stable", na_position="last").index.to_numpy()
+            with self.trinco:
+                self.ordens[chave] = posicoes
+        return posicoes
+
+    def remover(self, id_utilizador, id_dados): #Apaga o conjunto de dados do disco e da memória
+        with self.trinco:
+            self.cache.pop((str(id_utilizador), id_dados), None)
+            self.hashes.pop((str(id_utilizador), id_dados), None)
+            self.estatisticas_colunas.pop((str(id_utilizador), id_dados), None)
+            for chave in [chave for chave in self.ordens if chave[:2] == (str(id_utilizador), id_dados)]:
+                self.ordens.pop(chave, None)
+        caminho = self._caminho(id_utilizador, id_dados)
+        if caminho and os.path.exists(caminho):
+            os.remove(caminho)
@@ -0,0 +1,35 @@
+from sqlalchemy import event  #Para configurar cada nova ligação à base de dados
+from sqlalchemy.engine import make_url  #Para saber que tipo de base de dados está a ser usada
+
+NIVEIS_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")  #Valores aceites para o PRAGMA synchronous do SQLite
+
+
+def e_sqlite(url):  #Indica se o endereço da base de dados é um ficheiro SQLite
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def opcoes_motor(config):  #Opções do motor do SQLAlchemy (SQLALCHEMY_ENGINE_OPTIONS) de acordo com o tipo de base de dados
+    if e_sqlite(config["SQLALCHEMY_DATABASE_URI"]):
+        return {"connect_args": {"timeout": int(config.get("SQLITE_ESPERA_MS", 5000)) / 1000}}  #Espera pelo fim das escritas dos outros workers em vez de falhar logo
+    return {
+        "pool_size": int(config.get("BD_POOL_TAMANHO", 5)),  #Ligações mantidas abertas por worker
+        "max_overflow": int(config.get("BD_POOL_EXTRA", 10)),  #Ligações extra permitidas nos picos
+        "pool_recycle": int(config.get("BD_POOL_RECICLAR", 1800)),  #Renova as ligações antigas (os servidores fecham ligações paradas)
+        "pool_pre_ping": True  #Verifica a ligação antes de a usar (evita erros com ligações fechadas pelo servidor)
+    }
+
+
+def preparar_motor(motor, config):  #Ativa o modo WAL e o nível de sincronização em cada nova ligação SQLite
+    if motor.dialect.name != "sqlite":
+        return
+    synchronous = str(config.get("SQLITE_SYNCHRONOUS", "NORMAL")).upper()
+    if synchronous not in NIVEIS_SYNCHRONOUS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS inválido: {synchronous}")
+
+    @event.listens_for(motor, "connect")
+    def configurar_ligacao(ligacao, registo_ligacao):
+        cursor = ligacao.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")  #Leituras não bloqueiam escritas (e vice-versa) entre workers
+        cursor.execute(f"PRAGMA synchronous={synchronous}")  #NORMAL é seguro com WAL e evita um fsync por transação
+        cursor.execute(f"PRAGMA busy_timeout={int(config.get('SQLITE_ESPERA_MS', 5000))}")
+        cursor.close()
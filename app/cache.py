@@ -0,0 +1,210 @@
+import os #Para criar pastas, construir caminhos e ler tamanhos/datas dos ficheiros
+import json #Para guardar a lista de folhas de cada ficheiro
+import hashlib #Para calcular o SHA-256 do conteúdo dos ficheiros
+import uuid #Para dar um nome único aos ficheiros temporários
+import threading #Para proteger os hashes e o espaço ocupado entre threads do mesmo processo
+from cachetools import LRUCache, TTLCache #Caches que descartam os elementos usados há mais tempo (ou expirados)
+from app.armazem import preparar_para_arrow #Garante que os DataFrames podem ser escritos em Parquet
+
+TAMANHO_BLOCO_HASH = 1024 * 1024 #Os ficheiros são lidos em blocos de 1 MB para calcular o hash
+EXTENSAO_HASH = ".sha256" #Ficheiro ao lado do upload com o hash calculado durante a receção (lido por todos os processos)
+
+
+class CacheLeitura:
+    """Cache em disco das folhas já lidas, indexada pelo SHA-256 do conteúdo do ficheiro e pelo nome da folha"""
+
+    def __init__(self, app=None):
+        self.pasta = "cache_leitura"
+        self.limite_bytes = 512 * 1024 * 1024
+        self.hashes = LRUCache(maxsize=256) #Hashes já calculados: (caminho, tamanho, data de modificação) -> SHA-256
+        self.ocupado = None #Bytes ocupados pela cache em disco (lidos da pasta no arranque e depois atualizados a cada escrita)
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação (pasta e espaço máximo em disco)
+        self.pasta = app.config.get("PASTA_CACHE_LEITURA", self.pasta)
+        self.limite_bytes = int(app.config.get("CACHE_LEITURA_LIMITE_MB", 512)) * 1024 * 1024
+        os.makedirs(self.pasta, exist_ok=True) #Garante que a pasta existe; se não existir, é criada
+        with self.trinco:
+            self.ocupado = sum(entrada[1] for entrada in self._entradas())
+
+    def hash_ficheiro(self, caminho): #Calcula o SHA-256 do ficheiro (só volta a ler se o ficheiro tiver mudado)
+        estado = os.stat(caminho)
+        chave = (os.path.abspath(caminho), estado.st_size, estado.st_mtime_ns)
+        with self.trinco:
+            hash_conteudo = self.hashes.get(chave)
+        if hash_conteudo is not None:
+            return hash_conteudo
+        try:
+            with open(f"{caminho}{EXTENSAO_HASH}", "r", encoding="ascii") as f:
+                tamanho, data, hash_conteudo = f.read().split()
+            if (int(tamanho), int(data)) == (estado.st_size, estado.st_mtime_ns): #Só serve se o ficheiro não mudou desde a receção
+                with self.trinco:
+                    self.hashes[chave] = hash_conteudo
+                return hash_conteudo
+        except (OSError, ValueError):
+            pass
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b""):
+                sha.update(bloco)
+        hash_conteudo = sha.hexdigest()
+        with self.trinco:
+            self.hashes[chave] = hash_conteudo
+        return hash_conteudo
+
+    def registar_hash(self, caminho, hash_conteudo): #Guarda o hash já calculado (ex: durante a receção do upload) para não voltar a ler o ficheiro
+        estado = os.stat(caminho)
+        with open(f"{caminho}{EXTENSAO_HASH}", "w", encoding="ascii") as f:
+            f.write(f"{estado.st_size} {estado.st_mtime_ns} {hash_conteudo}")
+        with self.trinco:
+            self.hashes[(os.path.abspath(caminho), estado.st_size, estado.st_mtime_ns)] = hash_conteudo
+
+    def _pasta_hash(self, hash_conteudo):
+        return os.path.join(self.pasta, hash_conteudo)
+
+    def _caminho_folha(self, hash_conteudo, folha): #O nome da folha também é convertido em hash (pode ter caracteres inválidos para o disco)
+        nome = hashlib.sha256(folha.encode("utf-8")).hexdigest()
+        return os.path.join(self._pasta_hash(hash_conteudo), f"{nome}.parquet")
+
+    def _escrever(self, caminho, escrever): #Escreve um ficheiro da cache de forma atómica e aplica o limite de espaço (a pasta só é percorrida quando o limite é ultrapassado)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp" #Nome único: várias threads do mesmo processo podem guardar a mesma folha ao mesmo tempo
+        escrever(temporario)
+        tamanho = os.path.getsize(temporario)
+        try:
+            tamanho -= os.path.getsize(caminho) #Substitui um ficheiro já existente (ex: escrito por outro processo)
+        except FileNotFoundError:
+            pass
+        os.replace(temporario, caminho)
+        with self.trinco:
+            if self.ocupado is None:
+                self.ocupado = sum(entrada[1] for entrada in self._entradas())
+            else:
+                self.ocupado += tamanho
+            if self.ocupado > self.limite_bytes:
+                self._limpar()
+
+    def _ler(self, caminho, ler): #Lê um ficheiro da cache e marca-o como usado recentemente
+        import pyarrow as pa
+        try:
+            resultado = ler(caminho)
+            os.utime(caminho) #A data de modificação serve de marca para a política LRU
+            return resultado
+        except (FileNotFoundError, OSError, pa.ArrowInvalid):
+            return None
+
+    def obter_folhas(self, hash_conteudo): #Lista de folhas guardada para este conteúdo (ou None)
+        def ler(caminho):
+            with open(caminho, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return self._ler(os.path.join(self._pasta_hash(hash_conteudo), "folhas.json"), ler)
+
+    def guardar_folhas(self, hash_conteudo, folhas):
+        def escrever(caminho):
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump(folhas, f)
+        self._escrever(os.path.join(self._pasta_hash(hash_conteudo), "folhas.json"), escrever)
+
+    def obter_folha(self, hash_conteudo, folha): #DataFrame já lido e tipado desta folha e o seu esquema (ou None)
+        import pyarrow.parquet as pq
+        def ler(caminho):
+            tabela = pq.read_table(caminho)
+            esquema = (tabela.schema.metadata or {}).get(b"esquema")
+            return (tabela.to_pandas(), json.loads(esquema)) if esquema else None #Entradas antigas sem esquema contam como em falta
+        return self._ler(self._caminho_folha(hash_conteudo, folha), ler)
+
+    def guardar_folha(self, hash_conteudo, folha, dados, esquema): #Guarda a folha já com os tipos compactos (o esquema fica nos metadados do Parquet)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tabela = pa.Table.from_pandas(preparar_para_arrow(dados), preserve_index=False)
+        tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b"esquema": json.dumps(esquema).encode("utf-8")})
+        self._escrever(self._caminho_folha(hash_conteudo, folha), lambda caminho: pq.write_table(tabela, caminho))
+
+    def _entradas(self): #Lista (data de modificação, tamanho, caminho) de todos os ficheiros da cache
+        entradas = []
+        for pasta_hash in os.scandir(self.pasta):
+            if not pasta_hash.is_dir():
+                continue
+            for entrada in os.scandir(pasta_hash.path):
+                try:
+                    estado = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+        return entradas
+
+    def _limpar(self): #Apaga os ficheiros usados há mais tempo até a cache caber no espaço configurado (chamado com o trinco fechado)
+        entradas = self._entradas() #Volta a ler a pasta: corrige também o total com as escritas dos outros processos
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except FileNotFoundError:
+                pass
+            try:
+                pasta_hash = os.path.dirname(caminho)
+                if not os.listdir(pasta_hash):
+                    os.rmdir(pasta_hash) #Remove as pastas que ficaram vazias
+            except OSError:
+                pass
+        self.ocupado = total
+
+
+class CacheGraficos:
+    """Cache em memória das figuras já construídas (em JSON), limitada pelo número de bytes ocupados"""
+
+    def __init__(self, app=None):
+        self.cache = LRUCache(maxsize=64 * 1024 * 1024, getsizeof=len)
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação (memória máxima da cache)
+        self.cache = LRUCache(maxsize=int(app.config.get("GRAFICOS_CACHE_MB", 64)) * 1024 * 1024, getsizeof=len)
+
+    def obter(self, chave, construir): #Devolve a figura guardada para esta chave; se não existir, constrói-a e guarda-a
+        with self.trinco:
+            figura_json = self.cache.get(chave)
+        if figura_json is None:
+            figura_json = construir()
+            with self.trinco:
+                try:
+                    self.cache[chave] = figura_json
+                except ValueError:
+                    pass #Figura maior do que a cache inteira: não é guardada
+        return figura_json
+
+
+class CacheUtilizadores:
+    """Cache em memória dos utilizadores autenticados, com tempo de vida limitado (evita uma consulta à base de dados em cada pedido)"""
+
+    def __init__(self, app=None):
+        self.cache = TTLCache(maxsize=1024, ttl=60)
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação (tempo de vida e número máximo de utilizadores)
+        self.cache = TTLCache(
+            maxsize=int(app.config.get("UTILIZADORES_CACHE_MAXIMO", 1024)),
+            ttl=int(app.config.get("UTILIZADORES_CACHE_SEGUNDOS", 60))
+        )
+
+    def obter(self, id_utilizador, carregar): #Devolve o utilizador guardado; se não existir (ou tiver expirado), carrega-o e guarda-o
+        with self.trinco:
+            utilizador = self.cache.get(id_utilizador)
+        if utilizador is None:
+            utilizador = carregar(id_utilizador)
+            if utilizador is not None and self.cache.ttl > 0:
+                with self.trinco:
+                    self.cache[id_utilizador] = utilizador
+        return utilizador
+
+    def invalidar(self, id_utilizador): #Esquece um utilizador (ex: depois de alterar a conta)
+        with self.trinco:
+            self.cache.pop(id_utilizador, None)
@@ -0,0 +1,20 @@
+import importlib  #Para carregar os modelos antes de criar as tabelas
+import click  #Para criar comandos da linha de comandos (flask --app main <comando>)
+from flask.cli import with_appcontext  #Os comandos correm dentro do contexto da aplicação
+
+
+@click.command("criar-bd")
+@with_appcontext
+def criar_bd():  #Cria as tabelas da base de dados (corre uma vez por deploy, e não no arranque de cada worker)
+    from app import db
+    importlib.import_module("app.models")  #Carrega os modelos só para os registar no SQLAlchemy antes de criar as tabelas
+    db.create_all()
+    click.echo("Tabelas criadas.")
+
+
+@click.command("listar-utilizadores")
+@with_appcontext
+def listar_utilizadores():  #Mostra todos os utilizadores registados na base de dados (para depuração)
+    from app.models import Utilizador
+    for utilizador in Utilizador.query.all():
+        click.echo(repr(utilizador))
@@ -0,0 +1,132 @@
+import os #Para construir o caminho dos ficheiros estáticos
+import gzip #Compressão gzip (aceite por todos os navegadores)
+import zlib #Compressão gzip em blocos, para as respostas enviadas aos poucos
+import threading #Para proteger a cache entre pedidos simultâneos
+from cachetools import LRUCache #Cache dos ficheiros já comprimidos, limitada pelo número de bytes
+from flask import request, current_app
+from werkzeug.security import safe_join #Para construir o caminho do ficheiro estático pedido sem sair da pasta
+try:
+    import brotli #Opcional: se estiver instalado, os navegadores que o aceitam recebem brotli (mais pequeno do que gzip)
+except ImportError:
+    brotli = None
+
+TIPOS_COMPRIMIVEIS = {"text/html", "text/css", "text/plain", "text/csv", "text/javascript", "application/javascript", "application/json", "image/svg+xml"} #Formatos de texto (imagens, PDF e ZIP já vêm comprimidos)
+CODIFICACOES = ("br", "gzip") #Codificações usadas (por ordem de preferência); a versão comprimida tem a ETag "<etag>-<codificação>"
+UM_ANO = 365 * 24 * 60 * 60 #Validade da cache no navegador dos estáticos com versão no URL (em segundos)
+
+
+def etag_conhecida(etag): #ETag (simples ou de uma versão comprimida) que o navegador já tem, ou None: permite responder 304 antes de preparar a resposta
+    for candidata in (etag, *(f"{etag}-{codificacao}" for codificacao in CODIFICACOES)):
+        if request.if_none_match.contains(candidata):
+            return candidata
+    return None
+
+
+class Compressao:
+    """Comprime as respostas em brotli ou gzip acima de um tamanho mínimo e define a cache no navegador dos ficheiros estáticos"""
+
+    def __init__(self, app=None):
+        self.minimo = 1024
+        self.nivel_gzip = 6
+        self.nivel_brotli = 5
+        self.cache = LRUCache(maxsize=32 * 1024 * 1024, getsizeof=len) #(ETag, codificação) -> ficheiro comprimido
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração e liga a compressão às respostas (depois de todas as outras alterações às respostas)
+        self.minimo = int(app.config.get("COMPRESSAO_MINIMO_BYTES", 1024))
+        self.nivel_gzip = int(app.config.get("COMPRESSAO_NIVEL_GZIP", 6))
+        self.nivel_brotli = int(app.config.get("COMPRESSAO_NIVEL_BROTLI", 5))
+        self.cache = LRUCache(maxsize=int(app.config.get("COMPRESSAO_CACHE_MB", 32)) * 1024 * 1024, getsizeof=len)
+        app.after_request(self._comprimir)
+        app.after_request(self._cache_estaticos) #Registada depois: o Flask corre-a antes da compressão
+
+    def _codificacao(self): #Melhor codificação aceite pelo navegador (ou None)
+        return request.accept_encodings.best_match(CODIFICACOES if brotli else CODIFICACOES[1:])
+
+    def _comprimir_bytes(self, dados, codificacao):
+        if codificacao == "br":
+            return brotli.compress(dados, quality=self.nivel_brotli)
+        return gzip.compress(dados, compresslevel=self.nivel_gzip, mtime=0) #mtime=0: o mesmo conteúdo dá sempre os mesmos bytes
+
+    def _comprimir_blocos(self, blocos, codificacao): #Comprime uma resposta enviada aos poucos, bloco a bloco (nunca fica toda em memória)
+        if codificacao == "br":
+            compressor = brotli.Compressor(quality=self.nivel_brotli)
+            comprimir, terminar = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.nivel_gzip, zlib.DEFLATED, 31) #31: formato gzip
+            comprimir, terminar = compressor.compress, compressor.flush
+        try:
+            for bloco in blocos:
+                comprimido = comprimir(bloco.encode("utf-8") if isinstance(bloco, str) else bloco)
+                if comprimido:
+                    yield comprimido
+            yield terminar()
+        finally:
+            if hasattr(blocos, "close"):
+                blocos.close()
+
+    def _ficheiro_comprimido(self, resposta, etag, codificacao): #Ficheiros enviados com send_file (estáticos, plotly.js): comprimidos uma vez por versão
+        chave = (etag, codificacao)
+        with self.trinco:
+            comprimido = self.cache.get(chave)
+        if comprimido is None:
+            try:
+                dados = b"".join(resposta.response)
+            finally:
+                resposta.close()
+            comprimido = self._comprimir_bytes(dados, codificacao)
+            with self.trinco:
+                try:
+                    self.cache[chave] = comprimido
+                except ValueError:
+                    pass #Ficheiro maior do que a cache inteira: não é guardado
+        else:
+            resposta.close()
+        return comprimido
+
+    def _comprimir(self, resposta): #Comprime as respostas de texto (HTML, JSON, CSS, JS) quando o navegador aceita
+        codificacao = self._codificacao()
+        if (codificacao is None or request.method == "HEAD" or resposta.status_code != 200
+                or "Content-Encoding" in resposta.headers or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+            return resposta
+        if resposta.content_length is not None and resposta.content_length < self.minimo:
+            return resposta #Respostas pequenas: a compressão não compensa
+        resposta.vary.add("Accept-Encoding")
+
+        etag, fraca = resposta.get_etag()
+        if etag: #A versão comprimida tem uma ETag própria (e continua a poder responder 304)
+            resposta.set_etag(f"{etag}-{codificacao}", weak=fraca)
+            resposta.make_conditional(request)
+            if resposta.status_code == 304:
+                resposta.close() #O navegador já tem esta versão: o ficheiro não é enviado
+                return resposta
+
+        if resposta.direct_passthrough and etag:
+            resposta.direct_passthrough = False
+            resposta.set_data(self._ficheiro_comprimido(resposta, etag, codificacao))
+        elif resposta.is_streamed:
+            resposta.direct_passthrough = False
+            resposta.response = self._comprimir_blocos(resposta.response, codificacao)
+            resposta.headers.pop("Content-Length", None) #O tamanho final só é conhecido no fim (envio em blocos)
+        else:
+            resposta.set_data(self._comprimir_bytes(resposta.get_data(), codificacao))
+        resposta.headers["Content-Encoding"] = codificacao
+        return resposta
+
+    def _cache_estaticos(self, resposta): #Cache no navegador dos ficheiros da pasta static/ (a ETag é definida pelo Flask)
+        if request.endpoint != "static" or resposta.status_code not in (200, 304):
+            return resposta
+        from app.recursos import hash_conteudo
+        resposta.cache_control.public = True
+        caminho = safe_join(current_app.static_folder, request.view_args.get("filename", ""))
+        versao = request.args.get("v")
+        if versao and caminho and os.path.isfile(caminho) and versao == hash_conteudo(caminho):
+            resposta.cache_control.no_cache = None
+            resposta.cache_control.max_age = UM_ANO #O URL muda sempre que o conteúdo muda (url_estatico)
+            resposta.cache_control.immutable = True
+        else:
+            resposta.cache_control.no_cache = True #Sem versão no URL: o navegador confirma com a ETag (304 se não mudou)
+            resposta.cache_control.max_age = None
+        return resposta
@@ -0,0 +1,110 @@
+import json #Para ler os filtros enviados pelo painel
+import numpy as np #Para combinar as condições dos filtros
+import pandas as pd #Para filtrar, agrupar e calcular as estatísticas das colunas
+
+FUNCOES_AGREGACAO = {"soma": "sum", "media": "mean", "contagem": "count"} #Agregações disponíveis no painel (nome -> função do pandas)
+LIMITE_PRINCIPAIS = 50 #Número de valores mais frequentes guardados para as colunas de texto e categorias
+LIMITE_FILTROS = 20 #Número máximo de filtros num pedido
+VALORES_SIMPLES = (str, int, float) #Tipos aceites nos valores e limites dos filtros (bool é um int)
+
+
+class ErroConsulta(ValueError):
+    """Filtro ou agregação inválidos (coluna inexistente, valores que não correspondem ao tipo da coluna, ...)"""
+
+
+def _valor_json(valor): #Converte um valor do pandas/numpy num valor simples para JSON (datas em texto ISO)
+    if valor is None or pd.isna(valor):
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    return valor.item() if isinstance(valor, np.generic) else valor
+
+
+def estatisticas_colunas(df, esquema): #Estatísticas de cada coluna (mínimo/máximo, valores distintos, mais frequentes), calculadas uma vez por conjunto de dados
+    estatisticas = {}
+    for coluna, tipo in esquema.items():
+        serie = df[coluna]
+        info = {"tipo": tipo, "vazios": int(serie.isna().sum())}
+        if tipo in ("numerica", "data"):
+            info["minimo"] = _valor_json(serie.min())
+            info["maximo"] = _valor_json(serie.max())
+            info["distintos"] = int(serie.nunique())
+        else:
+            contagens = serie.value_counts(sort=True) #Numa coluna de categorias as contagens vêm dos códigos (sem comparar texto)
+            contagens = contagens[contagens > 0]
+            info["distintos"] = len(contagens)
+            info["principais"] = [[str(valor), int(total)] for valor, total in contagens.head(LIMITE_PRINCIPAIS).items()]
+        estatisticas[coluna] = info
+    return estatisticas
+
+
+def ler_filtros(texto): #Lê os filtros enviados pelo painel em JSON: [{"coluna", "minimo", "maximo"} ou {"coluna", "valores"}]
+    if not texto:
+        return []
+    try:
+        filtros = json.loads(texto) if isinstance(texto, str) else texto
+    except ValueError:
+        raise ErroConsulta("Filtros inválidos.")
+    if not isinstance(filtros, list) or len(filtros) > LIMITE_FILTROS or not all(_filtro_valido(filtro) for filtro in filtros):
+        raise ErroConsulta("Filtros inválidos.")
+    return filtros
+
+
+def _filtro_valido(filtro): #Verifica a forma de um filtro: nome da coluna em texto, lista de valores simples ou limites simples
+    if not isinstance(filtro, dict) or not isinstance(filtro.get("coluna"), str):
+        return False
+    if "valores" in filtro:
+        valores = filtro["valores"]
+        return valores is None or (isinstance(valores, list) and all(isinstance(valor, VALORES_SIMPLES) for valor in valores)) #Um texto não é uma lista de valores
+    return all(isinstance(filtro.get(limite), VALORES_SIMPLES + (type(None),)) for limite in ("minimo", "maximo"))
+
+
+def _limite(valor, tipo, coluna): #Converte o limite de um intervalo para o tipo da coluna
+    try:
+        return pd.Timestamp(valor) if tipo == "data" else float(valor)
+    except (TypeError, ValueError):
+        raise ErroConsulta(f"Valor inválido no filtro da coluna '{coluna}': {valor}")
+
+
+def _condicao(serie, tipo, filtro): #Máscara das linhas que cumprem um filtro
+    coluna = filtro["coluna"]
+    if "valores" in filtro: #Pertença a um conjunto de valores (categorias e texto)
+        valores = [str(valor) for valor in filtro["valores"] or []]
+        return (serie.astype(str) if tipo in ("numerica", "data") else serie).isin(valores).to_numpy()
+
+    condicao = np.ones(len(serie), dtype=bool)
+    if tipo not in ("numerica", "data"):
+        raise ErroConsulta(f"A coluna '{coluna}' não aceita intervalos.")
+    if filtro.get("minimo") not in (None, ""):
+        condicao &= (serie >= _limite(filtro["minimo"], tipo, coluna)).to_numpy()
+    if filtro.get("maximo") not in (None, ""):
+        maximo = _limite(filtro["maximo"], tipo, coluna)
+        if tipo == "data" and len(str(filtro["maximo"])) == 10: #Só o dia (aaaa-mm-dd): inclui o dia inteiro
+            condicao &= (serie < maximo + pd.Timedelta(days=1)).to_numpy()
+        else:
+            condicao &= (serie <= maximo).to_numpy()
+    return condicao
+
+
+def aplicar_filtros(df, esquema, filtros): #Devolve só as linhas que cumprem todos os filtros (intervalos e pertença a conjuntos)
+    if not filtros:
+        return df
+    mascara = np.ones(len(df), dtype=bool)
+    for filtro in filtros:
+        coluna = filtro["coluna"]
+        if coluna not in df.columns:
+            raise ErroConsulta(f"Coluna '{coluna}' não encontrada.")
+        mascara &= _condicao(df[coluna], esquema.get(coluna, "texto"), filtro)
+    return df if mascara.all() else df[mascara]
+
+
+def verificar_agregacao(df, coluna_y, funcao): #A soma e a média só se aplicam a colunas numéricas (texto e categorias só podem ser contados)
+    if funcao not in FUNCOES_AGREGACAO:
+        raise ErroConsulta(f"Agregação inválida: {funcao}")
+    if funcao != "contagem" and not pd.api.types.is_numeric_dtype(df[coluna_y]):
+        raise ErroConsulta(f"A coluna '{coluna_y}' não é numérica: só pode ser contada.")
+
+
+def agregar(df, coluna_x, coluna_y, funcao="soma"): #Agrupa por X e calcula a soma, a média ou a contagem de Y para cada valor
+    verificar_agregacao(df, coluna_y, funcao)
+    return df.groupby(coluna_x, as_index=False, observed=True, sort=True)[coluna_y].agg(FUNCOES_AGREGACAO[funcao])
@@ -0,0 +1,215 @@
+import os #Para percorrer as pastas e apagar ficheiros
+import json #Para guardar o registo dos ficheiros em uso por cada utilizador
+import time #Para calcular a idade dos ficheiros
+import uuid #Para gerar identificadores sem colisões entre utilizadores
+import threading #O limpador corre numa thread em segundo plano
+from app.metricas import registar #Registos estruturados
+
+TIPOS_PASTA = ("uploads", "graficos", "dados", "tarefas") #Subpastas do espaço de trabalho de cada utilizador
+PREFIXO_RECECAO = ".recebido-" #Ficheiros ainda em receção (nunca são apagados para libertar espaço)
+NOME_REFERENCIAS = "referencias.json" #Registo dos ficheiros em uso por cada utilizador (lido por todos os workers e pelo limpador)
+
+
+def caminho_espaco(raiz, id_utilizador, tipo): #Pasta de um tipo de ficheiros dentro do espaço de trabalho de um utilizador
+    return os.path.join(raiz, str(int(id_utilizador)), tipo)
+
+
+def novo_id(): #Identificador único (não depende de contadores da sessão, por isso não colide entre utilizadores)
+    return uuid.uuid4().hex
+
+
+def _ficheiros(pasta): #Lista (data de modificação, tamanho, caminho) de todos os ficheiros dentro de uma pasta
+    ficheiros = []
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in nomes:
+            caminho = os.path.join(raiz, nome)
+            try:
+                estado = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            ficheiros.append((estado.st_mtime, estado.st_size, caminho))
+    return ficheiros
+
+
+def _protegido(caminho, protegidos): #Ficheiros que as quotas nunca apagam: em receção, estado das tarefas, registo de referências e os referenciados (dados atuais, uploads de onde vieram, gráficos)
+    nome = os.path.basename(caminho)
+    return (nome.startswith(PREFIXO_RECECAO) or nome == NOME_REFERENCIAS
+            or os.path.basename(os.path.dirname(caminho)) == "tarefas" or os.path.normpath(caminho) in protegidos)
+
+
+def _contados(ficheiros): #Ficheiros contados nas quotas (os que estão em receção são contados na sua própria reserva e o registo de referências é desprezável)
+    return [f for f in ficheiros if not os.path.basename(f[2]).startswith(PREFIXO_RECECAO) and os.path.basename(f[2]) != NOME_REFERENCIAS]
+
+
+def _apagar_mais_antigos(ficheiros, total, limite, protegidos=frozenset()): #Apaga os ficheiros mais antigos (exceto os protegidos) até o total ficar abaixo do limite; devolve o novo total
+    for _, tamanho, caminho in sorted(ficheiros):
+        if total <= limite:
+            break
+        if _protegido(caminho, protegidos):
+            continue
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except FileNotFoundError:
+            pass
+    return total
+
+
+class EspacosTrabalho:
+    """Pastas isoladas por utilizador (uploads, gráficos, dados e tarefas), com limpeza automática por idade e quotas de disco"""
+
+    def __init__(self, app=None):
+        self.raiz = "espacos_trabalho"
+        self.idade_maxima = 24 * 60 * 60
+        self.quota_utilizador = 1024 * 1024 * 1024
+        self.quota_global = 10 * 1024 * 1024 * 1024
+        self.intervalo = 600
+        self.limpador = None
+        self.ocupado = {} #Bytes ocupados por utilizador (contados no arranque, atualizados a cada escrita e acertados pelo limpador)
+        self.referenciado = {} #Bytes dos ficheiros referenciados por utilizador (não podem ser apagados para libertar espaço)
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação e arranca o limpador
+        self.raiz = app.config.get("PASTA_ESPACOS", self.raiz)
+        self.idade_maxima = int(app.config.get("ESPACOS_IDADE_MAXIMA_HORAS", 24)) * 60 * 60
+        self.quota_utilizador = int(app.config.get("ESPACOS_QUOTA_UTILIZADOR_MB", 1024)) * 1024 * 1024
+        self.quota_global = int(app.config.get("ESPACOS_QUOTA_GLOBAL_MB", 10240)) * 1024 * 1024
+        self.intervalo = int(app.config.get("ESPACOS_INTERVALO_LIMPEZA", 600))
+        os.makedirs(self.raiz, exist_ok=True) #Garante que a pasta existe; se não existir, é criada
+        self.contar_tudo() #Única vez em que os pedidos esperam por uma leitura de todas as pastas (depois, só o limpador as percorre)
+        if self.intervalo > 0 and self.limpador is None:
+            self.limpador = threading.Thread(target=self._limpar_periodicamente, daemon=True)
+            self.limpador.start()
+            if hasattr(os, "register_at_fork"): #Não existe no Windows (onde também não há fork)
+                os.register_at_fork(after_in_child=self._apos_fork)
+
+    def _apos_fork(self): #Nos workers criados com fork (gunicorn com preload) o limpador continua só no processo principal
+        self.trinco = threading.Lock() #O trinco pode ter sido copiado fechado pela thread do limpador
+        self.limpador = None
+
+    def pasta(self, id_utilizador, tipo): #Pasta de um utilizador para um tipo de ficheiros (criada se não existir)
+        caminho = caminho_espaco(self.raiz, id_utilizador, tipo)
+        os.makedirs(caminho, exist_ok=True)
+        return caminho
+
+    def _pasta_utilizador(self, id_utilizador):
+        return os.path.join(self.raiz, str(int(id_utilizador)))
+
+    def referenciar(self, id_utilizador, caminhos): #Regista os ficheiros em uso pelo utilizador (dados atuais, uploads de onde vieram, gráficos); o registo fica em disco para ser lido por todos os workers
+        pasta = self._pasta_utilizador(id_utilizador)
+        relativos, tamanho = [], 0
+        for caminho in dict.fromkeys(caminhos):
+            try:
+                tamanho += os.stat(caminho).st_size
+            except (FileNotFoundError, TypeError):
+                continue
+            relativos.append(os.path.relpath(caminho, pasta))
+        os.makedirs(pasta, exist_ok=True)
+        destino = os.path.join(pasta, NOME_REFERENCIAS)
+        temporario = f"{destino}.{novo_id()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"ficheiros": relativos, "bytes": tamanho}, f)
+        os.replace(temporario, destino)
+        with self.trinco:
+            self.referenciado[str(int(id_utilizador))] = tamanho
+
+    def _referencias(self, pasta): #Ficheiros referenciados por um utilizador (um registo sem alterações há mais do que a idade máxima já não protege nada)
+        caminho = os.path.join(pasta, NOME_REFERENCIAS)
+        try:
+            if os.stat(caminho).st_mtime < time.time() - self.idade_maxima:
+                return set(), 0
+            with open(caminho, "r", encoding="utf-8") as f:
+                registo = json.load(f)
+            return {os.path.normpath(os.path.join(pasta, relativo)) for relativo in registo["ficheiros"]}, int(registo["bytes"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return set(), 0
+
+    def _todas_referencias(self): #Ficheiros referenciados por todos os utilizadores
+        protegidos = set()
+        for utilizador in os.scandir(self.raiz):
+            if utilizador.is_dir():
+                protegidos |= self._referencias(utilizador.path)[0]
+        return protegidos
+
+    def contar_tudo(self): #Volta a contar o espaço ocupado e referenciado de cada utilizador percorrendo as pastas (arranque e limpador; nunca nos pedidos)
+        ocupado, referenciado = {}, {}
+        for utilizador in os.scandir(self.raiz):
+            if utilizador.is_dir():
+                ocupado[utilizador.name] = sum(f[1] for f in _contados(_ficheiros(utilizador.path)))
+                referenciado[utilizador.name] = self._referencias(utilizador.path)[1]
+        with self.trinco:
+            self.ocupado, self.referenciado = ocupado, referenciado
+
+    def contar(self, id_utilizador, tamanho): #Atualiza o espaço ocupado depois de escrever (tamanho positivo) ou apagar (negativo) um ficheiro
+        with self.trinco:
+            chave = str(int(id_utilizador))
+            self.ocupado[chave] = max(0, self.ocupado.get(chave, 0) + tamanho)
+
+    def uso(self, id_utilizador): #Espaço ocupado pelo utilizador (em bytes)
+        with self.trinco:
+            return self.ocupado.get(str(int(id_utilizador)), 0)
+
+    def disponivel(self, id_utilizador): #Bytes que o utilizador ainda pode escrever, contando que os ficheiros não referenciados podem ser apagados
+        with self.trinco:
+            referenciado_utilizador = self.referenciado.get(str(int(id_utilizador)), 0)
+            referenciado_global = sum(self.referenciado.values())
+        return max(0, min(self.quota_utilizador - referenciado_utilizador, self.quota_global - referenciado_global))
+
+    def reservar(self, id_utilizador, tamanho): #Reserva "tamanho" bytes nas quotas; só se faltar espaço percorre as pastas e apaga os ficheiros mais antigos que não estão em uso
+        chave = str(int(id_utilizador))
+        with self.trinco:
+            if self.ocupado.get(chave, 0) + tamanho > self.quota_utilizador:
+                pasta = self._pasta_utilizador(id_utilizador)
+                ficheiros = _contados(_ficheiros(pasta))
+                self.ocupado[chave] = _apagar_mais_antigos(ficheiros, sum(f[1] for f in ficheiros), self.quota_utilizador - tamanho, self._referencias(pasta)[0])
+                if self.ocupado[chave] + tamanho > self.quota_utilizador:
+                    return False
+            if sum(self.ocupado.values()) + tamanho > self.quota_global:
+                ficheiros = _contados(_ficheiros(self.raiz))
+                _apagar_mais_antigos(ficheiros, sum(f[1] for f in ficheiros), self.quota_global - tamanho, self._todas_referencias())
+                self.ocupado = {utilizador.name: sum(f[1] for f in _contados(_ficheiros(utilizador.path)))
+                                for utilizador in os.scandir(self.raiz) if utilizador.is_dir()}
+                if sum(self.ocupado.values()) + tamanho > self.quota_global:
+                    return False
+            self.ocupado[chave] = self.ocupado.get(chave, 0) + tamanho
+            return True
+
+    def limpar(self, id_utilizador, tipo): #Apaga todos os ficheiros de um tipo do utilizador (ex: os seus gráficos)
+        pasta = caminho_espaco(self.raiz, id_utilizador, tipo)
+        for _, tamanho, caminho in _ficheiros(pasta):
+            try:
+                os.remove(caminho)
+                self.contar(id_utilizador, -tamanho)
+            except FileNotFoundError:
+                pass
+
+    def limpar_antigos(self): #Apaga os ficheiros expirados e não referenciados, aplica as quotas por utilizador e global e acerta os contadores
+        limite_idade = time.time() - self.idade_maxima
+        protegidos_todos = set()
+        for utilizador in os.scandir(self.raiz):
+            if not utilizador.is_dir():
+                continue
+            protegidos = self._referencias(utilizador.path)[0] #Lido antes da limpeza por idade (o próprio registo pode ter expirado)
+            protegidos_todos |= protegidos
+            for _, _, caminho in _ficheiros(utilizador.path):
+                try:
+                    if os.path.normpath(caminho) not in protegidos and os.stat(caminho).st_mtime < limite_idade:
+                        os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+            ficheiros = _ficheiros(utilizador.path)
+            _apagar_mais_antigos(ficheiros, sum(f[1] for f in ficheiros), self.quota_utilizador, protegidos)
+
+        ficheiros = _ficheiros(self.raiz)
+        _apagar_mais_antigos(ficheiros, sum(f[1] for f in ficheiros), self.quota_global, protegidos_todos)
+        self.contar_tudo()
+
+    def _limpar_periodicamente(self): #Ciclo do limpador (thread em segundo plano)
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.limpar_antigos()
+            except Exception as e:
+                registar("erro_limpeza_espacos", erro=str(e), nivel="error")
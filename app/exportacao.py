@@ -0,0 +1,104 @@
+import os #Para saber em que processo a pool foi criada
+import atexit #Para terminar os processos da pool quando a aplicação termina
+import hashlib #Para identificar cada figura pelo seu conteúdo
+import threading #Para proteger a pool e a cache entre pedidos simultâneos
+import multiprocessing #Para criar os processos de renderização
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado #Pool de processos que ficam ativos entre pedidos
+from concurrent.futures.process import BrokenProcessPool #Erro quando um processo da pool termina inesperadamente
+from cachetools import LRUCache #Cache que descarta os elementos usados há mais tempo
+
+FORMATOS_EXPORTACAO = {"png": "image/png", "pdf": "application/pdf"} #Formatos aceites e respetivos tipos MIME
+TEMPO_MAXIMO_RENDERIZACAO = 120 #Segundos que um pedido espera por uma imagem
+
+
+class ErroExportacao(RuntimeError):
+    """A imagem não foi gerada (a renderização demorou demasiado ou um processo da pool terminou)"""
+
+
+def _aquecer(): #Corre uma vez em cada processo: arranca o kaleido (e o Chromium) antes do primeiro pedido
+    import plotly.graph_objects as go
+    go.Figure().to_image(format="png")
+
+
+def _pronto(): #Tarefa vazia usada para arrancar os processos logo quando a pool é criada
+    return os.getpid()
+
+
+def _renderizar(figura_json, formato): #Corre num processo da pool: converte a figura (JSON) em PNG/PDF
+    import plotly.io as pio
+    return pio.from_json(figura_json).to_image(format=formato)
+
+
+class PoolRenderizacao:
+    """Processos de exportação de imagens que ficam ativos entre pedidos, com cache das imagens já geradas"""
+
+    def __init__(self, app=None):
+        self.processos = 2
+        self.cache = LRUCache(maxsize=64 * 1024 * 1024, getsizeof=len)
+        self.pool = None
+        self.pid = None #Processo onde a pool foi criada (cada worker do gunicorn tem a sua)
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação (número de processos e memória da cache)
+        self.processos = int(app.config.get("EXPORTACAO_PROCESSOS", 2))
+        self.cache = LRUCache(maxsize=int(app.config.get("EXPORTACAO_CACHE_MB", 64)) * 1024 * 1024, getsizeof=len)
+
+    def _obter_pool(self): #Cria a pool na primeira utilização (e volta a criá-la se tiver falhado)
+        with self.trinco:
+            if self.pool is None or self.pid != os.getpid():
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.processos,
+                    mp_context=multiprocessing.get_context("spawn"), #Processos novos (não copiam o estado do servidor web)
+                    initializer=_aquecer
+                )
+                self.pid = os.getpid()
+                for _ in range(self.processos):
+                    self.pool.submit(_pronto) #Arranca já todos os processos
+                atexit.register(self.pool.shutdown, wait=False, cancel_futures=True)
+            return self.pool
+
+    def _descartar_pool(self, pool, terminar=False): #Descarta uma pool avariada para que a próxima utilização crie uma nova (terminar: mata também os processos bloqueados)
+        with self.trinco:
+            if self.pool is pool:
+                self.pool = None
+        if terminar:
+            for processo in list((pool._processes or {}).values()): #O shutdown não interrompe uma renderização que nunca acaba
+                processo.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _chave(self, figura_json, formato):
+        return (hashlib.sha256(figura_json.encode("utf-8")).hexdigest(), formato)
+
+    def renderizar_varias(self, figuras, formato): #Converte várias figuras (JSON) em paralelo; devolve os bytes pela mesma ordem
+        resultados = [None] * len(figuras)
+        pendentes = {}
+        for indice, figura_json in enumerate(figuras):
+            chave = self._chave(figura_json, formato)
+            with self.trinco:
+                resultados[indice] = self.cache.get(chave) #Imagens já geradas não voltam a ser renderizadas
+            if resultados[indice] is None:
+                pendentes[indice] = chave
+
+        if pendentes:
+            pool = self._obter_pool()
+            try:
+                futuros = {indice: pool.submit(_renderizar, figuras[indice], formato) for indice in pendentes}
+                for indice, futuro in futuros.items():
+                    resultados[indice] = futuro.result(timeout=TEMPO_MAXIMO_RENDERIZACAO)
+                    with self.trinco:
+                        try:
+                            self.cache[pendentes[indice]] = resultados[indice]
+                        except ValueError:
+                            pass #Imagem maior do que a cache inteira: não é guardada
+            except BrokenProcessPool as e:
+                self._descartar_pool(pool)
+                raise ErroExportacao("Um processo de exportação terminou inesperadamente.") from e
+            except TempoEsgotado as e:
+                self._descartar_pool(pool, terminar=True)
+                raise ErroExportacao(f"A exportação demorou mais de {TEMPO_MAXIMO_RENDERIZACAO} segundos.") from e
+        return resultados
+
+    def renderizar(self, figura_json, formato): #Converte uma figura (JSON) em PNG/PDF
+        return self.renderizar_varias([figura_json], formato)[0]
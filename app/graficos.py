@@ -0,0 +1,155 @@
+import os #Para substituir os ficheiros dos gráficos de forma atómica
+import json #Para o cabeçalho dos gráficos guardados em disco
+import base64 #Os arrays dos traços chegam (e são devolvidos) em base64 no JSON do plotly
+import struct #Para escrever o tamanho do cabeçalho em binário
+import numpy as np #Para cálculos vetorizados na redução dos dados
+import pandas as pd #Para agrupar e verificar os tipos das colunas
+from app.consultas import agregar #Agrupa por X com a soma, média ou contagem de Y
+
+TIPOS_GRAFICOS = ("Barras", "Linhas", "Pizza") #Tipos de gráficos disponíveis no painel
+LAYOUT_GRAFICO = dict(width=800, height=500, margin=dict(l=50, r=50, t=50, b=50)) #Tamanho e margens de todos os gráficos
+LIMITE_PONTOS = 2000 #Número máximo de pontos/barras enviados para o gráfico
+LIMITE_FATIAS = 12 #Número máximo de fatias num gráfico circular (as restantes juntam-se em "Outros")
+NOME_OUTROS = "Outros" #Nome da categoria que junta os valores que não cabem no gráfico
+MAGIA_FIGURA = b"GRAFICO1" #Assinatura no início dos ficheiros de gráficos (identifica o formato e a versão)
+ALINHAMENTO = 64 #Alinhamento (em bytes) dos arrays dentro do ficheiro
+
+
+def lttb(x, y, limite): #Largest-Triangle-Three-Buckets: escolhe os pontos que mantêm a forma da série
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    indices = np.empty(limite, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1 #O primeiro e o último ponto são sempre mantidos
+    limites = np.linspace(1, n - 1, limite - 1).astype(np.int64) #Divisão dos pontos do meio em (limite - 2) grupos
+    anterior = 0
+    for i in range(limite - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        proximo_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[fim:proximo_fim].mean() #Média do grupo seguinte
+        media_y = y[fim:proximo_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior]) - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas)) #Ponto do grupo que forma o maior triângulo
+        indices[i + 1] = anterior
+    return indices
+
+
+def _principais_e_outros(agrupado, coluna_x, coluna_y, limite): #Mantém as (limite - 1) categorias com maior valor e junta as restantes em "Outros"
+    if len(agrupado) <= limite:
+        return agrupado
+    ordenado = agrupado.sort_values(coluna_y, ascending=False, kind="stable")
+    principais = ordenado.iloc[:limite - 1].copy()
+    principais[coluna_x] = principais[coluna_x].astype(str)
+    outros = pd.DataFrame({coluna_x: [NOME_OUTROS], coluna_y: [ordenado[coluna_y].iloc[limite - 1:].sum()]})
+    return pd.concat([principais, outros], ignore_index=True)
+
+
+def _reduzir_serie(agrupado, coluna_x, coluna_y, limite, continuo=True): #Reduz uma série ordenada por X com o LTTB
+    if len(agrupado) <= limite:
+        return agrupado
+    if continuo:
+        x = agrupado[coluna_x]
+        x = (x.astype("int64") if pd.api.types.is_datetime64_any_dtype(x) else x).to_numpy(dtype="float64")
+    else:
+        x = np.arange(len(agrupado), dtype="float64") #Eixo de texto/categorias: os pontos são reduzidos pela sua posição
+    indices = lttb(x, agrupado[coluna_y].fillna(0).to_numpy(dtype="float64"), limite)
+    return agrupado.iloc[indices]
+
+
+def reduzir_dados(df, tipo, coluna_x, coluna_y, limite_pontos=LIMITE_PONTOS, agregacao="soma"): #Agrega e reduz os dados para que o gráfico tenha um tamanho limitado
+    agrupado = agregar(df, coluna_x, coluna_y, agregacao)
+    if tipo == "Pizza":
+        return _principais_e_outros(agrupado, coluna_x, coluna_y, min(LIMITE_FATIAS, limite_pontos))
+    eixo_continuo = pd.api.types.is_datetime64_any_dtype(agrupado[coluna_x]) or pd.api.types.is_numeric_dtype(agrupado[coluna_x])
+    if eixo_continuo:
+        return _reduzir_serie(agrupado, coluna_x, coluna_y, limite_pontos) #Séries (datas/números): mantém a forma da curva
+    if tipo == "Linhas":
+        return _reduzir_serie(agrupado, coluna_x, coluna_y, limite_pontos, continuo=False) #Linhas com X de texto: mantém a forma pela ordem dos valores
+    return _principais_e_outros(agrupado, coluna_x, coluna_y, limite_pontos) #Barras de categorias: as maiores + "Outros"
+
+
+def construir_figura(df, tipo, coluna_x, coluna_y, limite_pontos=LIMITE_PONTOS, agregacao="soma"): #Cria a figura do tipo pedido (ou None se o tipo não existir)
+    if tipo not in TIPOS_GRAFICOS:
+        return None
+    import plotly.express as px #Para criação de gráficos (importado só aqui: é a biblioteca mais lenta a carregar)
+    dados = reduzir_dados(df, tipo, coluna_x, coluna_y, limite_pontos, agregacao) #Nunca são enviadas mais linhas do que o limite de pontos
+
+    if tipo == "Barras":
+        fig = px.bar(dados, x=coluna_x, y=coluna_y)
+    elif tipo == "Linhas":
+        fig = px.line(dados, x=coluna_x, y=coluna_y)
+    else:
+        fig = px.pie(dados, names=coluna_x, values=coluna_y)
+
+    #Configurar layout do gráfico
+    fig.update_layout(**LAYOUT_GRAFICO)
+    return fig
+
+
+def _separar_buffers(valor, buffers): #Substitui os arrays binários do plotly ({"dtype", "bdata"}) por referências para buffers guardados à parte
+    if isinstance(valor, dict):
+        if "bdata" in valor and "dtype" in valor:
+            buffers.append(base64.b64decode(valor["bdata"]))
+            return {**{chave: v for chave, v in valor.items() if chave != "bdata"}, "buffer": len(buffers) - 1}
+        return {chave: _separar_buffers(v, buffers) for chave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_separar_buffers(v, buffers) for v in valor]
+    return valor
+
+
+def _juntar_buffers(valor, buffers): #Operação inversa: volta a colocar cada buffer (em base64) no sítio da sua referência
+    if isinstance(valor, dict):
+        if "buffer" in valor and "dtype" in valor:
+            return {**{chave: v for chave, v in valor.items() if chave != "buffer"}, "bdata": base64.b64encode(buffers[valor["buffer"]]).decode("ascii")}
+        return {chave: _juntar_buffers(v, buffers) for chave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_juntar_buffers(v, buffers) for v in valor]
+    return valor
+
+
+def _alinhar(posicao): #Próxima posição alinhada (os buffers começam sempre em múltiplos de ALINHAMENTO)
+    return -(-posicao // ALINHAMENTO) * ALINHAMENTO
+
+
+def guardar_figura(caminho, figura_json): #Guarda a figura num ficheiro binário: cabeçalho JSON pequeno (layout e estrutura) + arrays dos traços em binário
+    buffers = []
+    figura = _separar_buffers(json.loads(figura_json), buffers)
+
+    posicoes = []
+    posicao = 0
+    for buffer in buffers:
+        posicoes.append(posicao)
+        posicao = _alinhar(posicao + len(buffer))
+    cabecalho = json.dumps({"figura": figura, "buffers": [[p, len(b)] for p, b in zip(posicoes, buffers)]}).encode("utf-8")
+    inicio = _alinhar(len(MAGIA_FIGURA) + 8 + len(cabecalho)) #Os buffers começam depois do cabeçalho
+
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(MAGIA_FIGURA)
+        f.write(struct.pack("<Q", len(cabecalho)))
+        f.write(cabecalho)
+        for p, buffer in zip(posicoes, buffers):
+            f.seek(inicio + p)
+            f.write(buffer)
+    os.replace(temporario, caminho) #Só fica visível depois de escrito por completo
+
+
+def carregar_figura(caminho): #Devolve o JSON do gráfico guardado (o plotly e o kaleido recebem os arrays em base64, por isso o ficheiro é lido de uma vez)
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    fim_magia = len(MAGIA_FIGURA) + 8
+    if len(conteudo) < fim_magia or conteudo[:len(MAGIA_FIGURA)] != MAGIA_FIGURA:
+        raise ValueError(f"Formato de gráfico inválido: {caminho}")
+    tamanho, = struct.unpack_from("<Q", conteudo, len(MAGIA_FIGURA))
+    if fim_magia + tamanho > len(conteudo):
+        raise ValueError(f"Ficheiro de gráfico incompleto: {caminho}")
+    cabecalho = json.loads(conteudo[fim_magia:fim_magia + tamanho])
+    inicio = _alinhar(fim_magia + tamanho)
+
+    dados = memoryview(conteudo) #Fatias sem cópia: cada buffer só é copiado ao ser codificado em base64
+    buffers = []
+    for p, n in cabecalho["buffers"]:
+        if inicio + p + n > len(conteudo):
+            raise ValueError(f"Ficheiro de gráfico incompleto: {caminho}")
+        buffers.append(dados[inicio + p:inicio + p + n])
+    return json.dumps(_juntar_buffers(cabecalho["figura"], buffers))
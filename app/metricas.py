@@ -0,0 +1,172 @@
+import json #Para escrever os registos como uma linha JSON por evento
+import hmac #Para comparar o token de /metrics em tempo constante
+import time #Para medir a duração dos pedidos e das etapas
+import bisect #Para encontrar o intervalo (bucket) de cada valor nos histogramas
+import logging #Registos estruturados (substituem os print de depuração)
+import threading #Para proteger os histogramas entre pedidos simultâneos
+from contextlib import contextmanager #Para medir etapas com "with metricas.etapa(...)"
+from flask import request, g, abort, Response, before_render_template, template_rendered
+
+registo = logging.getLogger("app") #Registo usado por todos os módulos da aplicação
+
+PREFIXO = "painel_" #Prefixo dos nomes das métricas no formato Prometheus
+LIMITES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60) #Intervalos dos histogramas de duração (segundos)
+LIMITES_TAMANHO = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000, 1_000_000_000) #Intervalos dos histogramas de tamanhos (bytes ou linhas)
+ENDERECOS_LOCAIS = ("127.0.0.1", "::1") #Endereços que podem consultar /metrics
+CABECALHOS_PROXY = ("X-Forwarded-For", "X-Real-IP", "Forwarded") #Pedidos que chegam através de um proxy (o endereço de origem é o do proxy, não o do cliente)
+ROTAS_PERIODICAS = ("/tarefas/<id_tarefa>", "/metrics") #Rotas consultadas periodicamente (registadas só em DEBUG para não encher o registo)
+DESCRICOES = { #Texto de ajuda e intervalos de cada métrica
+    "pedido_duracao_segundos": ("Duração dos pedidos HTTP por rota", LIMITES_DURACAO),
+    "resposta_bytes": ("Tamanho das respostas HTTP por rota", LIMITES_TAMANHO),
+    "etapa_duracao_segundos": ("Duração de cada etapa do processamento (leitura, inferência, gráficos, HTML, exportação)", LIMITES_DURACAO),
+    "tamanho": ("Tamanho dos ficheiros, dados e figuras processados", LIMITES_TAMANHO),
+}
+
+
+class FormatoJSON(logging.Formatter):
+    """Escreve cada registo numa linha JSON (evento, nível e campos extra)"""
+
+    def format(self, record):
+        dados = {
+            "hora": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "nivel": record.levelname,
+            "evento": record.getMessage(),
+            **getattr(record, "campos", {})
+        }
+        if record.exc_info:
+            dados["erro"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def configurar_registo(nivel="INFO"): #Liga o registo da aplicação à saída de erros, em JSON (uma vez por processo)
+    if not registo.handlers:
+        saida = logging.StreamHandler()
+        saida.setFormatter(FormatoJSON())
+        registo.addHandler(saida)
+        registo.propagate = False
+    registo.setLevel(str(nivel).upper())
+
+
+def registar(evento, nivel="info", **campos): #Escreve um evento no registo com campos estruturados
+    registo.log(getattr(logging, nivel.upper()), evento, extra={"campos": campos})
+
+
+class Histograma:
+    """Contagens por intervalo, soma e total de um conjunto de observações"""
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1) #O último intervalo é o +Inf
+        self.soma = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+
+
+def _escapar(valor): #Escapa os caracteres especiais dos valores das etiquetas
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas, extra=()): #Etiquetas no formato Prometheus: {rota="/x",metodo="GET"}
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in (*etiquetas, *extra)]
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Metricas:
+    """Mede a latência de cada rota e a duração de cada etapa, e expõe os valores em /metrics (formato Prometheus).
+
+    Os valores são guardados em memória, por processo: com vários workers do gunicorn cada um expõe as suas métricas."""
+
+    def __init__(self, app=None):
+        self.histogramas = {} #(nome, etiquetas) -> Histograma
+        self.apenas_local = True
+        self.token = None #Token exigido em /metrics (Authorization: Bearer ...), se configurado
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Configura os registos e liga a medição dos pedidos e dos templates à aplicação
+        configurar_registo(app.config.get("NIVEL_REGISTO", "INFO"))
+        self.apenas_local = bool(app.config.get("METRICAS_APENAS_LOCAL", True))
+        self.token = app.config.get("METRICAS_TOKEN") or None
+        app.before_request(self._inicio_pedido)
+        app.after_request(self._fim_pedido)
+        before_render_template.connect(self._inicio_html, app)
+        template_rendered.connect(self._fim_html, app)
+        app.add_url_rule("/metrics", "metricas", self.exportar)
+
+    def _observar(self, nome, etiquetas, valor):
+        with self.trinco:
+            histograma = self.histogramas.get((nome, etiquetas))
+            if histograma is None:
+                histograma = self.histogramas[(nome, etiquetas)] = Histograma(DESCRICOES[nome][1])
+            histograma.observar(valor)
+
+    def observar_etapa(self, etapa, segundos, **campos): #Regista a duração de uma etapa já medida (ex: nos processos de leitura)
+        self._observar("etapa_duracao_segundos", (("etapa", etapa),), segundos)
+        registar("etapa", etapa=etapa, duracao_ms=round(segundos * 1000, 2), **campos)
+
+    def observar_tamanho(self, medida, valor): #Regista um tamanho (bytes de um ficheiro, linhas de um conjunto de dados, ...)
+        self._observar("tamanho", (("medida", medida),), valor)
+
+    @contextmanager
+    def etapa(self, nome, **campos): #Mede a duração do bloco "with"; o dicionário devolvido aceita campos extra para o registo
+        inicio = time.perf_counter()
+        try:
+            yield campos
+        finally:
+            self.observar_etapa(nome, time.perf_counter() - inicio, **campos)
+
+    def _inicio_pedido(self):
+        g.inicio_pedido = time.perf_counter()
+
+    def _fim_pedido(self, resposta): #Regista a latência e o tamanho da resposta de cada pedido
+        inicio = g.pop("inicio_pedido", None)
+        if inicio is None:
+            return resposta
+        duracao = time.perf_counter() - inicio
+        rota = request.url_rule.rule if request.url_rule else "desconhecida" #Rota (e não o URL) para não criar uma métrica por identificador
+        self._observar("pedido_duracao_segundos", (("rota", rota), ("metodo", request.method), ("estado", resposta.status_code)), duracao)
+        if resposta.content_length is not None:
+            self._observar("resposta_bytes", (("rota", rota),), resposta.content_length)
+        registar("pedido", nivel="debug" if rota in ROTAS_PERIODICAS else "info", rota=rota, metodo=request.method, estado=resposta.status_code, duracao_ms=round(duracao * 1000, 2), bytes=resposta.content_length)
+        return resposta
+
+    def _inicio_html(self, app, template, context, **extra): #Início da serialização de um template em HTML
+        g.inicio_html = time.perf_counter()
+
+    def _fim_html(self, app, template, context, **extra):
+        inicio = g.pop("inicio_html", None)
+        if inicio is not None:
+            self.observar_etapa("html", time.perf_counter() - inicio, template=template.name)
+
+    def texto(self): #Todas as métricas no formato de texto do Prometheus
+        with self.trinco:
+            copias = sorted(((nome, etiquetas, list(h.contagens), h.soma) for (nome, etiquetas), h in self.histogramas.items()), key=lambda c: str(c[:2]))
+        linhas = []
+        for nome in DESCRICOES:
+            descricao, limites = DESCRICOES[nome]
+            linhas.append(f"# HELP {PREFIXO}{nome} {descricao}")
+            linhas.append(f"# TYPE {PREFIXO}{nome} histogram")
+            for _, etiquetas, contagens, soma in (c for c in copias if c[0] == nome):
+                acumulado = 0
+                for limite, contagem in zip((*limites, "+Inf"), contagens):
+                    acumulado += contagem
+                    linhas.append(f"{PREFIXO}{nome}_bucket{_etiquetas(etiquetas, (('le', limite),))} {acumulado}")
+                linhas.append(f"{PREFIXO}{nome}_sum{_etiquetas(etiquetas)} {soma}")
+                linhas.append(f"{PREFIXO}{nome}_count{_etiquetas(etiquetas)} {acumulado}")
+        return "\n".join(linhas) + "\n"
+
+    def _autorizado(self): #Com token, só o token conta; sem token, só pedidos feitos na própria máquina e sem passar por um proxy
+        if self.token:
+            esperado = f"Bearer {self.token}".encode("utf-8")
+            return hmac.compare_digest(request.headers.get("Authorization", "").encode("utf-8"), esperado)
+        if not self.apenas_local:
+            return True
+        return request.remote_addr in ENDERECOS_LOCAIS and not any(cabecalho in request.headers for cabecalho in CABECALHOS_PROXY)
+
+    def exportar(self): #Rota /metrics (por omissão só responde a pedidos feitos na própria máquina; ver METRICAS_TOKEN no DEPLOY.md)
+        if not self._autorizado():
+            abort(404)
+        return Response(self.texto(), mimetype="text/plain; version=0.0.4")
@@ -1,9 +1,24 @@
-from app import db, login_manager  #Importa a base de dados e o sistema de login da app
+from app import db, login_manager, cache_utilizadores  #Importa a base de dados, o sistema de login da app e a cache de utilizadores
 from flask_login import UserMixin  #Classe que adiciona funcionalidades essenciais ao modelo de utilizador (como is_authenticated)
+from sqlalchemy import event  #Para saber quando uma conta é alterada ou apagada
+from sqlalchemy.orm import make_transient_to_detached  #Para reconstruir o utilizador a partir dos valores guardados na cache
+
+COLUNAS_CACHE = ("id", "nome", "email", "senha")  #Valores guardados na cache (simples: não expiram quando a sessão faz commit)
+
+
+def _ler_utilizador(id_utilizador):  #Lê o utilizador da base de dados e devolve só os valores das colunas
+    utilizador = db.session.get(Utilizador, id_utilizador)
+    return {coluna: getattr(utilizador, coluna) for coluna in COLUNAS_CACHE} if utilizador is not None else None
+
 
 @login_manager.user_loader
 def load_user(user_id):  #Esta função carrega o utilizador com base no ID (obrigatória para o Flask-Login)
-    return Utilizador.query.get(int(user_id))  #Vai à base de dados buscar o utilizador com o ID indicado
+    valores = cache_utilizadores.obter(int(user_id), _ler_utilizador)  #Só vai à base de dados se o utilizador não estiver na cache
+    if valores is None:
+        return None
+    utilizador = Utilizador(**valores)  #Nova instância em cada pedido, com todos os valores já carregados
+    make_transient_to_detached(utilizador)
+    return db.session.merge(utilizador, load=False)  #Liga-a à sessão deste pedido sem fazer nenhuma consulta
 
 
 class Utilizador(db.Model, UserMixin):  #Criação da tabela 'utilizador' na base de dados, com suporte a login
@@ -14,3 +29,9 @@ class Utilizador(db.Model, UserMixin):  #Criação da tabela 'utilizador' na bas
 
     def __repr__(self):  #Função que define o formato do objeto ao imprimir (para depuração)
         return f"Utilizador('{self.nome}', '{self.email}')"  #Mostra o nome e email do utilizador
+
+
+@event.listens_for(Utilizador, "after_update")
+@event.listens_for(Utilizador, "after_delete")
+def invalidar_utilizador(mapper, ligacao, utilizador):  #Remove da cache as contas alteradas ou apagadas (os outros workers esquecem-nas quando o tempo de vida expira)
+    cache_utilizadores.invalidar(utilizador.id)
@@ -0,0 +1,35 @@
+import os #Para construir caminhos
+import hashlib #Para calcular a impressão digital (hash) do conteúdo dos recursos
+from functools import lru_cache #Para calcular cada hash uma única vez por processo
+from flask import Blueprint, send_file, abort, url_for #Funções do Flask para servir ficheiros e criar URLs
+import plotly #Só usado para localizar a cópia do plotly.js que vem com o pacote
+
+recursos = Blueprint('recursos', __name__) #Rotas para recursos estáticos servidos com cache de longa duração
+
+CAMINHO_PLOTLY = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js") #plotly.js incluído no pacote Python
+UM_ANO = 365 * 24 * 60 * 60 #Validade da cache no navegador (em segundos)
+
+
+@lru_cache(maxsize=None)
+def hash_conteudo(caminho): #Primeiros 12 caracteres do SHA-256 do ficheiro (mudam sempre que o conteúdo muda)
+    with open(caminho, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def url_plotly(): #URL do plotly.js com o hash no nome, para poder ficar em cache "para sempre"
+    return url_for('recursos.plotly_js', versao=hash_conteudo(CAMINHO_PLOTLY))
+
+
+def url_estatico(ficheiro): #URL de um ficheiro da pasta static/ com o hash do conteúdo no parâmetro "v"
+    from flask import current_app
+    return url_for('static', filename=ficheiro, v=hash_conteudo(os.path.join(current_app.static_folder, ficheiro)))
+
+
+@recursos.route("/recursos/plotly-<versao>.min.js")
+def plotly_js(versao):
+    if versao != hash_conteudo(CAMINHO_PLOTLY):
+        abort(404) #Só a versão atual é servida
+    resposta = send_file(CAMINHO_PLOTLY, mimetype="application/javascript", max_age=UM_ANO, conditional=True, etag=True)
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True #O conteúdo deste URL nunca muda
+    return resposta
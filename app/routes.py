@@ -1,21 +1,39 @@
-from flask import render_template, redirect, url_for, flash, request, Blueprint, session, send_file #Importa funções para mostrar páginas, redirecionar, mensagens e ler dados do formulário
-from app import db, bcrypt #Importa a base de dados e o sistema de encriptação de senhas
+from flask import render_template, redirect, url_for, flash, request, Blueprint, session, send_file, jsonify, current_app #Importa funções para mostrar páginas, redirecionar, mensagens e ler dados do formulário
+from app import db, bcrypt, armazem_dados, cache_leitura, cache_graficos, pool_renderizacao, gestor_tarefas, espacos_trabalho, metricas #Importa a base de dados, o sistema de encriptação de senhas, o armazém de dados, as caches, a pool de exportação, as tarefas em segundo plano, os espaços de trabalho e as métricas
 from flask_login import login_user, logout_user, login_required, current_user #Importa funções de login, logout, proteção de rotas e acesso ao utilizador atual
 from app.forms import FormularioLogin, FormularioCriarConta #Importa os formulários criados para login e criação de conta
 from app.models import Utilizador #Importa o modelo de utilizador (estrutura da base de dados)
-import pandas as pd #Importa pandas para manipulação de dados em tabelas
-import plotly.express as px #Importa plotly para criação de gráficos 
-import plotly.graph_objects as go #Adiciona import do graph_objects
+from .espacos import novo_id #Identificadores únicos para os gráficos
+from .metricas import registar #Registos estruturados (substituem os print de depuração)
+from .exportacao import FORMATOS_EXPORTACAO, ErroExportacao #Formatos de exportação aceites (PNG e PDF) e erro quando a imagem não é gerada
+from .uploads import FicheiroRecebido #Ficheiros escritos no espaço de trabalho durante a receção
+from .cache import EXTENSAO_HASH #Ficheiro com o hash calculado durante a receção de cada upload
+from .compressao import etag_conhecida #Reconhece também as ETags das versões comprimidas
 import io #Biblioteca para trabalhar com ficheiros em memória
+import json #Para criar a chave dos gráficos com os filtros aplicados
 import os #Importa o módulo OS para interagir com o sistema de ficheiros (guardar uploads, criar pastas)
-import json #Importa o módulo json para manipulação de dados JSON
-import shutil #Importa o módulo shutil para operações de arquivos e diretórios
-from .utils import obter_folhas_excel, ler_folhas_selecionadas #Importa funções que extraiem e leem os nomes das folhas de um ficheiro Excel
+import zipfile #Importa o módulo zipfile para juntar vários gráficos exportados num só ficheiro
+#Os módulos de dados e gráficos (pandas, plotly) só são importados nas rotas que os usam: os pedidos de login não os carregam
 from werkzeug.utils import secure_filename #Função que limpa nomes de ficheiros (evita erros de segurança ao guardar ficheiros no disco)
 
+EXTENSOES_ACEITES = (".xlsx", ".xls", ".csv", ".parquet") #Ficheiros aceites no upload (CSV e Parquet aparecem como uma única folha)
 
 rotas = Blueprint('rotas', __name__) #Cria um conjunto de rotas com o nome "rotas" (Blueprint permite organizar as páginas)
 
+
+@rotas.after_request
+def registar_referencias(resposta): #Sempre que a sessão muda, regista os ficheiros em uso (dados atuais, uploads de onde vieram e gráficos) para que as quotas e o limpador não os apaguem
+    if session.modified and current_user.is_authenticated:
+        caminhos = [armazem_dados.caminho(current_user.id, session.get('id_dados'))]
+        for nome in dict.fromkeys(parte[0] for parte in session.get('partes', [])):
+            caminho = os.path.join(pasta_uploads(), nome)
+            caminhos += [caminho, caminho + EXTENSAO_HASH]
+        for chave in ('lista_graficos', 'graficos_recentes', 'graficos_anteriores'):
+            caminhos += [caminho_grafico_id(grafico_id) for grafico_id in session.get(chave, [])]
+        espacos_trabalho.referenciar(current_user.id, [caminho for caminho in caminhos if caminho])
+    return resposta
+
+
 @rotas.route("/", methods=["GET", "POST"])
 def pagina_inicial(): #Página inicial do site (login direto se já estiver autenticado)
     if current_user.is_authenticated:
@@ -74,13 +92,23 @@ def painel():#Página principal protegida do utilizador
     return render_template("painel.html")  #Mostra o painel
 
 
-PASTA_UPLOADS = "ficheiros_recebidos" #Pasta temporária onde os ficheiros vão ser guardados
-os.makedirs(PASTA_UPLOADS, exist_ok=True)  #Garante que a pasta existe; se não existir, é criada
+def pasta_uploads(): #Pasta onde ficam os ficheiros enviados pelo utilizador atual (cada utilizador tem a sua)
+    return espacos_trabalho.pasta(current_user.id, "uploads")
+
+def folhas_carregadas(): #Folhas que já fazem parte dos dados atuais (aparecem já selecionadas)
+    return {(parte[0], parte[1]) for parte in session.get('partes', [])}
+
+@rotas.app_errorhandler(413)
+def upload_demasiado_grande(erro):
+    #Pedido interrompido durante a receção: um ficheiro (ou o pedido inteiro) ultrapassou o limite de tamanho
+    flash(f"Os ficheiros enviados excedem o limite de {current_app.config['UPLOAD_LIMITE_FICHEIRO_MB']} MB por ficheiro "
+          f"ou {current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB por envio.", "danger")
+    return redirect(url_for("rotas.painel"))
 
 @rotas.route("/enviar_excel", methods=["POST"])
 @login_required
 def enviar_excel():
-    folhas_por_ficheiro = {}  #Dicionário que vai guardar as folhas de cada ficheiro
+    ficheiros_guardados = {}  #Dicionário com o caminho de cada ficheiro guardado (as folhas são listadas em segundo plano)
     ficheiros_recebidos = request.files.getlist("ficheiros")  #Recebe a lista de ficheiros enviados pelo formulário
 
     if not ficheiros_recebidos:
@@ -88,44 +116,56 @@ def enviar_excel():
         return redirect(url_for("rotas.painel"))  #Redireciona de volta ao painel
 
     arquivos_invalidos = []  #Lista para guardar nomes dos arquivos inválidos
-    tem_excel = False #Mecanismo de segurança que garante que o utilizador faça o upload antes de tentar gerar gráficos
+    arquivos_sem_espaco = []  #Lista para guardar nomes dos arquivos que não cabem na quota de disco
 
     for ficheiro in ficheiros_recebidos:
-        if ficheiro.filename.endswith((".xlsx", ".xls")):  #Verificar que é ficheiro Excel (.xlsx ou .xls)
-            tem_excel = True
-            nome_seguro = secure_filename(ficheiro.filename)  #Limpa o nome do ficheiro para evitar erros de segurança
-            caminho = os.path.join(PASTA_UPLOADS, nome_seguro)  #Define o caminho onde o ficheiro será guardado
-            ficheiro.save(caminho)  #Guarda o ficheiro localmente
-
-            folhas = obter_folhas_excel(caminho)  #Usa função auxiliar para obter os nomes das folhas do Excel
-            if folhas:  #Se conseguiu ler as folhas
-                folhas_por_ficheiro[nome_seguro] = folhas  #Associa as folhas ao nome do ficheiro no dicionário
-            else:  #Se não conseguiu ler as folhas
-                arquivos_invalidos.append(nome_seguro)  #Adiciona à lista de inválidos
-                if os.path.exists(caminho):
-                    os.remove(caminho)  #Remove o arquivo inválido do sistema
+        recebido = ficheiro.stream if isinstance(ficheiro.stream, FicheiroRecebido) else None  #Já escrito no espaço de trabalho durante a receção
+        if not ficheiro.filename.lower().endswith(EXTENSOES_ACEITES) or (recebido is not None and not recebido.valido):  #Verificar a extensão (.xlsx, .xls, .csv ou .parquet) e os primeiros bytes do ficheiro
+            arquivos_invalidos.append(ficheiro.filename)  #Adiciona arquivos não aceites à lista de inválidos
+            continue
+        nome_seguro = secure_filename(ficheiro.filename)  #Limpa o nome do ficheiro para evitar erros de segurança
+        if recebido is not None and recebido.sem_espaco:
+            arquivos_sem_espaco.append(nome_seguro)  #A receção foi interrompida ao ultrapassar a quota
+            continue
+        if recebido is not None:
+            tamanho = recebido.tamanho
+            reservado = espacos_trabalho.reservar(current_user.id, tamanho)  #Os dados já estão em disco: reserva-os nas quotas (se faltar espaço, apaga primeiro os ficheiros mais antigos que não estão em uso)
         else:
-            arquivos_invalidos.append(ficheiro.filename)  #Adiciona arquivos não-Excel à lista de inválidos
+            ficheiro.stream.seek(0, os.SEEK_END)  #Mede o tamanho do ficheiro recebido
+            tamanho = ficheiro.stream.tell()
+            ficheiro.stream.seek(0)
+            reservado = espacos_trabalho.reservar(current_user.id, tamanho)  #Verifica as quotas de disco (apaga primeiro os ficheiros mais antigos)
+        if not reservado:
+            if recebido is not None:
+                recebido.descartar()  #Não há espaço: apaga o ficheiro recebido em vez dos dados do utilizador
+            arquivos_sem_espaco.append(nome_seguro)
+            continue
+        caminho = os.path.join(pasta_uploads(), nome_seguro)  #Define o caminho onde o ficheiro será guardado
+        with metricas.etapa("guardar_upload", ficheiro=nome_seguro, bytes=tamanho):
+            if recebido is not None:
+                recebido.guardar(caminho)  #Só muda o nome do ficheiro (os dados já foram escritos uma vez, durante a receção)
+                cache_leitura.registar_hash(caminho, recebido.hash)  #O hash calculado durante a receção evita voltar a ler o ficheiro
+            else:
+                ficheiro.save(caminho)  #Guarda o ficheiro localmente
+        metricas.observar_tamanho("upload_bytes", tamanho)
+        ficheiros_guardados[nome_seguro] = caminho
 
     if arquivos_invalidos:
-        flash(f"Os seguintes arquivos não são Excel válidos: {', '.join(arquivos_invalidos)}", "warning")  #Mostra mensagem com lista de arquivos inválidos
-        if not tem_excel:
-            return redirect(url_for("rotas.painel"))  #Volta ao painel se não houver nenhum Excel válido
+        flash(f"Os seguintes arquivos não são Excel, CSV ou Parquet válidos: {', '.join(arquivos_invalidos)}", "warning")  #Mostra mensagem com lista de arquivos inválidos
+    if arquivos_sem_espaco:
+        flash(f"Sem espaço disponível para os seguintes arquivos: {', '.join(arquivos_sem_espaco)}", "danger")  #Mostra mensagem se a quota de disco foi excedida
 
-    if not folhas_por_ficheiro:
-        flash("Nenhum arquivo Excel válido foi enviado.", "danger")  #Mensagem se nenhum Excel válido foi processado
-        return redirect(url_for("rotas.painel"))  #Volta ao painel
+    if not ficheiros_guardados:
+        return redirect(url_for("rotas.painel"))  #Volta ao painel se não houver nenhum Excel válido
 
-    return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro)  #Mostra a seleção de folhas no painel
+    #Listar as folhas de todos os ficheiros em paralelo, em segundo plano; o painel acompanha o progresso
+    id_tarefa = gestor_tarefas.listar_folhas(current_user.id, ficheiros_guardados)
+    return render_template("painel.html", id_tarefa=id_tarefa)
 
 
 @rotas.route("/selecionar_folhas", methods=["POST"])
 @login_required
 def selecionar_folhas():
-    #Limpar apenas dados específicos da sessão em vez de toda a sessão
-    chaves_sessao_manter = ['_user_id', '_fresh']
-    dados_sessao_manter = {chave: session[chave] for chave in chaves_sessao_manter if chave in session}
-    
     ficheiros_nomes = request.form.getlist("ficheiros_nome")
     tem_folhas_selecionadas = False  #Mecanismo de segurança que garante que não há folhas selecionadas antes de processar os dados
     
@@ -139,112 +179,246 @@ def selecionar_folhas():
     if not tem_folhas_selecionadas:
         flash("Por favor, selecione pelo menos uma folha para continuar.", "warning")  #Mensagem de aviso
         #Recuperar informações das folhas para reexibir a página
+        from .utils import obter_folhas_excel #Extrai os nomes das folhas de um ficheiro Excel
         folhas_por_ficheiro = {}
         for nome in ficheiros_nomes:
-            caminho = os.path.join(PASTA_UPLOADS, secure_filename(nome))
+            caminho = os.path.join(pasta_uploads(), secure_filename(nome))
             folhas = obter_folhas_excel(caminho)
             folhas_por_ficheiro[nome] = folhas
-        return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro)
-    
-    #Se chegou aqui, tem folhas selecionadas, então limpa a sessão e continua
-    session.clear()
-    session.update(dados_sessao_manter)
+        return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro, folhas_carregadas=folhas_carregadas())
     
-    dados_finais = []
+    selecao = []  #Lista de (caminho, folhas escolhidas) de cada ficheiro
 
     for nome in ficheiros_nomes:
         folhas_escolhidas = request.form.getlist(f"selecionadas_{nome}")
-        caminho = os.path.join(PASTA_UPLOADS, secure_filename(nome))
+        caminho = os.path.join(pasta_uploads(), secure_filename(nome))
 
-        if folhas_escolhidas:
-            df = ler_folhas_selecionadas(caminho, folhas_escolhidas)
-            if df is not None:
-                #Garantir que os nomes das colunas estão normalizados
-                df.columns = df.columns.str.strip().str.replace(' ', '_')
-                dados_finais.append(df)            
-        else:
-            flash("Nenhuma folha foi selecionada.", "warning")
-            return redirect(url_for("rotas.painel"))
+        if folhas_escolhidas:  #Um ficheiro sem folhas escolhidas é retirado dos dados
+            selecao.append((caminho, folhas_escolhidas))
     
-    if dados_finais:
-        df_total = pd.concat(dados_finais, ignore_index=True)
-        print("\nColunas antes do processamento:", df_total.columns.tolist()) #Depuração: mostrar estado dos dados antes de processar
-        
-        #Identificar colunas numéricas e de texto
-        colunas_invalidas = ["Ficheiro", "Folha"]
-        df_graficos = df_total.drop(columns=[col for col in colunas_invalidas if col in df_total.columns])
-
-        #Forçar a detecção correta dos tipos de dados
-        for coluna in df_graficos.columns:
-            if 'Data' in coluna: #Converter datas para o formato correto
-                try:
-                    df_graficos[coluna] = pd.to_datetime(df_graficos[coluna])
-                except:
-                    pass
-            #Converter valores numéricos
-            elif df_graficos[coluna].dtype == 'object':
-                try:
-                    df_graficos[coluna] = pd.to_numeric(df_graficos[coluna].str.replace(',', '.'))
-                except:
-                    pass
-        
-        #Identificar tipos de colunas para o gráfico
-        colunas_numericas = df_graficos.select_dtypes(include=['int64', 'float64']).columns.tolist()
-        colunas_texto = df_graficos.select_dtypes(include=['object', 'datetime64[ns]']).columns.tolist()
-        
-        #Depuração: mostrar estado final dos dados
-        print("\nColunas numéricas:", colunas_numericas)
-        print("Colunas texto:", colunas_texto)
-        
-        #Converter datas para string antes de guardar na sessão
-        for coluna in df_graficos.columns:
-            if pd.api.types.is_datetime64_any_dtype(df_graficos[coluna]):
-                df_graficos[coluna] = df_graficos[coluna].dt.strftime('%Y-%m-%d')
-        
-        #Guardar os dados e tipos na sessão
-        session['dados_excel'] = df_graficos.to_json(orient='records')
-        session['colunas_numericas'] = colunas_numericas
-        session['colunas_texto'] = colunas_texto
-        flash("Dados recebidos com sucesso!", "success")
-        
-        tabela_preview = df_graficos.to_html(classes='table table-striped', index=False)
-        return render_template("painel.html", 
-                            folhas_por_ficheiro=None, 
-                            preview_html=tabela_preview,
-                            colunas_numericas=colunas_numericas,
-                            colunas_texto=colunas_texto)
-    else:
+    #Ler as folhas novas em paralelo, em segundo plano, e juntá-las aos dados atuais (as que já estão carregadas não são lidas de novo)
+    base = {chave: session.get(chave) for chave in ('id_dados', 'esquema', 'partes')} if session.get('partes') else None
+    try:
+        id_tarefa = gestor_tarefas.carregar_dados(current_user.id, selecao, base)
+    except FileNotFoundError as e:  #Formulário antigo ou ficheiro já apagado (pelo limpador ou pelas quotas)
+        registar("erro_selecao", erro=str(e), nivel="warning")
+        flash(f"Erro ao ler os dados selecionados: o ficheiro {os.path.basename(e.filename or '')} já não existe.", "danger")
+        from .utils import obter_folhas_excel #Extrai os nomes das folhas de um ficheiro Excel
+        folhas_por_ficheiro = {}  #Volta a mostrar a seleção só com os ficheiros que ainda existem
+        for nome in ficheiros_nomes:
+            caminho = os.path.join(pasta_uploads(), secure_filename(nome))
+            if os.path.exists(caminho):
+                folhas_por_ficheiro[nome] = obter_folhas_excel(caminho)
+        if not folhas_por_ficheiro:
+            return redirect(url_for("rotas.painel"))
+        return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro, folhas_carregadas=folhas_carregadas())
+    return render_template("painel.html", id_tarefa=id_tarefa)
+
+
+@rotas.route("/tarefas/<id_tarefa>")
+@login_required
+def estado_tarefa(id_tarefa):
+    #Devolve o progresso de uma tarefa em segundo plano (consultado periodicamente pelo painel)
+    estado = gestor_tarefas.estado(current_user.id, id_tarefa)
+    if estado is None:
+        return jsonify({"erro": "Tarefa não encontrada."}), 404
+    return jsonify({chave: estado.get(chave) for chave in ("estado", "progresso", "total", "mensagem")})
+
+
+@rotas.route("/tarefas/<id_tarefa>/concluir")
+@login_required
+def concluir_tarefa(id_tarefa):
+    #Mostra o resultado de uma tarefa terminada (seleção de folhas ou dados carregados)
+    estado = gestor_tarefas.estado(current_user.id, id_tarefa)
+    if estado is None:
+        flash("Tarefa não encontrada.", "danger")
+        return redirect(url_for("rotas.painel"))
+    if estado["estado"] == "em_curso":
+        return render_template("painel.html", id_tarefa=id_tarefa)  #Ainda não terminou: continua a acompanhar
+    gestor_tarefas.remover(current_user.id, id_tarefa)
+    if estado["estado"] == "erro":
+        flash(f"Erro ao processar os ficheiros: {estado.get('mensagem') or 'erro desconhecido.'}", "danger")  #Mostra o erro real da tarefa
+        return redirect(url_for("rotas.painel"))
+
+    if estado["tipo"] == "folhas":
+        folhas_por_ficheiro = {}  #Dicionário que vai guardar as folhas de cada ficheiro
+        arquivos_invalidos = []  #Lista para guardar nomes dos arquivos inválidos
+        for nome_seguro, folhas in (estado.get("resultado") or {}).items():
+            if folhas:  #Se conseguiu ler as folhas
+                folhas_por_ficheiro[nome_seguro] = folhas  #Associa as folhas ao nome do ficheiro no dicionário
+            else:  #Se não conseguiu ler as folhas
+                arquivos_invalidos.append(nome_seguro)  #Adiciona à lista de inválidos
+                for caminho in (os.path.join(pasta_uploads(), nome_seguro), os.path.join(pasta_uploads(), nome_seguro + EXTENSAO_HASH)):
+                    if os.path.exists(caminho):
+                        os.remove(caminho)  #Remove o arquivo inválido (e o seu hash) do sistema
+
+        if arquivos_invalidos:
+            flash(f"Os seguintes arquivos não são Excel, CSV ou Parquet válidos: {', '.join(arquivos_invalidos)}", "warning")  #Mostra mensagem com lista de arquivos inválidos
+        if not folhas_por_ficheiro:
+            flash("Nenhum arquivo Excel válido foi enviado.", "danger")  #Mensagem se nenhum Excel válido foi processado
+            return redirect(url_for("rotas.painel"))  #Volta ao painel
+
+        from .utils import obter_folhas_excel #Extrai os nomes das folhas de um ficheiro Excel
+        for nome in dict.fromkeys(parte[0] for parte in session.get('partes', [])): #Os ficheiros já carregados continuam na seleção (o novo ficheiro é juntado aos dados atuais)
+            caminho = os.path.join(pasta_uploads(), nome)
+            if nome not in folhas_por_ficheiro and os.path.exists(caminho):
+                folhas_por_ficheiro[nome] = obter_folhas_excel(caminho)
+
+        return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro, folhas_carregadas=folhas_carregadas())  #Mostra a seleção de folhas no painel
+
+    resultado = estado.get("resultado")
+    if not resultado:
         flash("Erro ao ler os dados selecionados.", "danger")
         return redirect(url_for("rotas.painel"))
 
-PASTA_GRAFICOS = "graficos_temp"  #Pasta temporária onde os gráficos vão ser guardados
-os.makedirs(PASTA_GRAFICOS, exist_ok=True)  #Garante que a pasta existe; se não existir, é criada
+    #Limpar apenas dados específicos da sessão em vez de toda a sessão (e apagar os dados anteriores)
+    chaves_sessao_manter = ['_user_id', '_fresh']
+    dados_sessao_manter = {chave: session[chave] for chave in chaves_sessao_manter if chave in session}
+    if session.get('id_dados') != resultado["id_dados"]: #Se a seleção não mudou, os dados atuais são reutilizados
+        for id_dados, sinal in ((session.get('id_dados'), -1), (resultado["id_dados"], 1)): #Atualiza o espaço ocupado (os dados foram escritos por um processo da pool)
+            caminho = armazem_dados.caminho(current_user.id, id_dados)
+            if caminho and os.path.exists(caminho):
+                espacos_trabalho.contar(current_user.id, sinal * os.path.getsize(caminho))
+        armazem_dados.remover(current_user.id, session.get('id_dados'))
+    session.clear()
+    session.update(dados_sessao_manter)
+
+    #Identificar tipos de colunas para o gráfico
+    esquema = resultado["esquema"]
+    from .utils import colunas_do_esquema #Separa as colunas numéricas das de texto
+    colunas_numericas, colunas_texto = colunas_do_esquema(esquema)
+    
+    registar("dados_carregados", id_dados=resultado["id_dados"], colunas_numericas=colunas_numericas, colunas_texto=colunas_texto, nivel="debug")
+    
+    #Guardar apenas o identificador dos dados (guardados no armazém em Parquet) na sessão
+    session['id_dados'] = resultado["id_dados"]
+    session['esquema'] = esquema
+    session['partes'] = resultado["partes"] #Folhas que fazem parte dos dados (para juntar só as novas na próxima seleção)
+    session['colunas_numericas'] = colunas_numericas
+    session['colunas_texto'] = colunas_texto
+    flash("Dados recebidos com sucesso!", "success")
+    
+    return render_template("painel.html", 
+                        folhas_por_ficheiro=None, 
+                        dados_carregados=True,
+                        colunas_numericas=colunas_numericas,
+                        colunas_texto=colunas_texto)
+
+TAMANHO_PAGINA = 50 #Número de linhas por página na pré-visualização
+TAMANHO_PAGINA_MAXIMO = 500 #Limite de linhas por pedido (as respostas têm sempre um tamanho controlado)
+
+@rotas.route("/dados/pre_visualizacao")
+@login_required
+def pre_visualizacao():
+    #Devolve uma página dos dados em JSON, com ordenação feita no servidor e apenas as colunas pedidas
+    from .utils import pagina_para_json #Converte uma página do DataFrame em listas prontas para JSON
+    id_dados = session.get('id_dados')
+    df = armazem_dados.carregar(current_user.id, id_dados)
+    if df is None:
+        return jsonify({"erro": "Nenhum dado disponível."}), 404
+
+    tamanho = min(max(request.args.get('tamanho', TAMANHO_PAGINA, type=int), 1), TAMANHO_PAGINA_MAXIMO)
+    total_linhas = len(df)
+    total_paginas = max((total_linhas + tamanho - 1) // tamanho, 1)
+    pagina = min(max(request.args.get('pagina', 1, type=int), 1), total_paginas)
+    inicio = (pagina - 1) * tamanho
+
+    colunas = [coluna for coluna in request.args.getlist('colunas') if coluna in df.columns] or df.columns.tolist() #Projeção de colunas
+    ordenar = request.args.get('ordenar')
+    ascendente = request.args.get('ordem', 'asc') != 'desc'
+
+    if ordenar in df.columns:
+        posicoes = armazem_dados.ordem(current_user.id, id_dados, df, ordenar, ascendente)[inicio:inicio + tamanho]
+        pagina_df = df.iloc[posicoes][colunas]
+    else:
+        ordenar = None
+        pagina_df = df.iloc[inicio:inicio + tamanho][colunas]
+
+    return jsonify({
+        "colunas": colunas,
+        "linhas": pagina_para_json(pagina_df),
+        "pagina": pagina,
+        "tamanho": tamanho,
+        "total_linhas": total_linhas,
+        "total_paginas": total_paginas,
+        "ordenar": ordenar,
+        "ordem": "asc" if ascendente else "desc"
+    })
+
+@rotas.route("/dados/estatisticas")
+@login_required
+def estatisticas_dados():
+    #Devolve as estatísticas das colunas (calculadas ao carregar os dados) para preencher os filtros do painel
+    from .consultas import FUNCOES_AGREGACAO #Agregações disponíveis (soma, média e contagem)
+    estatisticas = armazem_dados.estatisticas(current_user.id, session.get('id_dados'))
+    if estatisticas is None:
+        return jsonify({"erro": "Nenhum dado disponível."}), 404
+    return jsonify({"colunas": estatisticas, "agregacoes": list(FUNCOES_AGREGACAO)})
+
+@rotas.route("/dados/consulta", methods=["POST"])
+@login_required
+def consultar_dados():
+    #Aplica filtros (intervalos e conjuntos de valores) e, opcionalmente, agrupa por uma coluna; devolve só o resultado reduzido
+    from .consultas import ErroConsulta, ler_filtros, aplicar_filtros, agregar #Camada de consultas sobre os dados carregados
+    from .utils import pagina_para_json #Converte uma página do DataFrame em listas prontas para JSON
+    df = armazem_dados.carregar(current_user.id, session.get('id_dados'))
+    if df is None:
+        return jsonify({"erro": "Nenhum dado disponível."}), 404
+    pedido = request.get_json(silent=True) or {}
+    agrupar = pedido.get('agrupar')
+    valor = pedido.get('valor')
+    try:
+        with metricas.etapa("consulta", linhas=len(df)):
+            resultado = aplicar_filtros(df, session.get('esquema', {}), ler_filtros(pedido.get('filtros')))
+            total_filtradas = len(resultado)
+            if agrupar:
+                if agrupar not in df.columns or valor not in df.columns:
+                    raise ErroConsulta("Coluna de agrupamento ou de valores não encontrada.")
+                resultado = agregar(resultado, agrupar, valor, pedido.get('funcao', 'soma'))
+    except ErroConsulta as e:
+        return jsonify({"erro": str(e)}), 400
+
+    limite = pedido.get('limite') if isinstance(pedido.get('limite'), int) else TAMANHO_PAGINA
+    limite = min(max(limite, 1), TAMANHO_PAGINA_MAXIMO) #Só é devolvida uma parte do resultado (tamanho controlado)
+    return jsonify({
+        "colunas": resultado.columns.tolist(),
+        "linhas": pagina_para_json(resultado.iloc[:limite]),
+        "total_linhas": len(resultado),
+        "linhas_filtradas": total_filtradas
+    })
+
+def caminho_grafico_id(grafico_id): #Caminho do ficheiro de um gráfico dentro da pasta do utilizador atual
+    return os.path.join(espacos_trabalho.pasta(current_user.id, "graficos"), f"{secure_filename(grafico_id)}.grafico")
 
 def limpar_pasta_graficos():
-    """Limpa a pasta de gráficos temporários"""
-    if os.path.exists(PASTA_GRAFICOS):
-        shutil.rmtree(PASTA_GRAFICOS)
-        os.makedirs(PASTA_GRAFICOS)
+    """Limpa a pasta de gráficos do utilizador atual"""
+    espacos_trabalho.limpar(current_user.id, "graficos")
+
+def figura_guardada(caminho_grafico):
+    """JSON de um gráfico guardado em ficheiro (só é lido do disco se não estiver na cache de gráficos)"""
+    from .graficos import carregar_figura #Lê os gráficos guardados em disco
+    return cache_graficos.obter(
+        ("ficheiro", caminho_grafico, os.stat(caminho_grafico).st_mtime_ns),
+        lambda: carregar_figura(caminho_grafico)
+    )
 
 @rotas.route("/gerar_grafico", methods=["POST"])
 @login_required
 def gerar_grafico():
-    if 'dados_excel' not in session:
+    from .graficos import TIPOS_GRAFICOS, construir_figura, guardar_figura #Funções que criam e guardam os gráficos
+    from .utils import json_seguro #Prepara o JSON das figuras para ser incluído no HTML
+    from .consultas import ErroConsulta, FUNCOES_AGREGACAO, ler_filtros, aplicar_filtros, verificar_agregacao #Filtros e agregações escolhidos no painel
+    #Recuperar dados do armazém e tipos da sessão
+    df = armazem_dados.carregar(current_user.id, session.get('id_dados'))
+    if df is None:
         flash("Nenhum dado disponível. Por favor, carregue um arquivo Excel.", "danger")
         return redirect(url_for("rotas.painel"))
-
-    #Recuperar dados e tipos da sessão
-    df = pd.read_json(io.StringIO(session['dados_excel']))
     colunas_numericas = session.get('colunas_numericas', [])
     colunas_texto = session.get('colunas_texto', [])
     
     df.columns = df.columns.str.strip().str.replace(' ', '_') #Garantir que os nomes das colunas estão normalizados
     
-    print("Colunas no DataFrame:", df.columns.tolist()) #Depuração: imprimir colunas disponíveis
-    
-    #Inicializar ou reiniciar contadores e listas se necessário
-    if 'contador_graficos' not in session:
-        session['contador_graficos'] = 0
+    #Inicializar ou reiniciar listas se necessário
     if 'lista_graficos' not in session:
         session['lista_graficos'] = []
     
@@ -252,15 +426,16 @@ def gerar_grafico():
     coluna_x = request.form.get('coluna_x')
     coluna_y = request.form.get('coluna_y')
     tipos_graficos = request.form.getlist('tipos_graficos')
+    agregacao = request.form.get('agregacao', 'soma')
+    if agregacao not in FUNCOES_AGREGACAO:
+        agregacao = 'soma'
 
-    print(f"Coluna X selecionada: {coluna_x}")
-    print(f"Coluna Y selecionada: {coluna_y}")
+    registar("gerar_grafico", coluna_x=coluna_x, coluna_y=coluna_y, tipos=tipos_graficos, agregacao=agregacao, nivel="debug")
 
     if not tipos_graficos:
         flash("Por favor, selecione pelo menos um tipo de gráfico para continuar.", "warning")
-        tabela_preview = df.to_html(classes='table table-striped', index=False)
         return render_template("painel.html", 
-                            preview_html=tabela_preview,
+                            dados_carregados=True,
                             colunas_numericas=colunas_numericas,
                             colunas_texto=colunas_texto)
 
@@ -272,10 +447,20 @@ def gerar_grafico():
         flash(f"Coluna '{coluna_y}' não encontrada. Colunas disponíveis: {', '.join(df.columns)}", "danger")
         return redirect(url_for("rotas.painel"))
 
-    #Converter datas de volta para datetime se necessário
-    if 'Data' in coluna_x:
-        df[coluna_x] = pd.to_datetime(df[coluna_x])
-        df = df.sort_values(coluna_x)
+    #Aplicar os filtros no servidor: o gráfico só recebe as linhas escolhidas
+    try:
+        verificar_agregacao(df, coluna_y, agregacao)
+        filtros = ler_filtros(request.form.get('filtros'))
+        df = aplicar_filtros(df, session.get('esquema', {}), filtros)
+    except ErroConsulta as e:
+        flash(str(e), "danger")
+        return redirect(url_for("rotas.painel"))
+    if df.empty:
+        flash("Nenhuma linha cumpre os filtros escolhidos.", "warning")
+        return render_template("painel.html", 
+                            dados_carregados=True,
+                            colunas_numericas=colunas_numericas,
+                            colunas_texto=colunas_texto)
 
     #Mover gráficos recentes para anteriores
     if 'graficos_recentes' in session:
@@ -286,41 +471,37 @@ def gerar_grafico():
                 session['graficos_anteriores'].append(grafico_id)
 
     #Gerar gráficos
+    hash_dados = armazem_dados.hash_dados(current_user.id, session.get('id_dados')) #Identifica o conteúdo dos dados na cache de gráficos
     graficos = {}
     session['graficos_recentes'] = []
 
     for tipo in tipos_graficos:
-        session['contador_graficos'] += 1
-        if tipo == "Barras":
-            fig = px.bar(df, x=coluna_x, y=coluna_y)
-        elif tipo == "Linhas":
-            df_agrupado = df.groupby(coluna_x, as_index=False)[coluna_y].sum()
-            fig = px.line(df_agrupado, x=coluna_x, y=coluna_y)
-        elif tipo == "Pizza":
-            fig = px.pie(df, names=coluna_x, values=coluna_y)
-
-        #Configurar layout do gráfico
-        fig.update_layout(
-            width=800,
-            height=500,
-            margin=dict(l=50, r=50, t=50, b=50)
-        )
+        if tipo not in TIPOS_GRAFICOS:
+            continue
+        #Construir a figura (ou reutilizá-la, se já foi construída com os mesmos dados e parâmetros)
+        def construir():
+            with metricas.etapa("construir_grafico", tipo=tipo, linhas=len(df)):
+                figura_json = construir_figura(df, tipo, coluna_x, coluna_y, current_app.config["GRAFICOS_LIMITE_PONTOS"], agregacao).to_json()
+            metricas.observar_tamanho("figura_bytes", len(figura_json))
+            return figura_json
+        figura_json = cache_graficos.obter((hash_dados, tipo, coluna_x, coluna_y, agregacao, json.dumps(filtros, sort_keys=True)), construir)
         
-        #Gerar ID único para o gráfico
-        grafico_id = f"{tipo}_{session['contador_graficos']}"
+        #Gerar ID único para o gráfico (não colide entre sessões nem entre utilizadores)
+        grafico_id = f"{tipo}_{novo_id()}"
         
         #guardar o gráfico em arquivo
-        caminho_grafico = os.path.join(PASTA_GRAFICOS, f"{grafico_id}.json")
-        with open(caminho_grafico, 'w') as f:
-            json.dump(fig.to_json(), f)
+        caminho_grafico = caminho_grafico_id(grafico_id)
+        guardar_figura(caminho_grafico, figura_json)
+        espacos_trabalho.contar(current_user.id, os.path.getsize(caminho_grafico))
         
-        #Converter para HTML e guardar apenas metadados na sessão
-        html = fig.to_html(full_html=False, include_plotlyjs=True)
+        #Converter para uma especificação JSON (desenhada no navegador) e guardar apenas metadados na sessão
         graficos[grafico_id] = {
-            'html': html,
+            'figura': json_seguro(figura_json),
             'tipo': tipo,
             'coluna_x': coluna_x,
-            'coluna_y': coluna_y
+            'coluna_y': coluna_y,
+            'agregacao': agregacao,
+            'filtros': len(filtros)
         }
         
         #Adicionar à lista de gráficos e gráficos recentes
@@ -328,69 +509,98 @@ def gerar_grafico():
         session['graficos_recentes'].append(grafico_id)
         session.modified = True
 
-    tabela_preview = df.to_html(classes='table table-striped', index=False)
-
-    #Preparar gráficos anteriores
+    #Gráficos anteriores: só os endereços; cada um é pedido pelo navegador quando aparece no ecrã (ou vem da cache do navegador)
     graficos_anteriores = {}
     for k in session.get('graficos_anteriores', []):
-        caminho_grafico = os.path.join(PASTA_GRAFICOS, f"{k}.json")
-        if os.path.exists(caminho_grafico):
-            with open(caminho_grafico, 'r') as f:
-                dados_fig = json.load(f)
-                fig = go.Figure(data=go.Figure(json.loads(dados_fig)).data)
-                fig.update_layout(
-                    width=800,
-                    height=500,
-                    margin=dict(l=50, r=50, t=50, b=50)
-                )
-                graficos_anteriores[k] = fig.to_html(full_html=False, include_plotlyjs=True)
+        if os.path.exists(caminho_grafico_id(k)):
+            graficos_anteriores[k] = url_for("rotas.figura_grafico", grafico_id=k)
 
     return render_template("painel.html",
-                         preview_html=tabela_preview,
+                         dados_carregados=True,
                          graficos=graficos,
                          graficos_anteriores=graficos_anteriores,
                          colunas_numericas=colunas_numericas,
                          colunas_texto=colunas_texto)
 
+@rotas.route("/graficos/<grafico_id>/figura")
+@login_required
+def figura_grafico(grafico_id):
+    #Devolve o JSON de um gráfico guardado (pedido pelo painel quando o gráfico aparece no ecrã)
+    caminho_grafico = caminho_grafico_id(grafico_id)
+    if not os.path.exists(caminho_grafico):
+        return jsonify({"erro": "Gráfico não encontrado."}), 404
+    etag = f"{secure_filename(grafico_id)}-{os.stat(caminho_grafico).st_mtime_ns}" #Cada gráfico é escrito uma única vez: o identificador e a data chegam
+    conhecida = etag_conhecida(etag) #O navegador guarda a ETag da versão comprimida (ex: "<etag>-gzip")
+    if conhecida:
+        resposta = current_app.response_class(status=304) #O navegador já tem esta versão: o ficheiro nem é lido
+        resposta.vary.add("Accept-Encoding")
+    else:
+        resposta = current_app.response_class(figura_guardada(caminho_grafico), mimetype="application/json")
+    resposta.set_etag(conhecida or etag)
+    resposta.cache_control.private = True #Dados do utilizador: só a cache do navegador os pode guardar
+    resposta.cache_control.no_cache = True #Confirma sempre com o servidor (o gráfico pode ter sido apagado)
+    return resposta
+
 @rotas.route("/exportar_grafico/<grafico_id>/<formato>")
 @login_required
 def exportar_grafico(grafico_id, formato):
-    caminho_grafico = os.path.join(PASTA_GRAFICOS, f"{grafico_id}.json")
+    caminho_grafico = caminho_grafico_id(grafico_id)
     if not os.path.exists(caminho_grafico):
         flash("Gráfico não encontrado. Por favor, gere o gráfico novamente.", "danger")
         return redirect(url_for("rotas.painel"))
+    if formato not in FORMATOS_EXPORTACAO:
+        flash("Formato de exportação inválido.", "danger")
+        return redirect(url_for("rotas.painel"))
 
-    #Recuperar o gráfico do arquivo
-    with open(caminho_grafico, 'r') as f:
-        dados_fig = json.load(f)
-        fig = go.Figure(data=go.Figure(json.loads(dados_fig)).data)
-        fig.update_layout(
-            width=800,
-            height=500,
-            margin=dict(l=50, r=50, t=50, b=50)
-        )
-    
-    #Criar buffer para o arquivo
-    buffer = io.BytesIO()
-    
-    if formato == 'png':
-        fig.write_image(buffer, format='png')
-        mimetype = 'image/png'
-        nome_arquivo = f'grafico_{grafico_id}.png'
-    elif formato == 'pdf':
-        fig.write_image(buffer, format='pdf')
-        mimetype = 'application/pdf'
-        nome_arquivo = f'grafico_{grafico_id}.pdf'
-    else:
+    #Renderizar o gráfico na pool de exportação (processos já arrancados; imagens repetidas vêm da cache)
+    try:
+        with metricas.etapa("exportar_imagem", formato=formato, graficos=1):
+            conteudo = pool_renderizacao.renderizar(figura_guardada(caminho_grafico), formato)
+    except ErroExportacao as e:
+        registar("erro_exportacao", grafico=grafico_id, erro=str(e), nivel="error")
+        flash(f"Não foi possível exportar o gráfico: {e} Por favor, tente novamente.", "danger")
+        return redirect(url_for("rotas.painel"))
+    metricas.observar_tamanho("exportacao_bytes", len(conteudo))
+
+    return send_file(
+        io.BytesIO(conteudo),
+        mimetype=FORMATOS_EXPORTACAO[formato],
+        as_attachment=True,
+        download_name=f'grafico_{grafico_id}.{formato}'
+    )
+
+@rotas.route("/exportar_graficos/<formato>")
+@login_required
+def exportar_graficos(formato):
+    #Exporta todos os gráficos da sessão num único ZIP (renderizados em paralelo)
+    if formato not in FORMATOS_EXPORTACAO:
         flash("Formato de exportação inválido.", "danger")
         return redirect(url_for("rotas.painel"))
 
+    caminhos = {grafico_id: caminho_grafico_id(grafico_id) for grafico_id in session.get('lista_graficos', [])}
+    caminhos = {grafico_id: caminho for grafico_id, caminho in caminhos.items() if os.path.exists(caminho)}
+    if not caminhos:
+        flash("Nenhum gráfico disponível para exportar.", "warning")
+        return redirect(url_for("rotas.painel"))
+
+    try:
+        with metricas.etapa("exportar_imagem", formato=formato, graficos=len(caminhos)):
+            conteudos = pool_renderizacao.renderizar_varias([figura_guardada(caminho) for caminho in caminhos.values()], formato)
+    except ErroExportacao as e:
+        registar("erro_exportacao", graficos=len(caminhos), erro=str(e), nivel="error")
+        flash(f"Não foi possível exportar os gráficos: {e} Por favor, tente novamente.", "danger")
+        return redirect(url_for("rotas.painel"))
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as ficheiro_zip:
+        for grafico_id, conteudo in zip(caminhos, conteudos):
+            ficheiro_zip.writestr(f'grafico_{grafico_id}.{formato}', conteudo)
     buffer.seek(0)
     return send_file(
         buffer,
-        mimetype=mimetype,
+        mimetype='application/zip',
         as_attachment=True,
-        download_name=nome_arquivo
+        download_name=f'graficos_{formato}.zip'
     )
 
 @rotas.route("/limpar_graficos", methods=["POST"])
@@ -403,7 +613,6 @@ def limpar_graficos():
     # Limpar as listas de gráficos recentes e anteriores
     session.pop('graficos_recentes', None)
     session.pop('graficos_anteriores', None)
-    session.pop('contador_graficos', None)
     
     # Limpar arquivos de gráficos
     limpar_pasta_graficos()
@@ -411,11 +620,9 @@ def limpar_graficos():
     flash("Todos os gráficos foram limpos.", "success")
     
     # Recuperar dados da sessão para manter o preview
-    if 'dados_excel' in session:
-        df = pd.read_json(io.StringIO(session['dados_excel']))
-        tabela_preview = df.to_html(classes='table table-striped', index=False)
+    if armazem_dados.carregar(current_user.id, session.get('id_dados')) is not None:
         return render_template("painel.html",
-                            preview_html=tabela_preview,
+                            dados_carregados=True,
                             colunas_numericas=session.get('colunas_numericas', []),
                             colunas_texto=session.get('colunas_texto', []))
     
@@ -424,32 +631,33 @@ def limpar_graficos():
 @rotas.route("/voltar_selecao_folhas", methods=["POST"])
 @login_required
 def voltar_selecao_folhas():
+    from .utils import obter_folhas_excel #Extrai os nomes das folhas de um ficheiro Excel
     #Preservar apenas os dados dos arquivos e folhas
     ficheiros_nomes = []
     folhas_por_ficheiro = {}
     
     #Recuperar os arquivos da pasta de uploads
-    if os.path.exists(PASTA_UPLOADS):
-        for arquivo in os.listdir(PASTA_UPLOADS):
-            if arquivo.endswith(('.xlsx', '.xls')):
+    if os.path.exists(pasta_uploads()):
+        for arquivo in os.listdir(pasta_uploads()):
+            if arquivo.lower().endswith(EXTENSOES_ACEITES):
                 ficheiros_nomes.append(arquivo)
-                caminho = os.path.join(PASTA_UPLOADS, arquivo)
+                caminho = os.path.join(pasta_uploads(), arquivo)
                 folhas = obter_folhas_excel(caminho)
                 folhas_por_ficheiro[arquivo] = folhas
     
-    return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro)
+    return render_template("painel.html", folhas_por_ficheiro=folhas_por_ficheiro, folhas_carregadas=folhas_carregadas())
 
 @rotas.route("/voltar_upload", methods=["POST"])
 @login_required
 def voltar_upload():
     #Limpar arquivos temporários
-    if os.path.exists(PASTA_UPLOADS):
-        for arquivo in os.listdir(PASTA_UPLOADS):
-            caminho = os.path.join(PASTA_UPLOADS, arquivo)
+    if os.path.exists(pasta_uploads()):
+        for arquivo in os.listdir(pasta_uploads()):
+            caminho = os.path.join(pasta_uploads(), arquivo)
             try:
                 if os.path.isfile(caminho):
                     os.remove(caminho)
             except Exception as e:
-                print(f"Erro ao remover arquivo {arquivo}: {e}")
+                registar("erro_remover_ficheiro", ficheiro=arquivo, erro=str(e), nivel="warning")
     
     return render_template("painel.html")
\ No newline at end of file
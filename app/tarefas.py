@@ -0,0 +1,247 @@
+import os #Para criar pastas e construir caminhos
+import re #Para validar os identificadores das tarefas
+import json #Para guardar o estado de cada tarefa em disco
+import time #Para medir a duração de cada subtarefa
+import uuid #Para gerar identificadores opacos para cada tarefa
+import atexit #Para terminar os processos da pool quando a aplicação termina
+import threading #Cada tarefa é acompanhada por uma thread que atualiza o seu estado
+import multiprocessing #Para criar os processos de leitura
+from concurrent.futures import ProcessPoolExecutor #Pool de processos que leem os ficheiros em paralelo
+from concurrent.futures.process import BrokenProcessPool #Erro de uma pool em que um processo terminou de forma abrupta
+from flask import Flask #Usado para configurar as extensões dentro dos processos da pool
+from app.espacos import caminho_espaco #O estado das tarefas fica no espaço de trabalho de cada utilizador
+from app.metricas import configurar_registo, registar #Registos estruturados (também dentro dos processos da pool)
+
+PADRAO_ID = re.compile(r"^[0-9a-f]{32}$") #Formato dos identificadores gerados (uuid4 em hexadecimal)
+ETAPAS = {"folhas": "listar_folhas", "dados": "leitura"} #Nome da etapa (nas métricas) das subtarefas de cada tipo de tarefa
+CONFIGURACAO_PROCESSOS = ("PASTA_ESPACOS", "DADOS_CACHE_MEMORIA", "PASTA_CACHE_LEITURA", "CACHE_LEITURA_LIMITE_MB", "NIVEL_REGISTO") #Configuração enviada para os processos
+
+
+def _iniciar_processo(configuracao): #Corre uma vez em cada processo da pool: liga o armazém e a cache de leitura à configuração da aplicação
+    from app import armazem_dados, cache_leitura
+    app = Flask(__name__)
+    app.config.update(configuracao)
+    configurar_registo(configuracao.get("NIVEL_REGISTO", "INFO"))
+    armazem_dados.init_app(app)
+    cache_leitura.init_app(app)
+
+
+def _processo_vivo(pid): #Verifica se o processo que executa uma tarefa ainda existe (o worker pode ter sido reciclado ou terminado pelo gunicorn)
+    if not pid or os.name == "nt":
+        return True #No Windows, os.kill terminaria o processo
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _medir(funcao, *args): #Executa uma subtarefa e devolve também a sua duração (as métricas ficam no processo do servidor)
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def _listar_folhas(caminho): #Lista as folhas de um ficheiro (corre num processo da pool)
+    from app.utils import obter_folhas_excel
+    return obter_folhas_excel(caminho)
+
+
+def _ler_folha(caminho, folha): #Lê uma folha, deteta os tipos e guarda-a tipada na cache de leitura (corre num processo da pool); devolve a duração da inferência
+    from app.utils import ler_folhas_selecionadas
+    tempos = {}
+    ler_folhas_selecionadas(caminho, [folha], tempos)
+    return {"tempos": tempos}
+
+
+def _identificar(caminho, folha): #Identifica uma folha de um ficheiro enviado (o tamanho e a data mudam se o ficheiro for substituído)
+    estado = os.stat(caminho)
+    return [os.path.basename(caminho), folha, estado.st_size, estado.st_mtime_ns]
+
+
+def _partes_base(id_utilizador, base, chaves): #Linhas dos dados atuais que pertencem a folhas que continuam selecionadas
+    import numpy as np
+    from app import armazem_dados
+    df = armazem_dados.carregar(id_utilizador, base["id_dados"]) if base and base.get("id_dados") else None
+    if df is None or sum(parte[4] for parte in base["partes"]) != len(df):
+        return None, [] #Sem dados atuais (ou já apagados): todas as folhas são lidas
+
+    manter = np.zeros(len(df), dtype=bool)
+    partes = []
+    inicio = 0
+    for parte in base["partes"]: #Cada parte ocupa um bloco contínuo de linhas, pela ordem em que foi juntada
+        if tuple(parte[:4]) in chaves:
+            manter[inicio:inicio + parte[4]] = True
+            partes.append(parte)
+        inicio += parte[4]
+    if not partes:
+        return None, []
+    if not manter.all():
+        df = df[manter].reset_index(drop=True)
+        df = df.drop(columns=df.columns[df.isna().all()]) #Colunas que só existiam nas folhas retiradas
+    return (df, {coluna: base["esquema"][coluna] for coluna in df.columns}), partes
+
+
+def _montar_dados(id_utilizador, selecao, base=None): #Junta as folhas novas (já na cache) aos dados atuais já tipados e guarda o resultado no armazém (só a leitura é incremental: a junção, as estatísticas e o Parquet são refeitos para todas as linhas)
+    from app import armazem_dados
+    from app.utils import ler_folhas_selecionadas, juntar_tipados
+    from app.consultas import estatisticas_colunas
+
+    chaves = {tuple(identidade) for _, _, identidade in selecao}
+    bloco_base, partes = _partes_base(id_utilizador, base, chaves)
+    if bloco_base is not None and len(partes) == len(base["partes"]) == len(chaves):
+        return {"id_dados": base["id_dados"], "esquema": base["esquema"], "partes": partes, "linhas": len(bloco_base[0]), "bytes": int(bloco_base[0].memory_usage(deep=True).sum()), "tempos": {}} #Nada mudou
+
+    tempos = {"inferencia": 0.0} #Duração de cada etapa (registada nas métricas pelo processo do servidor)
+    blocos = [bloco_base] if bloco_base is not None else []
+    reutilizadas = {tuple(parte[:4]) for parte in partes}
+    for caminho, folha, identidade in selecao:
+        if tuple(identidade) in reutilizadas:
+            continue
+        bloco = ler_folhas_selecionadas(caminho, [folha], tempos).get(folha) #Já tipada (da cache ou lida agora: só neste caso a inferência conta em tempos)
+        if bloco is None:
+            continue
+        blocos.append(bloco)
+        partes.append([*identidade, len(bloco[0])])
+    if not blocos:
+        return None
+
+    (df_graficos, esquema), tempos["juntar"] = _medir(juntar_tipados, blocos)
+    registar("montar_dados", colunas=df_graficos.columns.tolist(), linhas=len(df_graficos), partes=len(partes), reutilizadas=len(reutilizadas), nivel="debug")
+    estatisticas, tempos["estatisticas"] = _medir(estatisticas_colunas, df_graficos, esquema) #Estatísticas calculadas uma vez para os filtros do painel
+    id_dados, tempos["gravar"] = _medir(armazem_dados.guardar, id_utilizador, df_graficos, estatisticas)
+    return {
+        "id_dados": id_dados,
+        "esquema": esquema,
+        "partes": partes, #[ficheiro, folha, tamanho, data, linhas] de cada bloco de linhas, pela ordem
+        "linhas": len(df_graficos),
+        "bytes": int(df_graficos.memory_usage(deep=True).sum()),
+        "tempos": tempos #Duração da inferência de tipos, da junção, das estatísticas e da escrita do Parquet
+    }
+
+
+class GestorTarefas:
+    """Executa a leitura dos ficheiros em segundo plano, numa pool de processos, e guarda o progresso de cada tarefa em disco"""
+
+    def __init__(self, app=None):
+        self.pasta = "espacos_trabalho"
+        self.processos = 2
+        self.configuracao = {}
+        self.pool = None
+        self.pid = None #Processo onde a pool foi criada (cada worker do gunicorn tem a sua)
+        self.trinco = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app): #Lê a configuração da aplicação (pasta dos espaços de trabalho e número de processos)
+        self.pasta = app.config.get("PASTA_ESPACOS", self.pasta)
+        self.processos = int(app.config.get("TAREFAS_PROCESSOS", 2))
+        self.configuracao = {chave: app.config[chave] for chave in CONFIGURACAO_PROCESSOS if chave in app.config}
+        os.makedirs(self.pasta, exist_ok=True) #Garante que a pasta existe; se não existir, é criada
+
+    def _obter_pool(self): #Cria a pool na primeira utilização (None quando TAREFAS_PROCESSOS = 0: tudo corre na thread da tarefa)
+        if self.processos <= 0:
+            return None
+        with self.trinco:
+            if self.pool is None or self.pid != os.getpid():
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.processos,
+                    mp_context=multiprocessing.get_context("spawn"), #Processos novos (não copiam o estado do servidor web)
+                    initializer=_iniciar_processo,
+                    initargs=(self.configuracao,)
+                )
+                self.pid = os.getpid()
+                atexit.register(self.pool.shutdown, wait=False, cancel_futures=True)
+            return self.pool
+
+    def _descartar_pool(self, pool): #Descarta uma pool avariada (ex: processo terminado por falta de memória) para que a próxima tarefa crie uma nova
+        with self.trinco:
+            if self.pool is pool:
+                self.pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _caminho(self, id_utilizador, id_tarefa): #Caminho do ficheiro com o estado da tarefa
+        if not id_tarefa or not PADRAO_ID.match(id_tarefa):
+            return None #Recusa identificadores inválidos (evita aceder a caminhos fora da pasta)
+        return os.path.join(caminho_espaco(self.pasta, id_utilizador, "tarefas"), f"{id_tarefa}.json")
+
+    def _escrever_estado(self, id_utilizador, id_tarefa, **estado): #Escreve o estado de forma atómica (pode ser lido por qualquer worker)
+        caminho = self._caminho(id_utilizador, id_tarefa)
+        temporario = f"{caminho}.{uuid.uuid4().hex}.tmp" #A thread da tarefa e os pedidos que a consultam podem escrever ao mesmo tempo
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({**estado, "pid": os.getpid()}, f) #Processo dono da tarefa (para detetar tarefas órfãs)
+        os.replace(temporario, caminho)
+
+    def estado(self, id_utilizador, id_tarefa): #Estado atual da tarefa (ou None se não existir para este utilizador)
+        caminho = self._caminho(id_utilizador, id_tarefa)
+        if caminho is None or not os.path.exists(caminho):
+            return None
+        with open(caminho, "r", encoding="utf-8") as f:
+            estado = json.load(f)
+        if estado["estado"] == "em_curso" and not _processo_vivo(estado.get("pid")): #O worker que a executava terminou: a tarefa nunca vai acabar
+            registar("tarefa_orfa", tarefa=id_tarefa, pid=estado.get("pid"), nivel="warning")
+            estado = {**estado, "estado": "erro", "mensagem": "A tarefa foi interrompida porque o servidor reiniciou. Por favor, tente novamente."}
+            self._escrever_estado(id_utilizador, id_tarefa, **{chave: valor for chave, valor in estado.items() if chave != "pid"})
+        return estado
+
+    def remover(self, id_utilizador, id_tarefa): #Apaga o estado de uma tarefa terminada
+        caminho = self._caminho(id_utilizador, id_tarefa)
+        if caminho and os.path.exists(caminho):
+            os.remove(caminho)
+
+    def _iniciar(self, id_utilizador, tipo, subtarefas, final=None): #Cria a tarefa e arranca a thread que a acompanha; devolve o seu identificador
+        id_tarefa = uuid.uuid4().hex
+        os.makedirs(caminho_espaco(self.pasta, id_utilizador, "tarefas"), exist_ok=True)
+        total = len(subtarefas) + (1 if final else 0)
+        self._escrever_estado(id_utilizador, id_tarefa, tipo=tipo, estado="em_curso", progresso=0, total=total)
+        threading.Thread(target=self._executar, args=(id_utilizador, id_tarefa, tipo, subtarefas, final, total), daemon=True).start()
+        return id_tarefa
+
+    def _executar(self, id_utilizador, id_tarefa, tipo, subtarefas, final, total): #Envia as subtarefas para a pool e regista o progresso e a duração de cada uma
+        from app import metricas
+        pool = self._obter_pool()
+        try:
+            if pool is None:
+                pendentes = [(chave, funcao, args) for chave, funcao, args in subtarefas]
+            else:
+                pendentes = [(chave, pool.submit(_medir, funcao, *args), None) for chave, funcao, args in subtarefas] #Todas as folhas/ficheiros em paralelo
+
+            resultados = {}
+            for progresso, (chave, funcao_ou_futuro, args) in enumerate(pendentes, start=1):
+                resultados[chave], duracao = _medir(funcao_ou_futuro, *args) if pool is None else funcao_ou_futuro.result()
+                tempos = resultados[chave].pop("tempos", {}) if isinstance(resultados[chave], dict) else {} #Etapas medidas dentro da subtarefa (ex: inferência dos tipos durante a leitura)
+                for etapa, duracao_etapa in tempos.items():
+                    metricas.observar_etapa(etapa, duracao_etapa, tarefa=id_tarefa, subtarefa=chave)
+                metricas.observar_etapa(ETAPAS[tipo], duracao - sum(tempos.values()), tarefa=id_tarefa, subtarefa=chave)
+                self._escrever_estado(id_utilizador, id_tarefa, tipo=tipo, estado="em_curso", progresso=progresso, total=total)
+
+            if final:
+                funcao, args = final
+                resultados = funcao(*args) if pool is None else pool.submit(funcao, *args).result()
+                if resultados:
+                    for etapa, duracao in resultados.pop("tempos", {}).items(): #Cada etapa com o seu próprio nome (inferencia, juntar, estatisticas, gravar)
+                        metricas.observar_etapa(etapa, duracao, tarefa=id_tarefa)
+                    metricas.observar_tamanho("dados_linhas", resultados["linhas"])
+                    metricas.observar_tamanho("dados_bytes", resultados["bytes"])
+
+            self._escrever_estado(id_utilizador, id_tarefa, tipo=tipo, estado="concluida", progresso=total, total=total, resultado=resultados)
+        except BrokenProcessPool as e:
+            self._descartar_pool(pool)
+            registar("erro_tarefa", tarefa=id_tarefa, tipo=tipo, erro=str(e), nivel="error")
+            self._escrever_estado(id_utilizador, id_tarefa, tipo=tipo, estado="erro", progresso=0, total=total, mensagem=str(e))
+        except Exception as e:
+            registar("erro_tarefa", tarefa=id_tarefa, tipo=tipo, erro=str(e), nivel="error")
+            self._escrever_estado(id_utilizador, id_tarefa, tipo=tipo, estado="erro", progresso=0, total=total, mensagem=str(e))
+
+    def listar_folhas(self, id_utilizador, ficheiros): #Tarefa que lista as folhas de vários ficheiros em paralelo ({nome: caminho})
+        subtarefas = [(nome, _listar_folhas, (caminho,)) for nome, caminho in ficheiros.items()]
+        return self._iniciar(id_utilizador, "folhas", subtarefas)
+
+    def carregar_dados(self, id_utilizador, selecao, base=None): #Tarefa que lê em paralelo só as folhas que não estão nos dados atuais (base) e junta-as ([(caminho, [folhas])])
+        partes = [(caminho, folha, _identificar(caminho, folha)) for caminho, folhas in selecao for folha in folhas]
+        carregadas = {tuple(parte[:4]) for parte in (base or {}).get("partes") or []}
+        subtarefas = [(f"{caminho}:{folha}", _ler_folha, (caminho, folha)) for caminho, folha, identidade in partes
+                      if tuple(identidade) not in carregadas and not caminho.lower().endswith(".parquet")] #O Parquet não passa pela cache: é lido (mapeado em memória) só uma vez, ao juntar
+        return self._iniciar(id_utilizador, "dados", subtarefas, final=(_montar_dados, (id_utilizador, partes, base)))
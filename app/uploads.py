@@ -0,0 +1,111 @@
+import os #Para criar, mover e apagar os ficheiros recebidos
+import hashlib #Para calcular o SHA-256 enquanto o ficheiro é escrito
+from flask import Request, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge #Erro 413: ficheiro ou pedido maior do que o limite
+from app.espacos import novo_id, PREFIXO_RECECAO #Nome único dos ficheiros ainda em receção (que as quotas nunca apagam)
+
+ASSINATURAS = { #Primeiros bytes de cada formato (o CSV não tem assinatura: só não pode ter bytes nulos)
+    ".xlsx": (b"PK\x03\x04",), #ZIP
+    ".xls": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",), #OLE2 (formato antigo do Excel)
+    ".parquet": (b"PAR1",),
+}
+TAMANHO_ASSINATURA = 8 #Bytes do início do ficheiro usados para verificar o formato
+
+
+def assinatura_valida(nome, inicio): #Verifica se os primeiros bytes correspondem à extensão do ficheiro
+    extensao = os.path.splitext(nome.lower())[1]
+    if extensao == ".csv":
+        return bool(inicio) and b"\x00" not in inicio
+    return inicio.startswith(ASSINATURAS.get(extensao, ()))
+
+
+class FicheiroRecebido:
+    """Ficheiro enviado, escrito diretamente no espaço de trabalho à medida que chega (com o SHA-256 calculado durante a escrita)"""
+
+    def __init__(self, pasta, nome, limite, disponivel=None):
+        self.nome = nome or ""
+        self.limite = limite
+        self.disponivel = disponivel #Espaço que ainda cabe nas quotas do utilizador (None: sem verificação)
+        self.sem_espaco = False
+        self.caminho = os.path.join(pasta, f"{PREFIXO_RECECAO}{novo_id()}")
+        self.ficheiro = open(self.caminho, "w+b")
+        self.sha = hashlib.sha256()
+        self.tamanho = 0
+        self.inicio = b""
+        self.valido = None #None enquanto não chegarem os primeiros bytes
+
+    def write(self, dados):
+        self.tamanho += len(dados)
+        if self.tamanho > self.limite: #Interrompe a receção assim que o limite é ultrapassado
+            raise RequestEntityTooLarge()
+        if self.disponivel is not None and self.tamanho > self.disponivel and not self.sem_espaco: #Ultrapassou a quota: deixa de escrever e apaga o que já foi escrito
+            self.sem_espaco = True
+            self.descartar()
+        if self.sem_espaco:
+            return len(dados)
+        if self.valido is None:
+            self.inicio += dados[:TAMANHO_ASSINATURA - len(self.inicio)]
+            if len(self.inicio) >= TAMANHO_ASSINATURA:
+                self._verificar()
+        if self.valido is False:
+            return len(dados) #Formato errado: o resto do ficheiro é ignorado (não é escrito em disco)
+        self.sha.update(dados)
+        return self.ficheiro.write(dados)
+
+    def _verificar(self): #Verifica a assinatura; se não corresponder, o ficheiro parcial é apagado logo
+        self.valido = assinatura_valida(self.nome, self.inicio)
+        if not self.valido:
+            self.descartar()
+
+    def seek(self, posicao, origem=0): #Chamado pelo Werkzeug no fim da receção
+        if self.valido is None and not self.sem_espaco:
+            self._verificar() #Ficheiros mais pequenos do que a assinatura
+        return self.ficheiro.seek(posicao, origem) if not self.ficheiro.closed else 0
+
+    def tell(self):
+        return self.ficheiro.tell() if not self.ficheiro.closed else self.tamanho
+
+    def read(self, *args):
+        return self.ficheiro.read(*args) if not self.ficheiro.closed else b""
+
+    def readline(self, *args):
+        return self.ficheiro.readline(*args) if not self.ficheiro.closed else b""
+
+    def close(self):
+        self.ficheiro.close()
+
+    @property
+    def hash(self): #SHA-256 do conteúdo recebido
+        return self.sha.hexdigest()
+
+    def guardar(self, destino): #Move o ficheiro já escrito para o destino final (sem voltar a copiar os dados)
+        self.ficheiro.close()
+        os.replace(self.caminho, destino)
+
+    def descartar(self): #Apaga o ficheiro parcial (formato errado, sem espaço ou pedido interrompido)
+        self.ficheiro.close()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+class Pedido(Request):
+    """Pedido cujos ficheiros são escritos diretamente na pasta de uploads do utilizador autenticado, em vez de uma cópia temporária"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        from flask_login import current_user
+        if not filename or not current_user.is_authenticated:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        from app import espacos_trabalho
+        recebido = FicheiroRecebido(
+            espacos_trabalho.pasta(current_user.id, "uploads"),
+            filename,
+            int(current_app.config.get("UPLOAD_LIMITE_FICHEIRO_MB", 200)) * 1024 * 1024,
+            espacos_trabalho.disponivel(current_user.id) #A receção para assim que a quota é ultrapassada
+        )
+        self.__dict__.setdefault("ficheiros_recebidos", []).append(recebido)
+        return recebido
+
+
+def descartar_recebidos(excecao=None): #No fim de cada pedido, apaga os ficheiros recebidos que não foram guardados (inválidos ou pedido interrompido)
+    for recebido in request.__dict__.get("ficheiros_recebidos", []):
+        recebido.descartar()
@@ -1,36 +1,388 @@
 import pandas as pd  #Para manipulação de dados em tabelas
+import numpy as np  #Para cálculos vetorizados sobre as colunas
 import os #Para obter o nome do ficheiro
+import re #Para reconhecer números escritos com vírgula ou ponto decimal
+import time #Para medir a duração da deteção dos tipos
+import csv #Para detetar o separador dos ficheiros CSV
+import codecs #Para descodificar o início dos ficheiros CSV (mesmo que termine a meio de um carácter)
+from openpyxl import load_workbook #Para ler ficheiros .xlsx em modo de leitura contínua (streaming)
+from app import cache_leitura #Cache das folhas já lidas (evita voltar a processar o mesmo ficheiro)
+from app.armazem import preparar_para_arrow #Garante que os dados lidos são iguais aos guardados na cache
+from app.metricas import registar #Registos estruturados (substituem os print de depuração)
 
-#Devolve os nomes das folhas do Excel
+LINHAS_POR_BLOCO = 50000 #Número máximo de linhas guardadas em listas antes de serem convertidas num DataFrame
+EXTENSOES_TABELA = (".csv", ".parquet") #Ficheiros com uma única tabela (aparecem no painel como uma única "folha")
+SEPARADORES_CSV = ",;\t|" #Separadores de colunas aceites nos ficheiros CSV
+CODIFICACOES_CSV = ("utf-8-sig", "cp1252", "latin-1") #Codificações experimentadas por ordem (latin-1 aceita sempre)
+TAMANHO_AMOSTRA_CSV = 64 * 1024 #Bytes lidos do início do CSV para detetar a codificação, o separador e o separador decimal
+DECIMAL_VIRGULA = re.compile(r"^-?\d+,\d+$") #Ex: 12,5
+DECIMAL_PONTO = re.compile(r"^-?\d+\.\d+$") #Ex: 12.5
+ERROS_EXCEL = {"#N/A", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#NULL!"} #Valores de erro do Excel (tratados como vazios, como no pandas)
+
+TAMANHO_AMOSTRA = 1000 #Número de valores de cada coluna usados para decidir o seu tipo
+LIMITE_FALHAS_CONVERSAO = 0.05 #Percentagem máxima de valores que podem falhar a conversão antes de a coluna ficar como texto
+LIMITE_CATEGORIA = 0.5 #Texto com menos valores distintos do que esta fração das linhas passa a 'category'
+NUMERO_VIRGULA = re.compile(r"^[+-]?(\d{1,3}(\.\d{3})+|\d+)(,\d+)?$") #Ex: 1.234,56 ou 12,5
+NUMERO_PONTO = re.compile(r"^[+-]?(\d{1,3}(,\d{3})+|\d+)(\.\d+)?([eE][+-]?\d+)?$") #Ex: 1,234.56 ou 12.5
+FORMATOS_DATA = ["ISO8601", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%y", "%m/%d/%Y"] #Formatos de data aceites (dia antes do mês primeiro)
+
+
+def _abrir_livro(ficheiro): #Abre o livro em modo só de leitura: as folhas são lidas linha a linha, sem carregar tudo para memória
+    return load_workbook(ficheiro, read_only=True, data_only=True, keep_links=False)
+
+
+def _e_xls(ficheiro): #O formato antigo .xls não é suportado pelo openpyxl
+    return str(ficheiro).lower().endswith(".xls")
+
+
+def _e_tabela(ficheiro): #CSV e Parquet não têm folhas: são lidos com o pyarrow, sem passar pelo openpyxl
+    return str(ficheiro).lower().endswith(EXTENSOES_TABELA)
+
+
+def _folha_tabela(ficheiro): #Nome da única "folha" de um CSV/Parquet (o nome do ficheiro sem extensão)
+    return os.path.splitext(os.path.basename(ficheiro))[0]
+
+
+def _detetar_formato_csv(ficheiro): #Deteta a codificação, o separador de colunas e o separador decimal a partir do início do ficheiro
+    with open(ficheiro, "rb") as f:
+        inicio = f.read(TAMANHO_AMOSTRA_CSV)
+    if not inicio.strip():
+        raise ValueError("ficheiro CSV vazio")
+    for codificacao in CODIFICACOES_CSV:
+        try:
+            amostra = codecs.getincrementaldecoder(codificacao)().decode(inicio, final=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    linhas = [linha for linha in amostra.splitlines()[:-1] or amostra.splitlines() if linha.strip()] #A última linha da amostra pode estar incompleta
+
+    try:
+        separador = csv.Sniffer().sniff("\n".join(linhas[:50]), delimiters=SEPARADORES_CSV).delimiter
+    except csv.Error:
+        separador = max(SEPARADORES_CSV, key=linhas[0].count) #Sem padrão claro: o separador mais frequente no cabeçalho
+
+    campos = [campo.strip().strip('"') for linha in linhas[1:] for campo in linha.split(separador)]
+    virgulas = sum(1 for campo in campos if DECIMAL_VIRGULA.match(campo))
+    pontos = sum(1 for campo in campos if DECIMAL_PONTO.match(campo))
+    decimal = "," if separador != "," and virgulas > pontos else "."
+    return ("utf8" if codificacao == "utf-8-sig" else codificacao), separador, decimal
+
+
+def _ler_csv(ficheiro): #Lê o CSV com o leitor multithread do pyarrow
+    import pyarrow.csv as pv
+    codificacao, separador, decimal = _detetar_formato_csv(ficheiro)
+    return pv.read_csv(
+        ficheiro,
+        read_options=pv.ReadOptions(encoding=codificacao, use_threads=True),
+        parse_options=pv.ParseOptions(delimiter=separador),
+        convert_options=pv.ConvertOptions(decimal_point=decimal, strings_can_be_null=True) #Células vazias ficam vazias (como no Excel)
+    )
+
+
+def _ler_parquet(ficheiro): #Lê o Parquet diretamente para Arrow (ficheiro mapeado em memória)
+    import pyarrow.parquet as pq
+    return pq.read_table(ficheiro, memory_map=True)
+
+
+def _tabela_para_dataframe(tabela): #Converte a tabela Arrow num DataFrame com os mesmos nomes de colunas que as folhas de Excel
+    tabela = tabela.replace_schema_metadata(None) #Ignora o índice guardado pelo pandas nos ficheiros Parquet
+    nomes = _nomes_colunas([nome or None for nome in tabela.column_names])
+    indices = [i for i, nome in enumerate(nomes) if not nome.startswith(("Unnamed", "__index_level_"))]
+    if not indices or tabela.num_rows == 0:
+        return None
+    tabela = tabela.select(indices).rename_columns([nomes[i] for i in indices])
+    return tabela.to_pandas(split_blocks=True, self_destruct=True) #Evita ter a tabela Arrow e o DataFrame completos em memória ao mesmo tempo
+
+
+def _tipar(dados, tempos): #Deteta os tipos das colunas a partir de uma amostra e converte cada coluna de uma vez (tipos compactos); soma a duração em tempos["inferencia"]
+    inicio = time.perf_counter()
+    tipada = inferir_tipos(preparar_para_arrow(dados))
+    tempos["inferencia"] = tempos.get("inferencia", 0.0) + time.perf_counter() - inicio
+    return tipada
+
+
+def _ler_ficheiro_tabela(ficheiro, folhas_escolhidas, hash_conteudo, tempos): #Lê um CSV/Parquet (uma única "folha"), deteta os tipos e guarda o CSV tipado na cache
+    lidas = {}
+    nome_ficheiro = os.path.basename(ficheiro)
+    folha = _folha_tabela(ficheiro)
+    if folha not in folhas_escolhidas:
+        return lidas
+    e_csv = str(ficheiro).lower().endswith(".csv")
+    try:
+        dados = _tabela_para_dataframe(_ler_csv(ficheiro) if e_csv else _ler_parquet(ficheiro))
+    except Exception as e:
+        registar("erro_ler_folha", ficheiro=nome_ficheiro, folha=folha, erro=str(e), nivel="warning")
+        return lidas
+    if dados is None:
+        registar("folha_vazia", ficheiro=nome_ficheiro, folha=folha, nivel="debug")
+        return lidas
+    lidas[folha] = _tipar(dados, tempos)
+    if e_csv: #O Parquet já é rápido de ler: não vale a pena guardar outra cópia na cache
+        cache_leitura.guardar_folha(hash_conteudo, folha, *lidas[folha])
+    return lidas
+
+
+#Devolve os nomes das folhas do Excel (os ficheiros CSV e Parquet têm uma única folha)
 def obter_folhas_excel(ficheiro):
     try:
-        excel_file = pd.ExcelFile(ficheiro) #Abre o ficheiro Excel 
-        return excel_file.sheet_names #Devolve a lista de nomes das folhas
+        if _e_tabela(ficheiro): #Só verifica se o ficheiro é válido (cabeçalho do CSV ou metadados do Parquet)
+            if str(ficheiro).lower().endswith(".csv"):
+                _detetar_formato_csv(ficheiro)
+            else:
+                import pyarrow.parquet as pq
+                pq.read_metadata(ficheiro)
+            return [_folha_tabela(ficheiro)]
+        hash_conteudo = cache_leitura.hash_ficheiro(ficheiro)
+        folhas = cache_leitura.obter_folhas(hash_conteudo) #Se este conteúdo já foi lido, não abre o Excel
+        if folhas is not None:
+            return folhas
+        if _e_xls(ficheiro):
+            with pd.ExcelFile(ficheiro) as excel_file: #Abre o ficheiro Excel
+                folhas = excel_file.sheet_names #Lista de nomes das folhas
+        else:
+            livro = _abrir_livro(ficheiro) #Só lê o índice do livro, as folhas não são processadas
+            try:
+                folhas = livro.sheetnames
+            finally:
+                livro.close()
+        cache_leitura.guardar_folhas(hash_conteudo, folhas)
+        return folhas #Devolve a lista de nomes das folhas
     except Exception as e:
-        print(f"Erro ao obter folhas: {e}") #Mostra erro no terminal (depuração)
+        registar("erro_obter_folhas", ficheiro=os.path.basename(ficheiro), erro=str(e), nivel="warning")
         return []
 
 
-def ler_folhas_selecionadas(ficheiro, folhas_escolhidas): #Lê apenas as folhas escolhidas e devolve o DataFrame final
-    todos_dfs = [] #Lista onde vão ser guardados todos os DataFrames lidos
-    for folha in folhas_escolhidas:
-        try:
-            dados = pd.read_excel(ficheiro, sheet_name=folha, header=None) #Lê a folha sem assumir cabeçalho, para encontrar onde começam os dados
-            primeira_linha_valida = dados.dropna(how='all').index.min() #Identifica a primeira linha com conteúdo (ignora linhas totalmente vazias)
-            dados = pd.read_excel(ficheiro, sheet_name=folha, skiprows=primeira_linha_valida) #Lê novamente a folha, agora a partir da linha com dados reais
-            dados.columns = dados.columns.str.strip().str.replace(' ', '_') #Normaliza os nomes das colunas     
-            dados["Ficheiro"] = os.path.basename(ficheiro) #Adiciona informações do arquivo
-            dados["Folha"] = folha #Adiciona informações da folha
-            dados = dados.loc[:, ~dados.columns.str.contains("^Unnamed")] #Remove colunas automáticas sem nome (geradas pelo Excel)
-            print(f"Colunas lidas do arquivo {os.path.basename(ficheiro)}, folha {folha}:", dados.columns.tolist())#Depuração: mostra as colunas sendo lidas
-            todos_dfs.append(dados)
-
-        except Exception as e:
-            print(f"Erro na folha {folha}: {e}") #Mostra erro no terminal (depuração)
-
-    if todos_dfs:
-        df_final = pd.concat(todos_dfs, ignore_index=True) #Combina todos os DataFrames
-        print("Colunas finais após concatenação:", df_final.columns.tolist()) #Depuração: mostra as colunas finais
-        return df_final
+def _converter_celula(valor): #Converte o valor de uma célula da mesma forma que o pandas.read_excel
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor) #Números inteiros guardados como decimais (ex: 3.0) passam a inteiros
+    if isinstance(valor, str) and valor in ERROS_EXCEL:
+        return None
+    return valor
+
+
+def _nomes_colunas(cabecalho): #Cria os nomes das colunas a partir da linha de cabeçalho (vazios -> "Unnamed", repetidos -> ".1", ".2"...)
+    nomes = []
+    vistos = {}
+    for indice, valor in enumerate(cabecalho):
+        nome = f"Unnamed: {indice}" if valor is None else str(valor)
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        vistos.setdefault(nome, 0)
+        nomes.append(nome.strip().replace(' ', '_')) #Normaliza os nomes das colunas
+    return nomes
+
+
+def _construir_folha(linhas): #Constrói o DataFrame de uma folha a partir das suas linhas, lidas uma única vez
+    blocos = [] #DataFrames parciais (cada um com no máximo LINHAS_POR_BLOCO linhas)
+    bloco = [] #Linhas ainda por converter
+    nomes = None #Nomes de todas as colunas (definidos pela primeira linha com conteúdo)
+    indices = None #Posições das colunas que vão ser mantidas (as colunas sem nome são ignoradas)
+    vazias_pendentes = 0 #Linhas vazias só são adicionadas se aparecerem mais dados depois delas
+
+    for linha in linhas:
+        valores = [_converter_celula(valor) for valor in linha]
+        vazia = all(valor is None for valor in valores)
+
+        if nomes is None: #Ainda à procura do cabeçalho
+            if vazia:
+                continue #Ignora as linhas totalmente vazias antes dos dados
+            nomes = _nomes_colunas(valores)
+            indices = [i for i, nome in enumerate(nomes) if not nome.startswith("Unnamed")] #Remove colunas automáticas sem nome
+            nomes = [nomes[i] for i in indices]
+            continue
+
+        if vazia:
+            vazias_pendentes += 1
+            continue
+        bloco.extend([[None] * len(indices)] * vazias_pendentes)
+        vazias_pendentes = 0
+        bloco.append([valores[i] if i < len(valores) else None for i in indices])
+
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            blocos.append(pd.DataFrame(bloco, columns=nomes, dtype=object).infer_objects())
+            bloco = []
+
+    if nomes is None:
+        return None #Folha sem qualquer conteúdo
+    if bloco or not blocos:
+        blocos.append(pd.DataFrame(bloco, columns=nomes, dtype=object).infer_objects())
+
+    return pd.concat(blocos, ignore_index=True) if len(blocos) > 1 else blocos[0]
+
+
+def _linhas_folha(livro, folha): #Devolve as linhas de uma folha à medida que são lidas do ficheiro
+    if isinstance(livro, pd.ExcelFile): #Ficheiros .xls: o pandas lê a folha sem assumir cabeçalho
+        dados = livro.parse(folha, header=None)
+        return dados.astype(object).where(dados.notna(), None).itertuples(index=False, name=None)
+    folha_excel = livro[folha]
+    folha_excel.reset_dimensions() #As dimensões gravadas no ficheiro nem sempre estão corretas
+    return folha_excel.iter_rows(values_only=True)
+
+
+def _ler_folhas_livro(ficheiro, folhas_escolhidas, hash_conteudo, tempos): #Lê as folhas do Excel (abrindo o livro uma única vez), deteta os tipos e guarda-as tipadas na cache
+    lidas = {}
+    nome_ficheiro = os.path.basename(ficheiro)
+    try:
+        livro = pd.ExcelFile(ficheiro) if _e_xls(ficheiro) else _abrir_livro(ficheiro) #O livro é aberto uma única vez para todas as folhas
+    except Exception as e:
+        registar("erro_abrir_ficheiro", ficheiro=nome_ficheiro, erro=str(e), nivel="warning")
+        return lidas
+
+    try:
+        for folha in folhas_escolhidas:
+            try:
+                dados = _construir_folha(_linhas_folha(livro, folha)) #Deteta o cabeçalho e lê os dados na mesma passagem
+                if dados is None:
+                    registar("folha_vazia", ficheiro=nome_ficheiro, folha=folha, nivel="debug")
+                    continue
+                lidas[folha] = _tipar(dados, tempos)
+                cache_leitura.guardar_folha(hash_conteudo, folha, *lidas[folha])
+            except Exception as e:
+                registar("erro_ler_folha", ficheiro=nome_ficheiro, folha=folha, erro=str(e), nivel="warning")
+    finally:
+        livro.close()
+    return lidas
+
+
+def ler_folhas_selecionadas(ficheiro, folhas_escolhidas, tempos=None): #Lê apenas as folhas escolhidas, já tipadas: {folha: (DataFrame, esquema)} (a inferência só corre para as folhas que não estão na cache)
+    tempos = {} if tempos is None else tempos
+    nome_ficheiro = os.path.basename(ficheiro)
+    try:
+        hash_conteudo = cache_leitura.hash_ficheiro(ficheiro)
+    except OSError as e:
+        registar("erro_abrir_ficheiro", ficheiro=nome_ficheiro, erro=str(e), nivel="warning")
+        return {}
+
+    lidas = {folha: cache_leitura.obter_folha(hash_conteudo, folha) for folha in folhas_escolhidas} #Folhas que já estão na cache
+    em_falta = [folha for folha, dados in lidas.items() if dados is None]
+    if em_falta: #O Excel só é aberto se alguma folha ainda não estiver na cache
+        ler = _ler_ficheiro_tabela if _e_tabela(ficheiro) else _ler_folhas_livro
+        lidas.update(ler(ficheiro, em_falta, hash_conteudo, tempos))
+
+    lidas = {folha: dados for folha, dados in lidas.items() if dados is not None}
+    for folha, (dados, _) in lidas.items():
+        registar("folha_lida", ficheiro=nome_ficheiro, folha=folha, colunas=dados.columns.tolist(), linhas=len(dados), nivel="debug")
+    return lidas
+
+
+def _amostra(serie, tamanho): #Valores não vazios espalhados ao longo da coluna (não só os primeiros)
+    nao_nulos = serie.dropna()
+    if len(nao_nulos) > tamanho:
+        nao_nulos = nao_nulos.iloc[np.linspace(0, len(nao_nulos) - 1, tamanho).astype(int)]
+    return nao_nulos
+
+
+def _reduzir_numeros(serie): #Converte os números para o tipo mais pequeno que os guarda sem perdas
+    valores = serie.to_numpy(dtype="float64")
+    if not serie.isna().any() and np.all(np.mod(valores, 1) == 0):
+        return pd.to_numeric(serie.astype("int64"), downcast="integer") #Inteiros: int8, int16, int32 ou int64
+    reduzida = serie.astype("float32")
+    if np.array_equal(reduzida.to_numpy(dtype="float64"), valores, equal_nan=True):
+        return reduzida #Só usa float32 quando todos os valores ficam exatamente iguais
+    return serie.astype("float64")
+
+
+def _converter_texto(serie, tamanho_amostra): #Decide o tipo de uma coluna de texto pela amostra e converte a coluna inteira de uma vez
+    amostra = _amostra(serie, tamanho_amostra).astype(str).str.strip()
+    if amostra.empty:
+        return serie, "texto"
+    nao_nulos = serie.notna().sum()
+    texto = serie.astype(str).str.strip().where(serie.notna())
+
+    minimo = 1 - LIMITE_FALHAS_CONVERSAO #Fração mínima da amostra que tem de ser reconhecida
+    virgula = amostra.str.match(NUMERO_VIRGULA).mean() >= minimo
+    ponto = amostra.str.match(NUMERO_PONTO).mean() >= minimo
+    convertida = None
+    if virgula and (amostra.str.contains(",", regex=False).any() or not ponto):
+        convertida = pd.to_numeric(texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False), errors="coerce") #Vírgula decimal e ponto nos milhares
+    elif ponto:
+        convertida = pd.to_numeric(texto.str.replace(",", "", regex=False), errors="coerce") #Ponto decimal e vírgula nos milhares
     else:
-        return None
\ No newline at end of file
+        for formato in FORMATOS_DATA:
+            if pd.to_datetime(amostra, format=formato, errors="coerce").notna().mean() >= minimo: #Primeiro formato que reconhece a amostra
+                convertida = pd.to_datetime(texto, format=formato, errors="coerce")
+                break
+
+    if convertida is not None and convertida.notna().sum() >= nao_nulos * (1 - LIMITE_FALHAS_CONVERSAO):
+        if pd.api.types.is_datetime64_any_dtype(convertida):
+            return convertida, "data"
+        return _reduzir_numeros(convertida), "numerica"
+
+    if serie.nunique() <= nao_nulos * LIMITE_CATEGORIA: #Poucos valores distintos: guardados uma vez só
+        return serie.astype("category"), "categoria"
+    return serie, "texto"
+
+
+def inferir_tipos(df, tamanho_amostra=TAMANHO_AMOSTRA): #Deteta o tipo de cada coluna e devolve o DataFrame convertido e o esquema
+    colunas = {}
+    esquema = {} #Tipo de cada coluna: 'numerica', 'data', 'categoria' ou 'texto'
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_bool_dtype(serie):
+            colunas[coluna], esquema[coluna] = serie, "texto"
+        elif pd.api.types.is_numeric_dtype(serie):
+            colunas[coluna], esquema[coluna] = _reduzir_numeros(serie), "numerica"
+        elif pd.api.types.is_datetime64_any_dtype(serie):
+            colunas[coluna], esquema[coluna] = serie, "data"
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            colunas[coluna], esquema[coluna] = serie, "categoria"
+        else:
+            colunas[coluna], esquema[coluna] = _converter_texto(serie, tamanho_amostra)
+    return pd.DataFrame(colunas, index=df.index), esquema
+
+
+def _para_texto(serie): #Converte uma coluna (de qualquer tipo) em texto, mantendo os vazios
+    serie = serie.astype(object)
+    return serie.map(str).where(serie.notna())
+
+
+def juntar_tipados(blocos): #Junta DataFrames já tipados ([(df, esquema)]) e reconcilia as colunas com tipos diferentes em cada bloco
+    if len(blocos) == 1:
+        return blocos[0]
+    tipos = {} #Tipos de cada coluna nos vários blocos (pela ordem em que as colunas aparecem)
+    for df, esquema in blocos:
+        for coluna in df.columns:
+            tipos.setdefault(coluna, set()).add(esquema.get(coluna, "texto"))
+    esquema = {coluna: tipos_coluna.pop() if len(tipos_coluna) == 1 else "texto" for coluna, tipos_coluna in tipos.items()} #Tipos diferentes: a coluna passa a texto
+    reavaliar = [coluna for coluna, tipos_coluna in tipos.items() if tipos_coluna == {"categoria", "texto"}] #Podem voltar a ser categorias depois de juntas
+
+    ajustados = []
+    for df, esquema_bloco in blocos:
+        mudar = [coluna for coluna in df.columns if esquema[coluna] == "texto" and esquema_bloco.get(coluna, "texto") != "texto"]
+        ajustados.append(df.assign(**{coluna: _para_texto(df[coluna]) for coluna in mudar}) if mudar else df)
+    df_total = pd.concat(ajustados, ignore_index=True)[list(esquema)] #Colunas que faltam num bloco ficam vazias nas suas linhas
+
+    for coluna, tipo in esquema.items():
+        if tipo == "numerica":
+            df_total[coluna] = _reduzir_numeros(df_total[coluna]) #Ex: inteiros com vazios passam a float, int8 + int32 passam a int32
+        elif tipo == "categoria" and not isinstance(df_total[coluna].dtype, pd.CategoricalDtype):
+            df_total[coluna] = df_total[coluna].astype("category") #Categorias diferentes em cada bloco
+    for coluna in reavaliar:
+        if df_total[coluna].nunique() <= df_total[coluna].notna().sum() * LIMITE_CATEGORIA:
+            df_total[coluna], esquema[coluna] = df_total[coluna].astype("category"), "categoria"
+    return df_total, esquema
+
+
+def colunas_do_esquema(esquema): #Separa as colunas que podem ser usadas no eixo Y (numéricas) das do eixo X (texto, categorias e datas)
+    colunas_numericas = [coluna for coluna, tipo in esquema.items() if tipo == "numerica"]
+    colunas_texto = [coluna for coluna, tipo in esquema.items() if tipo != "numerica"]
+    return colunas_numericas, colunas_texto
+
+
+def pagina_para_json(df): #Converte uma página de dados em listas simples (datas em texto, vazios em None) para enviar em JSON
+    colunas = []
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            so_datas = (serie.dropna() == serie.dropna().dt.normalize()).all() #Sem horas: mostra apenas a data
+            serie = serie.dt.strftime("%Y-%m-%d" if so_datas else "%Y-%m-%d %H:%M:%S")
+        serie = serie.astype(object)
+        colunas.append(serie.where(serie.notna(), None).tolist())
+    return [list(linha) for linha in zip(*colunas)]
+
+
+def json_seguro(texto): #Texto JSON seguro para ser colocado dentro de uma tag <script> (ex: especificação de uma figura do Plotly)
+    return texto.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
@@ -0,0 +1,225 @@
+import os #Para as pastas temporárias e as variáveis de ambiente da aplicação
+import re #Para encontrar os identificadores das tarefas e dos gráficos no HTML
+import sys #Para o código de saída (1 quando há regressões)
+import json #Para guardar e ler os resultados de referência
+import time #Para medir o tempo de cada etapa
+import shutil #Para apagar as pastas temporárias no fim
+import argparse #Opções da linha de comandos
+import platform #Para registar o ambiente onde os resultados foram medidos
+import tempfile #Cada execução usa pastas novas (caches vazias)
+import statistics #Mediana dos tempos das repetições
+import tracemalloc #Para medir o pico de memória de cada etapa
+from contextlib import contextmanager #Para medir etapas com "with medir(...)"
+from benchmarks.livro_sintetico import gerar_livro #Gerador dos livros Excel usados nas medições
+
+ETAPAS = ( #Etapas medidas, pela ordem em que são executadas
+    "enviar_excel", "selecionar_folhas", "pre_visualizacao",
+    "grafico_barras", "grafico_linhas", "grafico_pizza", "grafico_repetido", "exportar_png"
+)
+GRAFICOS = { #Parâmetros de cada gráfico (colunas do livro sintético)
+    "grafico_barras": ("Barras", "Categoria", "Valor"),
+    "grafico_linhas": ("Linhas", "Data", "Valor"),
+    "grafico_pizza": ("Pizza", "Categoria", "Quantidade"),
+    "grafico_repetido": ("Barras", "Categoria", "Valor"), #Mesmo gráfico outra vez (deve vir da cache)
+}
+
+
+@contextmanager
+def medir(resultados, etapa, memoria): #Regista o tempo (e, se pedido, o pico de memória) do bloco "with"
+    if memoria:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    inicio = time.perf_counter()
+    yield
+    resultados[etapa] = {"tempo_s": time.perf_counter() - inicio}
+    if memoria:
+        resultados[etapa]["memoria_pico_mb"] = (tracemalloc.get_traced_memory()[1] - base) / (1024 * 1024)
+
+
+def _verificar(resposta, etapa): #Falha logo se a aplicação devolver um erro (os tempos de um erro não servem de referência)
+    if resposta.status_code >= 400:
+        raise RuntimeError(f"{etapa}: a aplicação respondeu {resposta.status_code}")
+    return resposta
+
+
+def _esperar_tarefa(cliente, resposta): #Acompanha a tarefa em segundo plano até terminar e devolve a página final
+    encontrado = re.search(rb'data-concluir="([^"]+)"', resposta.data)
+    if not encontrado:
+        return resposta
+    url_concluir = encontrado.group(1).decode()
+    url_estado = url_concluir.rsplit("/", 1)[0]
+    while cliente.get(url_estado).get_json()["estado"] == "em_curso":
+        time.sleep(0.01)
+    return cliente.get(url_concluir, follow_redirects=True)
+
+
+def _criar_app(pasta): #Cria a aplicação com todas as pastas dentro de "pasta" (caches vazias em cada execução)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(pasta, 'benchmark.db')}",
+        "PASTA_ESPACOS": os.path.join(pasta, "espacos_trabalho"),
+        "PASTA_CACHE_LEITURA": os.path.join(pasta, "cache_leitura"),
+        "ESPACOS_INTERVALO_LIMPEZA": "0", #Sem limpeza automática durante as medições
+        "TAREFAS_PROCESSOS": "0", #A leitura corre neste processo, para que o tracemalloc a consiga medir
+        "NIVEL_REGISTO": "WARNING",
+    })
+    from app import criar_app, db
+    app = criar_app()
+    app.config.update(WTF_CSRF_ENABLED=False, TESTING=True)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def executar_uma_vez(livro, folhas, exportar, memoria): #Percorre todas as etapas com o cliente de testes do Flask
+    pasta = tempfile.mkdtemp(prefix="benchmark_")
+    resultados = {}
+    try:
+        cliente = _criar_app(pasta).test_client()
+        dados_conta = dict(nome="Benchmark", email="benchmark@exemplo.pt", senha="benchmark1", confirmar_senha="benchmark1")
+        _verificar(cliente.post("/criarconta", data=dados_conta), "criarconta")
+        _verificar(cliente.post("/login", data=dict(email=dados_conta["email"], senha=dados_conta["senha"])), "login")
+        nome = os.path.basename(livro)
+
+        with medir(resultados, "enviar_excel", memoria):
+            with open(livro, "rb") as f:
+                resposta = cliente.post("/enviar_excel", data={"ficheiros": (f, nome)}, content_type="multipart/form-data")
+            resposta = _verificar(_esperar_tarefa(cliente, _verificar(resposta, "enviar_excel")), "enviar_excel")
+        if folhas[0].encode() not in resposta.data:
+            raise RuntimeError("enviar_excel: as folhas do livro não aparecem na página")
+
+        with medir(resultados, "selecionar_folhas", memoria):
+            resposta = cliente.post("/selecionar_folhas", data={"ficheiros_nome": nome, f"selecionadas_{nome}": folhas})
+            _verificar(_esperar_tarefa(cliente, _verificar(resposta, "selecionar_folhas")), "selecionar_folhas")
+
+        with medir(resultados, "pre_visualizacao", memoria):
+            resposta = _verificar(cliente.get("/dados/pre_visualizacao?pagina=2&tamanho=100&ordenar=Valor&ordem=desc"), "pre_visualizacao")
+        if resposta.get_json().get("ordenar") != "Valor":
+            raise RuntimeError("pre_visualizacao: a coluna Valor não foi encontrada")
+
+        for etapa, (tipo, coluna_x, coluna_y) in GRAFICOS.items():
+            with medir(resultados, etapa, memoria):
+                resposta = _verificar(cliente.post("/gerar_grafico", data={"coluna_x": coluna_x, "coluna_y": coluna_y, "tipos_graficos": [tipo]}), etapa)
+            if b"data-grafico" not in resposta.data:
+                raise RuntimeError(f"{etapa}: o gráfico não foi gerado")
+
+        if exportar:
+            grafico_id = re.findall(rb"/exportar_grafico/([^/]+)/png", resposta.data)[0].decode()
+            with medir(resultados, "exportar_png", memoria):
+                _verificar(cliente.get(f"/exportar_grafico/{grafico_id}/png"), "exportar_png")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return resultados
+
+
+def configuracao(opcoes): #Parâmetros do livro e das medições (guardados com os resultados para comparar só o que é comparável)
+    return {
+        "linhas": opcoes.linhas, "folhas": opcoes.folhas, "linhas_vazias": opcoes.linhas_vazias,
+        "virgula_decimal": not opcoes.sem_virgula, "datas": not opcoes.sem_datas,
+        "semente": opcoes.semente
+    }
+
+
+def executar(opcoes): #Gera o livro, faz as repetições e junta os resultados (mediana dos tempos e pico de memória)
+    pasta_livro = tempfile.mkdtemp(prefix="benchmark_livro_")
+    try:
+        livro = os.path.join(pasta_livro, "livro_sintetico.xlsx")
+        folhas = gerar_livro(livro, opcoes.linhas, opcoes.folhas, opcoes.linhas_vazias, not opcoes.sem_virgula, not opcoes.sem_datas, opcoes.semente)
+        exportar = not opcoes.sem_exportacao
+
+        for _ in range(opcoes.aquecimento): #Arranca as pools e carrega os módulos antes de medir
+            executar_uma_vez(livro, folhas, exportar, memoria=False)
+        repeticoes = [executar_uma_vez(livro, folhas, exportar, memoria=False) for _ in range(opcoes.repeticoes)]
+
+        tracemalloc.start() #A memória é medida numa passagem à parte (o tracemalloc torna o código mais lento)
+        try:
+            memoria = executar_uma_vez(livro, folhas, exportar, memoria=True)
+        finally:
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(pasta_livro, ignore_errors=True)
+
+    etapas = {}
+    for etapa in ETAPAS:
+        tempos = [repeticao[etapa]["tempo_s"] for repeticao in repeticoes if etapa in repeticao]
+        if tempos:
+            etapas[etapa] = {
+                "tempo_s": statistics.median(tempos),
+                "tempo_min_s": min(tempos),
+                "memoria_pico_mb": memoria[etapa]["memoria_pico_mb"]
+            }
+    return {
+        "configuracao": configuracao(opcoes),
+        "repeticoes": opcoes.repeticoes,
+        "ambiente": {"python": platform.python_version(), "sistema": platform.platform(), "processador": platform.processor()},
+        "etapas": etapas
+    }
+
+
+def comparar(base, atual, limite, minimo_ms): #Lista as etapas que ficaram mais lentas (ou usam mais memória) do que a referência permite
+    regressoes = []
+    for etapa, valores in atual["etapas"].items():
+        referencia = base["etapas"].get(etapa)
+        if referencia is None:
+            continue
+        if valores["tempo_s"] > referencia["tempo_s"] * (1 + limite) and (valores["tempo_s"] - referencia["tempo_s"]) * 1000 >= minimo_ms:
+            regressoes.append((etapa, "tempo_s", referencia["tempo_s"], valores["tempo_s"]))
+        if valores["memoria_pico_mb"] > referencia["memoria_pico_mb"] * (1 + limite) and valores["memoria_pico_mb"] - referencia["memoria_pico_mb"] >= 1:
+            regressoes.append((etapa, "memoria_pico_mb", referencia["memoria_pico_mb"], valores["memoria_pico_mb"]))
+    return regressoes
+
+
+def mostrar(resultados, base=None): #Tabela com os resultados (e a variação em relação à referência, se existir)
+    print(f"{'etapa':<20}{'tempo (ms)':>12}{'memória (MB)':>14}{'Δ tempo':>10}{'Δ memória':>11}")
+    for etapa, valores in resultados["etapas"].items():
+        linha = f"{etapa:<20}{valores['tempo_s'] * 1000:>12.1f}{valores['memoria_pico_mb']:>14.1f}"
+        referencia = (base or {}).get("etapas", {}).get(etapa)
+        if referencia:
+            linha += f"{(valores['tempo_s'] / referencia['tempo_s'] - 1) * 100:>+9.0f}%"
+            linha += f"{(valores['memoria_pico_mb'] / max(referencia['memoria_pico_mb'], 0.001) - 1) * 100:>+10.0f}%"
+        print(linha)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo e o pico de memória das etapas principais (upload, leitura, inferência, gráficos e exportação) com um livro Excel sintético.")
+    parser.add_argument("--linhas", type=int, default=20000, help="linhas de dados por folha")
+    parser.add_argument("--folhas", type=int, default=2, help="número de folhas do livro")
+    parser.add_argument("--linhas-vazias", type=int, default=3, help="linhas em branco antes do cabeçalho")
+    parser.add_argument("--sem-virgula", action="store_true", help="valores numéricos em vez de texto com vírgula decimal")
+    parser.add_argument("--sem-datas", action="store_true", help="sem colunas de datas")
+    parser.add_argument("--semente", type=int, default=0, help="semente dos valores aleatórios")
+    parser.add_argument("--repeticoes", type=int, default=3, help="repetições medidas (é usada a mediana)")
+    parser.add_argument("--aquecimento", type=int, default=1, help="execuções iniciais que não contam")
+    parser.add_argument("--sem-exportacao", action="store_true", help="não mede a exportação para PNG (não precisa do kaleido)")
+    parser.add_argument("--guardar", help="guarda os resultados neste ficheiro JSON (nova referência)")
+    parser.add_argument("--comparar", help="compara com os resultados de referência guardados neste ficheiro JSON")
+    parser.add_argument("--limite", type=float, default=0.2, help="aumento máximo aceite antes de ser considerado regressão (0.2 = 20%%)")
+    parser.add_argument("--minimo-ms", type=float, default=5.0, help="diferenças de tempo abaixo deste valor nunca são regressões")
+    opcoes = parser.parse_args(argumentos)
+
+    base = None
+    if opcoes.comparar:
+        with open(opcoes.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base["configuracao"] != configuracao(opcoes):
+            print("Aviso: a configuração é diferente da usada na referência; os resultados podem não ser comparáveis.")
+
+    resultados = executar(opcoes)
+    mostrar(resultados, base)
+
+    if opcoes.guardar:
+        with open(opcoes.guardar, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados em {opcoes.guardar}")
+
+    if base is not None:
+        regressoes = comparar(base, resultados, opcoes.limite, opcoes.minimo_ms)
+        for etapa, medida, antes, depois in regressoes:
+            print(f"REGRESSÃO: {etapa} {medida} {antes:.4f} -> {depois:.4f}")
+        if regressoes:
+            return 1
+        print("Sem regressões.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import random #Valores aleatórios, mas reprodutíveis (mesma semente = mesmo livro)
+import datetime #Para as colunas de datas
+from openpyxl import Workbook #Para escrever o livro Excel (.xlsx)
+
+CATEGORIAS = ("Norte", "Centro", "Lisboa", "Alentejo", "Algarve", "Açores", "Madeira") #Valores da coluna de texto com poucas categorias
+PRODUTOS = ("Caderno", "Caneta", "Lápis", "Mochila", "Régua", "Borracha", "Tesoura", "Cola", "Agenda", "Marcador") #Palavras usadas na coluna de texto livre
+DATA_INICIAL = datetime.datetime(2024, 1, 1) #Primeira data das colunas de datas
+
+
+def _numero_virgula(valor): #Número escrito como texto com vírgula decimal e ponto nos milhares (ex: 1.234,56)
+    return f"{valor:,.2f}".replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def gerar_livro(caminho, linhas=10000, folhas=1, linhas_vazias=0, virgula_decimal=True, datas=True, semente=0):
+    """Escreve um livro .xlsx com dados sintéticos e devolve a lista com os nomes das folhas.
+
+    Cada folha tem "linhas_vazias" linhas em branco antes do cabeçalho, uma coluna de categorias,
+    valores (com vírgula decimal, como texto, se "virgula_decimal"), quantidades inteiras, texto livre
+    e, se "datas", uma coluna de datas do Excel e outra de datas escritas como texto (dd/mm/aaaa)."""
+    aleatorio = random.Random(semente)
+    livro = Workbook(write_only=True) #Modo de escrita contínua (não guarda as células em memória)
+    nomes = []
+
+    for numero in range(1, folhas + 1):
+        nome = f"Folha{numero}"
+        folha = livro.create_sheet(nome)
+        nomes.append(nome)
+
+        for _ in range(linhas_vazias):
+            folha.append([])
+        cabecalho = ["Categoria", "Valor", "Quantidade", "Descricao"]
+        if datas:
+            cabecalho += ["Data", "Data_Texto"]
+        folha.append(cabecalho)
+
+        for linha in range(linhas):
+            valor = aleatorio.uniform(0, 5000)
+            dados = [
+                aleatorio.choice(CATEGORIAS),
+                _numero_virgula(valor) if virgula_decimal else round(valor, 2),
+                aleatorio.randint(1, 50),
+                f"{aleatorio.choice(PRODUTOS)} {aleatorio.randint(1, 10 ** 6)}"
+            ]
+            if datas:
+                data = DATA_INICIAL + datetime.timedelta(days=linha % 730, minutes=aleatorio.randint(0, 1439))
+                dados += [data, data.strftime("%d/%m/%Y")]
+            folha.append(dados)
+
+    livro.save(caminho)
+    return nomes
@@ -0,0 +1,14 @@
+import gc  #Para congelar os objetos já criados antes de criar os workers
+
+preload_app = True  #A aplicação é criada uma vez no processo principal e partilhada pelos workers (fork)
+
+
+def when_ready(server):  #Processo principal pronto, antes do primeiro worker: carrega o pandas/plotly uma única vez
+    from app import pre_carregar_modulos
+    pre_carregar_modulos()
+    gc.collect()
+    gc.freeze()  #Os objetos já carregados não são percorridos pelo garbage collector nos workers (as páginas de memória continuam partilhadas)
+
+
+def pre_fork(server, worker):  #Antes de cada worker: congela também os objetos criados entretanto
+    gc.freeze()
@@ -0,0 +1,89 @@
+// Cria os filtros do painel a partir das estatísticas das colunas
+// (calculadas no servidor ao carregar os dados e pedidas uma única vez)
+function criarFiltros(contentor) {
+    fetch(contentor.dataset.url)
+        .then(resposta => resposta.json())
+        .then(dados => {
+            Object.entries(dados.colunas || {}).forEach(([coluna, info]) => {
+                const linha = document.createElement("div");
+                linha.className = "row g-2 align-items-center mb-2";
+                linha.dataset.coluna = coluna;
+
+                const nome = document.createElement("div");
+                nome.className = "col-md-3";
+                nome.textContent = coluna.replaceAll("_", " ");
+                linha.appendChild(nome);
+
+                if (info.tipo === "numerica" || info.tipo === "data") {
+                    // Intervalo: mínimo e máximo (os limites da coluna aparecem como sugestão)
+                    ["minimo", "maximo"].forEach(limite => {
+                        const campo = document.createElement("input");
+                        campo.type = info.tipo === "data" ? "date" : "number";
+                        campo.step = "any";
+                        campo.className = "form-control form-control-sm";
+                        campo.dataset.limite = limite;
+                        const valor = info[limite] === null ? "" : String(info[limite]);
+                        campo.placeholder = info.tipo === "data" ? valor.slice(0, 10) : valor;
+                        if (info.tipo === "data" && valor) {
+                            campo[limite === "minimo" ? "min" : "max"] = valor.slice(0, 10);
+                        }
+                        const celula = document.createElement("div");
+                        celula.className = "col-md-3";
+                        celula.appendChild(campo);
+                        linha.appendChild(celula);
+                    });
+                } else if (info.principais && info.distintos <= info.principais.length) {
+                    // Conjunto de valores: só para colunas com poucos valores distintos (todos conhecidos)
+                    const lista = document.createElement("select");
+                    lista.multiple = true;
+                    lista.className = "form-select form-select-sm";
+                    info.principais.forEach(([valor, total]) => {
+                        const opcao = document.createElement("option");
+                        opcao.value = valor;
+                        opcao.textContent = valor + " (" + total + ")";
+                        lista.appendChild(opcao);
+                    });
+                    const celula = document.createElement("div");
+                    celula.className = "col-md-6";
+                    celula.appendChild(lista);
+                    linha.appendChild(celula);
+                } else {
+                    return;  // Demasiados valores distintos para um filtro por lista
+                }
+                contentor.appendChild(linha);
+            });
+        });
+}
+
+// Lê os filtros preenchidos no formato aceite pelo servidor
+function lerFiltros(contentor) {
+    const filtros = [];
+    contentor.querySelectorAll("[data-coluna]").forEach(linha => {
+        const coluna = linha.dataset.coluna;
+        const lista = linha.querySelector("select");
+        if (lista) {
+            const valores = Array.from(lista.selectedOptions).map(opcao => opcao.value);
+            if (valores.length) {
+                filtros.push({ coluna: coluna, valores: valores });
+            }
+            return;
+        }
+        const minimo = linha.querySelector("[data-limite='minimo']").value;
+        const maximo = linha.querySelector("[data-limite='maximo']").value;
+        if (minimo || maximo) {
+            filtros.push({ coluna: coluna, minimo: minimo || null, maximo: maximo || null });
+        }
+    });
+    return filtros;
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    const contentor = document.getElementById("filtros");
+    if (!contentor) {
+        return;
+    }
+    criarFiltros(contentor);
+    contentor.closest("form").addEventListener("submit", function() {
+        document.getElementById("filtros-json").value = JSON.stringify(lerFiltros(contentor));
+    });
+});
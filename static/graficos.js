@@ -0,0 +1,48 @@
+// Desenha os gráficos a partir das especificações JSON enviadas pelo servidor
+// (o plotly.js é carregado uma única vez e fica em cache no navegador)
+function desenharGraficos(raiz) {
+    (raiz || document).querySelectorAll("script[type='application/json'][data-grafico]").forEach(function(especificacao) {
+        const contentor = document.getElementById(especificacao.dataset.grafico);
+        if (!contentor || contentor.dataset.desenhado) {
+            return;
+        }
+        const figura = JSON.parse(especificacao.textContent);
+        Plotly.newPlot(contentor, figura.data, figura.layout, { responsive: true });
+        contentor.dataset.desenhado = "1";
+    });
+}
+
+// Pede o JSON de um gráfico guardado e desenha-o (com ETag: se não mudou, vem da cache do navegador)
+function carregarGrafico(contentor) {
+    if (contentor.dataset.desenhado) {
+        return;
+    }
+    contentor.dataset.desenhado = "1";
+    fetch(contentor.dataset.figura)
+        .then(resposta => resposta.ok ? resposta.json() : Promise.reject(resposta.status))
+        .then(figura => Plotly.newPlot(contentor, figura.data, figura.layout, { responsive: true }))
+        .catch(() => { delete contentor.dataset.desenhado; });
+}
+
+// Os gráficos anteriores só são pedidos quando aparecem (ou estão quase a aparecer) no ecrã
+function observarGraficos(raiz) {
+    const contentores = (raiz || document).querySelectorAll("[data-figura]");
+    if (!("IntersectionObserver" in window)) {
+        contentores.forEach(carregarGrafico);
+        return;
+    }
+    const observador = new IntersectionObserver(function(entradas) {
+        entradas.forEach(function(entrada) {
+            if (entrada.isIntersecting) {
+                observador.unobserve(entrada.target);
+                carregarGrafico(entrada.target);
+            }
+        });
+    }, { rootMargin: "200px" });
+    contentores.forEach(contentor => observador.observe(contentor));
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    desenharGraficos();
+    observarGraficos();
+});
@@ -0,0 +1,36 @@
+import pytest #Fixtures partilhadas pelos testes
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch): #Aplicação configurada com uma base de dados e pastas temporárias
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'teste.db'}")
+    monkeypatch.setenv("PASTA_ESPACOS", str(tmp_path / "espacos"))
+    monkeypatch.setenv("PASTA_CACHE_LEITURA", str(tmp_path / "cache"))
+    monkeypatch.setenv("ESPACOS_INTERVALO_LIMPEZA", "0")
+    from app import criar_app, db
+    app = criar_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def cliente(app): #Cliente com uma sessão iniciada
+    from app import db
+    from app.models import Utilizador
+    with app.app_context():
+        utilizador = Utilizador(nome="Ana", email="ana@exemplo.pt", senha="x")
+        db.session.add(utilizador)
+        db.session.commit()
+        id_utilizador = utilizador.id
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao["_user_id"] = str(id_utilizador)
+        sessao["_fresh"] = True
+    cliente.id_utilizador = id_utilizador
+    return cliente
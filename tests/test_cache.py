@@ -0,0 +1,54 @@
+import os #Para contar os ficheiros da cache
+from flask import Flask #Aplicação mínima para configurar a cache
+from app.cache import CacheLeitura #Classe testada
+
+
+def _cache(tmp_path, limite_mb=1):
+    app = Flask(__name__)
+    app.config.update(PASTA_CACHE_LEITURA=str(tmp_path / "cache"), CACHE_LEITURA_LIMITE_MB=limite_mb)
+    return CacheLeitura(app)
+
+
+def test_espaco_ocupado_e_atualizado_sem_percorrer_a_pasta(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    percorridas = []
+    entradas = cache._entradas
+    monkeypatch.setattr(cache, "_entradas", lambda: percorridas.append(1) or entradas())
+
+    for indice in range(5):
+        cache.guardar_folhas(f"{indice:064x}", ["Folha"] * 1000)
+    assert percorridas == [] #Abaixo do limite, a pasta nunca é percorrida
+    assert cache.ocupado == sum(tamanho for _, tamanho, _ in entradas())
+
+
+def test_limite_ultrapassado_apaga_os_mais_antigos(tmp_path):
+    cache = _cache(tmp_path)
+    cache.limite_bytes = 30000
+    for indice in range(10):
+        cache.guardar_folhas(f"{indice:064x}", ["Folha"] * 1000) #Cerca de 9 KB cada
+    assert cache.ocupado <= cache.limite_bytes
+    assert cache.ocupado == sum(tamanho for _, tamanho, _ in cache._entradas())
+    assert cache.obter_folhas(f"{9:064x}") is not None #O mais recente continua na cache
+    assert cache.obter_folhas(f"{0:064x}") is None
+    assert len(os.listdir(cache.pasta)) == len(cache._entradas())
+
+
+def test_escritas_simultaneas_da_mesma_folha(tmp_path):
+    import threading
+    import pandas as pd
+    cache = _cache(tmp_path)
+    dados = pd.DataFrame({"a": list(range(5000))})
+    erros = []
+    def guardar():
+        try:
+            for _ in range(20):
+                cache.guardar_folha("f" * 64, "Folha", dados, {"a": "numerica"})
+        except Exception as e:
+            erros.append(e)
+    threads = [threading.Thread(target=guardar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert erros == []
+    assert cache.obter_folha("f" * 64, "Folha")[1] == {"a": "numerica"}
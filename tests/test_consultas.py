@@ -0,0 +1,89 @@
+import pandas as pd #Para criar os dados dos testes
+import pytest #Para verificar os erros
+from app.consultas import ErroConsulta, ler_filtros, aplicar_filtros, agregar #Funções testadas
+
+
+@pytest.mark.parametrize("texto", [
+    '[{"coluna": "Regiao", "valores": 5}]',
+    '[{"coluna": "Regiao", "valores": "Norte"}]', #Um texto não é uma lista de valores
+    '[{"coluna": "Regiao", "valores": [{"a": 1}]}]',
+    '[{"coluna": "Valor", "minimo": [1, 2]}]',
+    '[{"coluna": 3, "minimo": 1}]',
+    '{"coluna": "Regiao"}',
+    'não é JSON',
+])
+def test_filtros_mal_formados_sao_recusados(texto):
+    with pytest.raises(ErroConsulta):
+        ler_filtros(texto)
+
+
+def test_filtros_validos_sao_aceites():
+    filtros = ler_filtros('[{"coluna": "Regiao", "valores": ["Norte", 1]}, {"coluna": "Valor", "minimo": 1, "maximo": null}]')
+    assert len(filtros) == 2
+
+
+ESQUEMA = {"Regiao": "categoria", "Valor": "numerica", "Data": "data"}
+
+
+def _vendas(): #Quatro vendas em duas regiões e em dias diferentes
+    return pd.DataFrame({
+        "Regiao": pd.Categorical(["Norte", "Sul", "Norte", "Centro"]),
+        "Valor": [10.0, 20.0, 30.0, 40.0],
+        "Data": pd.to_datetime(["2024-01-01 09:00", "2024-01-02 18:30", "2024-01-03 00:00", "2024-01-04 00:00"]),
+    })
+
+
+def test_filtro_por_conjunto_de_valores():
+    resultado = aplicar_filtros(_vendas(), ESQUEMA, ler_filtros('[{"coluna": "Regiao", "valores": ["Norte", "Centro"]}]'))
+    assert resultado["Valor"].tolist() == [10.0, 30.0, 40.0]
+
+
+def test_filtro_por_intervalo_numerico():
+    resultado = aplicar_filtros(_vendas(), ESQUEMA, ler_filtros('[{"coluna": "Valor", "minimo": "15", "maximo": 30}]'))
+    assert resultado["Valor"].tolist() == [20.0, 30.0]
+
+
+def test_data_maxima_inclui_o_dia_inteiro():
+    resultado = aplicar_filtros(_vendas(), ESQUEMA, [{"coluna": "Data", "minimo": "2024-01-02", "maximo": "2024-01-03"}])
+    assert resultado["Valor"].tolist() == [20.0, 30.0] #A venda das 18:30 do dia 2 entra no intervalo
+
+
+def test_filtros_combinados_e_sem_filtros():
+    df = _vendas()
+    assert aplicar_filtros(df, ESQUEMA, []) is df
+    resultado = aplicar_filtros(df, ESQUEMA, [{"coluna": "Regiao", "valores": ["Norte"]}, {"coluna": "Valor", "minimo": 20}])
+    assert resultado["Valor"].tolist() == [30.0]
+
+
+@pytest.mark.parametrize("filtro", [
+    {"coluna": "Inexistente", "valores": ["x"]},
+    {"coluna": "Regiao", "minimo": 1}, #Intervalo numa coluna de categorias
+    {"coluna": "Valor", "minimo": "dez"},
+    {"coluna": "Data", "maximo": "ontem"},
+])
+def test_filtros_que_nao_se_aplicam_a_coluna(filtro):
+    with pytest.raises(ErroConsulta):
+        aplicar_filtros(_vendas(), ESQUEMA, [filtro])
+
+
+def test_soma_de_coluna_nao_numerica_e_recusada():
+    df = pd.DataFrame({"Regiao": ["Norte", "Sul"], "Produto": pd.Categorical(["a", "b"])})
+    with pytest.raises(ErroConsulta):
+        agregar(df, "Regiao", "Produto", "soma")
+    with pytest.raises(ErroConsulta):
+        agregar(df, "Regiao", "Produto", "media")
+    assert agregar(df, "Regiao", "Produto", "contagem")["Produto"].tolist() == [1, 1]
+
+
+def test_consulta_com_filtros_invalidos_devolve_400(cliente):
+    from app import armazem_dados
+    with cliente.application.app_context():
+        id_dados = armazem_dados.guardar(cliente.id_utilizador, pd.DataFrame({"Regiao": ["Norte", "Sul"], "Valor": [1.0, 2.0]}))
+    with cliente.session_transaction() as sessao:
+        sessao["id_dados"] = id_dados
+        sessao["esquema"] = {"Regiao": "texto", "Valor": "numerica"}
+    resposta = cliente.post("/dados/consulta", json={"filtros": [{"coluna": "Regiao", "valores": 5}]})
+    assert resposta.status_code == 400
+    resposta = cliente.post("/dados/consulta", json={"agrupar": "Valor", "valor": "Regiao", "funcao": "soma"})
+    assert resposta.status_code == 400
+    assert "não é numérica" in resposta.get_json()["erro"]
@@ -0,0 +1,95 @@
+import os #Para criar os ficheiros de teste
+import app.espacos as espacos_modulo #Para contar as vezes que as pastas são percorridas
+from app.espacos import EspacosTrabalho, PREFIXO_RECECAO #Classe testada
+from app.uploads import FicheiroRecebido #Receção de ficheiros limitada pela quota
+
+
+def _escrever(caminho, tamanho, idade): #Cria um ficheiro com um tamanho e uma data de modificação (mais antigo = maior idade)
+    with open(caminho, "wb") as ficheiro:
+        ficheiro.write(b"x" * tamanho)
+    os.utime(caminho, (1000 - idade, 1000 - idade))
+    return caminho
+
+
+def _espacos(tmp_path, quota, quota_global=10 ** 9):
+    espacos = EspacosTrabalho()
+    espacos.raiz = str(tmp_path)
+    espacos.quota_utilizador = quota
+    espacos.quota_global = quota_global
+    espacos.idade_maxima = 10 ** 12 #Os registos de referências criados nos testes nunca expiram
+    return espacos
+
+
+def test_reservar_abaixo_da_quota_nao_percorre_as_pastas(tmp_path, monkeypatch):
+    espacos = _espacos(tmp_path, 100)
+    _escrever(os.path.join(espacos.pasta(1, "uploads"), "a.csv"), 40, idade=1)
+    espacos.contar_tudo()
+    percorridas = []
+    ficheiros = espacos_modulo._ficheiros
+    monkeypatch.setattr(espacos_modulo, "_ficheiros", lambda pasta: percorridas.append(pasta) or ficheiros(pasta))
+    assert espacos.reservar(1, 50)
+    assert espacos.uso(1) == 90
+    assert percorridas == []
+
+
+def test_reservar_nao_apaga_ficheiros_em_uso(tmp_path):
+    espacos = _espacos(tmp_path, 100)
+    pasta = espacos.pasta(1, "uploads")
+    em_rececao = _escrever(os.path.join(pasta, f"{PREFIXO_RECECAO}abc"), 40, idade=5)
+    tarefa = _escrever(os.path.join(espacos.pasta(1, "tarefas"), "t.json"), 10, idade=4)
+    dados = _escrever(os.path.join(espacos.pasta(1, "dados"), "atual.parquet"), 40, idade=3)
+    antigo = _escrever(os.path.join(pasta, "antigo.csv"), 40, idade=2)
+    espacos.referenciar(1, [dados])
+    espacos.contar_tudo()
+
+    assert espacos.reservar(1, 40) #O ficheiro em receção é contado pela sua própria reserva: basta apagar o antigo
+    assert not os.path.exists(antigo)
+    assert all(os.path.exists(caminho) for caminho in (em_rececao, tarefa, dados))
+
+    assert not espacos.reservar(1, 60) #Não há mais nada que possa ser apagado
+    assert all(os.path.exists(caminho) for caminho in (em_rececao, tarefa, dados))
+
+
+def test_quota_global_nao_apaga_os_dados_de_outro_utilizador(tmp_path):
+    espacos = _espacos(tmp_path, 1000, quota_global=100)
+    dados = _escrever(os.path.join(espacos.pasta(2, "dados"), "atual.parquet"), 60, idade=3)
+    antigo = _escrever(os.path.join(espacos.pasta(2, "graficos"), "antigo.grafico"), 30, idade=2)
+    espacos.referenciar(2, [dados])
+    espacos.contar_tudo()
+
+    assert espacos.reservar(1, 40)
+    assert os.path.exists(dados) and not os.path.exists(antigo)
+    espacos.referenciar(1, [_escrever(os.path.join(espacos.pasta(1, "dados"), "atual.parquet"), 40, idade=0)])
+    assert not espacos.reservar(1, 10)
+    assert os.path.exists(dados)
+
+
+def test_limpeza_por_idade_mantem_os_ficheiros_referenciados(tmp_path):
+    espacos = _espacos(tmp_path, 1000)
+    espacos.idade_maxima = 60
+    dados = _escrever(os.path.join(espacos.pasta(1, "dados"), "atual.parquet"), 10, idade=0)
+    antigo = _escrever(os.path.join(espacos.pasta(1, "uploads"), "antigo.csv"), 10, idade=0)
+    espacos.referenciar(1, [dados])
+    espacos.limpar_antigos()
+    assert os.path.exists(dados) and not os.path.exists(antigo)
+    assert espacos.uso(1) == 10
+
+
+def test_disponivel_so_conta_ficheiros_referenciados(tmp_path):
+    espacos = _espacos(tmp_path, 100)
+    dados = _escrever(os.path.join(espacos.pasta(1, "dados"), "atual.parquet"), 30, idade=1)
+    _escrever(os.path.join(espacos.pasta(1, "uploads"), "antigo.csv"), 50, idade=2)
+    espacos.referenciar(1, [dados])
+    assert espacos.disponivel(1) == 70
+
+
+def test_rececao_interrompida_ao_ultrapassar_a_quota(tmp_path):
+    recebido = FicheiroRecebido(str(tmp_path), "dados.csv", limite=1000, disponivel=10)
+    recebido.write(b"a,b\n1,2\n")
+    assert not recebido.sem_espaco
+    recebido.write(b"3,4\n")
+    assert recebido.sem_espaco
+    assert not os.path.exists(recebido.caminho) #O que já tinha sido escrito é apagado
+    recebido.write(b"5,6\n") #O resto do envio é ignorado
+    recebido.seek(0)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,28 @@
+import time #Para simular uma renderização que nunca acaba
+import multiprocessing #Pool de teste sem o kaleido
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from app import exportacao #Módulo testado
+from app.exportacao import PoolRenderizacao, ErroExportacao
+
+
+def _pendurar(figura_json, formato): #Renderização bloqueada
+    time.sleep(60)
+
+
+def test_renderizacao_demorada_descarta_a_pool(monkeypatch):
+    renderizacao = PoolRenderizacao()
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    renderizacao.pool, renderizacao.pid = pool, None
+    pool.submit(time.sleep, 0).result() #Arranca o processo
+    processos = list(pool._processes.values())
+    monkeypatch.setattr(renderizacao, "_obter_pool", lambda: pool)
+    monkeypatch.setattr(exportacao, "_renderizar", _pendurar)
+    monkeypatch.setattr(exportacao, "TEMPO_MAXIMO_RENDERIZACAO", 2)
+
+    with pytest.raises(ErroExportacao):
+        renderizacao.renderizar("{}", "png")
+    for processo in processos:
+        processo.join(timeout=10)
+    assert processos and not any(processo.is_alive() for processo in processos) #O processo bloqueado foi terminado
+    assert renderizacao.pool is None #A próxima exportação cria uma pool nova
@@ -0,0 +1,70 @@
+import json #Para comparar as figuras
+import struct #Para ler o cabeçalho dos ficheiros de gráficos
+import pandas as pd #Para criar os dados dos testes
+import pytest #Para verificar os erros
+from app.graficos import reduzir_dados, construir_figura, guardar_figura, carregar_figura, MAGIA_FIGURA, ALINHAMENTO #Funções testadas
+
+
+def _dados_texto(linhas): #Uma linha por valor de X (texto), com valores de Y diferentes
+    return pd.DataFrame({"Produto": [f"Produto {i:05d}" for i in range(linhas)], "Valor": [float(i % 97) for i in range(linhas)]})
+
+
+def test_linhas_com_eixo_de_texto_acima_do_limite():
+    dados = reduzir_dados(_dados_texto(500), "Linhas", "Produto", "Valor", limite_pontos=50)
+    assert len(dados) == 50
+    assert dados["Produto"].iloc[0] == "Produto 00000" #O primeiro e o último ponto são mantidos
+    assert dados["Produto"].iloc[-1] == "Produto 00499"
+    assert dados["Produto"].is_monotonic_increasing #Os pontos continuam pela ordem do eixo
+
+
+def test_figura_de_linhas_com_eixo_de_texto():
+    figura = construir_figura(_dados_texto(500), "Linhas", "Produto", "Valor", limite_pontos=50)
+    assert len(figura.data[0].x) == 50
+
+
+def test_linhas_com_eixo_de_datas_usa_o_tempo():
+    df = pd.DataFrame({"Data": pd.date_range("2024-01-01", periods=500, freq="h"), "Valor": range(500)})
+    dados = reduzir_dados(df, "Linhas", "Data", "Valor", limite_pontos=50)
+    assert len(dados) == 50
+    assert pd.api.types.is_datetime64_any_dtype(dados["Data"])
+
+
+def _figura_guardada(tmp_path): #Guarda uma figura de linhas (x inteiro, y decimal) e devolve o caminho e o JSON original
+    df = pd.DataFrame({"Dia": range(300), "Valor": [i * 0.5 for i in range(300)]})
+    figura_json = construir_figura(df, "Linhas", "Dia", "Valor").to_json()
+    caminho = tmp_path / "figura.grafico"
+    guardar_figura(str(caminho), figura_json)
+    return caminho, figura_json
+
+
+def test_figura_guardada_volta_igual(tmp_path):
+    caminho, figura_json = _figura_guardada(tmp_path)
+    assert json.loads(carregar_figura(str(caminho))) == json.loads(figura_json)
+
+
+def test_ficheiro_de_figura_tem_cabecalho_e_buffers_alinhados(tmp_path):
+    caminho, _ = _figura_guardada(tmp_path)
+    conteudo = caminho.read_bytes()
+    assert conteudo.startswith(MAGIA_FIGURA)
+    tamanho, = struct.unpack_from("<Q", conteudo, len(MAGIA_FIGURA))
+    cabecalho = json.loads(conteudo[len(MAGIA_FIGURA) + 8:len(MAGIA_FIGURA) + 8 + tamanho])
+    assert len(cabecalho["buffers"]) == 2 #Os arrays x e y ficam fora do cabeçalho JSON
+    assert "bdata" not in json.dumps(cabecalho["figura"])
+    inicio = -(-(len(MAGIA_FIGURA) + 8 + tamanho) // ALINHAMENTO) * ALINHAMENTO
+    for posicao, _ in cabecalho["buffers"]:
+        assert (inicio + posicao) % ALINHAMENTO == 0
+
+
+def test_figura_com_assinatura_errada(tmp_path):
+    caminho = tmp_path / "figura.grafico"
+    caminho.write_bytes(b"OUTRACOI" + bytes(64))
+    with pytest.raises(ValueError, match="inválido"):
+        carregar_figura(str(caminho))
+
+
+@pytest.mark.parametrize("corte", [4, len(MAGIA_FIGURA) + 20, -10])
+def test_figura_truncada(tmp_path, corte):
+    caminho, _ = _figura_guardada(tmp_path)
+    caminho.write_bytes(caminho.read_bytes()[:corte])
+    with pytest.raises(ValueError):
+        carregar_figura(str(caminho))
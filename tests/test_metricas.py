@@ -0,0 +1,29 @@
+import importlib #O módulo app.metricas tem o mesmo nome que a extensão exportada por app
+from app import metricas as extensao #Extensão de métricas da aplicação
+
+modulo_metricas = importlib.import_module("app.metricas") #Para capturar os registos
+
+
+def test_metricas_recusa_pedidos_atraves_de_proxy(app):
+    cliente = app.test_client()
+    assert cliente.get("/metrics").status_code == 200
+    assert cliente.get("/metrics", headers={"X-Forwarded-For": "203.0.113.7"}).status_code == 404
+
+
+def test_metricas_com_token(app, monkeypatch):
+    monkeypatch.setattr(extensao, "token", "segredo")
+    cliente = app.test_client()
+    assert cliente.get("/metrics").status_code == 404 #Sem token, nem os pedidos locais são aceites
+    assert cliente.get("/metrics", headers={"Authorization": "Bearer errado"}).status_code == 404
+    resposta = cliente.get("/metrics", headers={"Authorization": "Bearer segredo", "X-Forwarded-For": "203.0.113.7"})
+    assert resposta.status_code == 200
+    assert "painel_pedido_duracao_segundos" in resposta.get_data(as_text=True)
+
+
+def test_progresso_das_tarefas_registado_em_debug(cliente, monkeypatch):
+    registos = []
+    monkeypatch.setattr(modulo_metricas, "registar", lambda evento, nivel="info", **campos: registos.append((evento, nivel, campos.get("rota"))))
+    cliente.get("/tarefas/" + "c" * 32)
+    cliente.get("/login")
+    assert ("pedido", "debug", "/tarefas/<id_tarefa>") in registos
+    assert ("pedido", "info", "/login") in registos
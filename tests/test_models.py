@@ -0,0 +1,25 @@
+from sqlalchemy import event #Para contar as consultas feitas à base de dados
+from app import db #Base de dados da aplicação
+from app.models import load_user #Função testada
+
+
+def test_utilizador_em_cache_nao_e_lido_depois_de_um_commit(cliente):
+    app = cliente.application
+    with app.test_request_context():
+        load_user(str(cliente.id_utilizador)) #Guarda o utilizador na cache
+        db.session.commit() #Um commit no mesmo pedido expira as instâncias da sessão
+
+    consultas = []
+    with app.app_context():
+        motor = db.engine
+    def contar(ligacao, cursor, instrucao, *args):
+        if "utilizador" in instrucao.lower():
+            consultas.append(instrucao)
+    event.listen(motor, "before_cursor_execute", contar)
+    try:
+        for _ in range(3):
+            resposta = cliente.get("/painel")
+            assert resposta.status_code == 200
+    finally:
+        event.remove(motor, "before_cursor_execute", contar)
+    assert consultas == []
@@ -0,0 +1,51 @@
+import os #Para criar o ficheiro do gráfico
+import json #Figura de teste em JSON
+from app import espacos_trabalho #Pasta dos gráficos do utilizador
+from app import routes #Rotas testadas
+
+
+def test_figura_com_etag_comprimida_nao_volta_a_ser_lida(cliente, monkeypatch):
+    with cliente.application.app_context():
+        pasta = espacos_trabalho.pasta(cliente.id_utilizador, "graficos")
+    open(os.path.join(pasta, "abc.grafico"), "wb").close()
+    leituras = []
+    def figura_guardada(caminho):
+        leituras.append(caminho)
+        return json.dumps({"data": [{"x": list(range(2000))}]})
+    monkeypatch.setattr(routes, "figura_guardada", figura_guardada)
+
+    resposta = cliente.get("/graficos/abc/figura", headers={"Accept-Encoding": "gzip"})
+    assert resposta.status_code == 200 and resposta.headers["Content-Encoding"] == "gzip"
+    etag = resposta.headers["ETag"]
+    assert etag.endswith('-gzip"')
+    assert len(leituras) == 1
+
+    resposta = cliente.get("/graficos/abc/figura", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert resposta.status_code == 304
+    assert resposta.headers["ETag"] == etag
+    assert len(leituras) == 1 #A figura não foi lida de novo
+
+
+def test_selecao_de_ficheiro_apagado_mostra_erro(cliente):
+    with cliente.application.app_context():
+        pasta = espacos_trabalho.pasta(cliente.id_utilizador, "uploads")
+    with open(os.path.join(pasta, "existe.csv"), "w") as ficheiro:
+        ficheiro.write("a;b\n1;2\n")
+    resposta = cliente.post("/selecionar_folhas", data={"ficheiros_nome": ["apagado.csv", "existe.csv"], "selecionadas_apagado.csv": ["apagado"]})
+    assert resposta.status_code == 200
+    pagina = resposta.get_data(as_text=True)
+    assert "Erro ao ler os dados selecionados" in pagina
+    assert 'name="selecionadas_existe.csv"' in pagina #A seleção volta a ser mostrada com os ficheiros que ainda existem
+    assert 'name="selecionadas_apagado.csv"' not in pagina
+
+
+def test_erro_da_tarefa_e_mostrado(cliente):
+    from app import gestor_tarefas
+    id_tarefa = "b" * 32
+    with cliente.application.app_context():
+        espacos_trabalho.pasta(cliente.id_utilizador, "tarefas")
+    gestor_tarefas._escrever_estado(cliente.id_utilizador, id_tarefa, tipo="folhas", estado="erro", progresso=0, total=1, mensagem="Ficheiro corrompido")
+    resposta = cliente.get(f"/tarefas/{id_tarefa}/concluir", follow_redirects=True)
+    pagina = resposta.get_data(as_text=True)
+    assert "Ficheiro corrompido" in pagina
+    assert "Nenhum arquivo Excel válido" not in pagina
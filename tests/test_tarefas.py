@@ -0,0 +1,83 @@
+import os #Para terminar o processo da pool de forma abrupta
+import json #Para escrever o estado de uma tarefa órfã
+import time #Para esperar pelo fim das tarefas
+from flask import Flask #Aplicação mínima para configurar o gestor de tarefas
+from app.tarefas import GestorTarefas #Classe testada
+
+
+def _morrer(_): #Simula um processo terminado pelo sistema (ex: falta de memória)
+    os._exit(1)
+
+
+def _dobrar(valor):
+    return valor * 2
+
+
+def _esperar(gestor, id_tarefa, limite=60): #Espera que a tarefa termine e devolve o seu estado final
+    fim = time.time() + limite
+    while time.time() < fim:
+        estado = gestor.estado(1, id_tarefa)
+        if estado["estado"] != "em_curso":
+            return estado
+        time.sleep(0.05)
+    raise TimeoutError(id_tarefa)
+
+
+def test_pool_avariada_e_recriada(tmp_path):
+    app = Flask(__name__)
+    app.config.update(PASTA_ESPACOS=str(tmp_path / "espacos"), PASTA_CACHE_LEITURA=str(tmp_path / "cache"), TAREFAS_PROCESSOS=1)
+    gestor = GestorTarefas(app)
+
+    estado = _esperar(gestor, gestor._iniciar(1, "folhas", [("a", _morrer, (1,))]))
+    assert estado["estado"] == "erro"
+    assert gestor.pool is None #A pool avariada foi descartada
+
+    estado = _esperar(gestor, gestor._iniciar(1, "folhas", [("b", _dobrar, (21,))]))
+    assert estado["estado"] == "concluida"
+    assert estado["resultado"] == {"b": 42}
+    gestor.pool.shutdown()
+
+
+def test_montar_dados_mede_cada_etapa(tmp_path, monkeypatch):
+    from app import armazem_dados, cache_leitura, metricas
+    app = Flask(__name__)
+    app.config.update(PASTA_ESPACOS=str(tmp_path / "espacos"), PASTA_CACHE_LEITURA=str(tmp_path / "cache"), TAREFAS_PROCESSOS=0)
+    armazem_dados.init_app(app)
+    cache_leitura.init_app(app)
+    gestor = GestorTarefas(app)
+    caminho = tmp_path / "dados.csv"
+    caminho.write_text("Categoria;Valor\nA;1\nB;2\n")
+    etapas = []
+    monkeypatch.setattr(metricas, "observar_etapa", lambda etapa, duracao, **_: etapas.append(etapa))
+
+    id_tarefa = gestor.carregar_dados(1, [(str(caminho), ["dados"])])
+    estado = _esperar(gestor, id_tarefa)
+    assert estado["estado"] == "concluida"
+    assert estado["resultado"]["linhas"] == 2 and "tempos" not in estado["resultado"]
+    assert {"inferencia", "juntar", "estatisticas", "gravar"} <= set(etapas)
+
+
+def test_tarefa_de_processo_terminado_passa_a_erro(tmp_path):
+    app = Flask(__name__)
+    app.config.update(PASTA_ESPACOS=str(tmp_path / "espacos"), TAREFAS_PROCESSOS=0)
+    gestor = GestorTarefas(app)
+    id_tarefa = "a" * 32
+    os.makedirs(os.path.dirname(gestor._caminho(1, id_tarefa)))
+    with open(gestor._caminho(1, id_tarefa), "w", encoding="utf-8") as f:
+        json.dump({"tipo": "dados", "estado": "em_curso", "progresso": 1, "total": 3, "pid": 2 ** 22 + 1}, f) #pid acima do máximo do Linux: processo inexistente
+    estado = gestor.estado(1, id_tarefa)
+    assert estado["estado"] == "erro" and "reiniciou" in estado["mensagem"]
+    assert gestor.estado(1, id_tarefa)["estado"] == "erro" #Fica registado em disco
+
+
+def test_parquet_nao_e_lido_na_pool(tmp_path, monkeypatch):
+    import pandas as pd
+    app = Flask(__name__)
+    app.config.update(PASTA_ESPACOS=str(tmp_path / "espacos"))
+    gestor = GestorTarefas(app)
+    caminho = tmp_path / "dados.parquet"
+    pd.DataFrame({"a": [1, 2]}).to_parquet(caminho)
+    iniciadas = []
+    monkeypatch.setattr(gestor, "_iniciar", lambda id_utilizador, tipo, subtarefas, final=None: iniciadas.append(subtarefas))
+    gestor.carregar_dados(1, [(str(caminho), ["dados"])])
+    assert iniciadas == [[]] #Só a junção final lê o ficheiro
@@ -0,0 +1,77 @@
+import io #Para enviar ficheiros nos pedidos de teste
+import os #Para verificar os ficheiros deixados na pasta de uploads
+import pytest #Para verificar os erros
+from werkzeug.exceptions import RequestEntityTooLarge #Erro 413 durante a receção
+from app import espacos_trabalho #Pasta de uploads do utilizador
+from app.uploads import FicheiroRecebido, assinatura_valida #Funções testadas
+
+ZIP = b"PK\x03\x04" + bytes(60) #Início de um .xlsx
+OLE2 = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + bytes(56) #Início de um .xls
+
+
+@pytest.mark.parametrize("nome, inicio, valido", [
+    ("vendas.xlsx", ZIP, True),
+    ("vendas.xlsx", OLE2, False),
+    ("vendas.xls", OLE2, True),
+    ("vendas.xls", ZIP, False),
+    ("vendas.parquet", b"PAR1\x15\x04", True),
+    ("vendas.parquet", ZIP, False),
+    ("vendas.csv", b"Regiao;Valor\n", True),
+    ("vendas.csv", b"Regiao\x00;Valor", False), #Bytes nulos: ficheiro binário com extensão .csv
+    ("vendas.csv", b"", False),
+    ("vendas.txt", b"Regiao;Valor\n", False),
+])
+def test_assinatura_valida(nome, inicio, valido):
+    assert assinatura_valida(nome, inicio) is valido
+
+
+def test_ficheiro_com_assinatura_errada_nao_fica_em_disco(tmp_path):
+    recebido = FicheiroRecebido(str(tmp_path), "vendas.xlsx", limite=10_000)
+    recebido.write(b"Regiao;Valor\n")
+    recebido.write(b"Norte;10\n")
+    assert recebido.valido is False
+    assert os.listdir(tmp_path) == [] #O ficheiro parcial foi apagado logo nos primeiros bytes
+
+
+def test_ficheiro_pequeno_e_verificado_no_fim(tmp_path):
+    recebido = FicheiroRecebido(str(tmp_path), "curto.csv", limite=10_000)
+    recebido.write(b"a;b\n")
+    recebido.seek(0) #Menos bytes do que a assinatura: a verificação é feita quando o Werkzeug termina a receção
+    assert recebido.valido is True
+    recebido.guardar(str(tmp_path / "curto.csv"))
+    assert (tmp_path / "curto.csv").read_bytes() == b"a;b\n"
+
+
+def test_ficheiro_acima_do_limite_interrompe_a_rececao(tmp_path):
+    recebido = FicheiroRecebido(str(tmp_path), "grande.csv", limite=100)
+    recebido.write(b"x" * 60)
+    with pytest.raises(RequestEntityTooLarge):
+        recebido.write(b"x" * 60)
+    recebido.descartar()
+    assert os.listdir(tmp_path) == []
+
+
+def test_ficheiro_acima_da_quota_e_descartado(tmp_path):
+    recebido = FicheiroRecebido(str(tmp_path), "grande.csv", limite=10_000, disponivel=50)
+    recebido.write(b"a;b\n" * 10)
+    recebido.write(b"a;b\n" * 10)
+    assert recebido.sem_espaco
+    assert os.listdir(tmp_path) == []
+
+
+def test_envio_com_assinatura_errada_e_recusado(cliente):
+    resposta = cliente.post("/enviar_excel", data={"ficheiros": (io.BytesIO(b"Regiao;Valor\nNorte;10\n"), "vendas.xlsx")}, content_type="multipart/form-data", follow_redirects=True)
+    assert "não são Excel, CSV ou Parquet válidos: vendas.xlsx" in resposta.get_data(as_text=True)
+    with cliente.application.app_context():
+        assert os.listdir(espacos_trabalho.pasta(cliente.id_utilizador, "uploads")) == []
+
+
+def test_envio_acima_do_limite_devolve_erro_e_nao_deixa_ficheiros(cliente):
+    cliente.application.config["UPLOAD_LIMITE_FICHEIRO_MB"] = 1
+    grande = b"Regiao;Valor\n" + b"Norte;10\n" * (1024 * 1024 // 9 + 1)
+    resposta = cliente.post("/enviar_excel", data={"ficheiros": (io.BytesIO(grande), "vendas.csv")}, content_type="multipart/form-data")
+    assert resposta.status_code == 302 #O erro 413 é mostrado no painel
+    with cliente.session_transaction() as sessao:
+        assert any("excedem o limite de 1 MB" in mensagem for _, mensagem in sessao["_flashes"])
+    with cliente.application.app_context():
+        assert os.listdir(espacos_trabalho.pasta(cliente.id_utilizador, "uploads")) == [] #O ficheiro parcial foi apagado no fim do pedido
@@ -0,0 +1,55 @@
+import pytest #Fixtures dos testes
+from flask import Flask #Aplicação mínima para configurar a cache de leitura
+from app import cache_leitura #Cache das folhas lidas
+from app import utils #Funções testadas
+
+
+@pytest.fixture
+def cache(tmp_path): #Cache de leitura numa pasta temporária
+    app = Flask(__name__)
+    app.config.update(PASTA_CACHE_LEITURA=str(tmp_path / "cache"))
+    cache_leitura.init_app(app)
+    return cache_leitura
+
+
+def test_folha_em_cache_ja_vem_tipada(tmp_path, cache, monkeypatch):
+    caminho = tmp_path / "vendas.csv"
+    caminho.write_text("Categoria;Valor;Data\n" + "".join(f"{'AB'[i % 2]};{i},5;{i % 28 + 1:02d}/02/2024\n" for i in range(20)), encoding="utf-8")
+    primeira = utils.ler_folhas_selecionadas(str(caminho), ["vendas"])["vendas"]
+    assert primeira[1] == {"Categoria": "categoria", "Valor": "numerica", "Data": "data"}
+
+    inferencias = []
+    monkeypatch.setattr(utils, "inferir_tipos", lambda df: inferencias.append(df) or (df, {}))
+    tempos = {}
+    segunda = utils.ler_folhas_selecionadas(str(caminho), ["vendas"], tempos)["vendas"]
+    assert inferencias == [] and tempos == {} #Veio da cache: os tipos não voltaram a ser detetados
+    assert segunda[1] == primeira[1]
+    assert segunda[0].dtypes.to_dict() == primeira[0].dtypes.to_dict()
+
+
+@pytest.mark.parametrize("conteudo, codificacao, esperado", [
+    ("Região;Valor\nNorte;12,5\nSul;3,25\n", "cp1252", ("cp1252", ";", ",")),
+    ("\ufeffRegião,Valor\nNorte,12.5\nSul,3.25\n", "utf-8", ("utf8", ",", ".")),
+    ("Região\tValor\nNorte\t12,5\nSul\t3,25\n", "utf-8", ("utf8", "\t", ",")),
+    ("Região|Valor\nNorte|12.5\nSul|3.25\n", "utf-8", ("utf8", "|", ".")),
+    ('Região,Valor\nNorte,"12,5"\nSul,"3,25"\n', "utf-8", ("utf8", ",", ".")), #Com vírgula a separar colunas, a vírgula nunca é o separador decimal
+])
+def test_deteta_formato_csv(tmp_path, conteudo, codificacao, esperado):
+    caminho = tmp_path / "dados.csv"
+    caminho.write_bytes(conteudo.encode(codificacao))
+    assert utils._detetar_formato_csv(str(caminho)) == esperado
+
+
+def test_csv_vazio(tmp_path):
+    caminho = tmp_path / "vazio.csv"
+    caminho.write_bytes(b"\n\n")
+    with pytest.raises(ValueError):
+        utils._detetar_formato_csv(str(caminho))
+
+
+def test_csv_com_virgula_decimal_e_lido_como_numero(tmp_path, cache):
+    caminho = tmp_path / "precos.csv"
+    caminho.write_bytes("Produto;Preço\n".encode("cp1252") + "".join(f"Artigo {i};{i},75\n" for i in range(20)).encode("cp1252"))
+    df, esquema = utils.ler_folhas_selecionadas(str(caminho), ["precos"])["precos"]
+    assert esquema["Preço"] == "numerica"
+    assert df["Preço"].iloc[3] == 3.75